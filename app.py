@@ -1,14 +1,20 @@
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import yfinance as yf
-from datetime import datetime, timedelta
-from tensorflow.keras.models import load_model 
+from datetime import datetime
 import streamlit as st
-from database import authenticate_user, register_user, insert_history, seek_history
-from searchTicker import resolve_company_to_ticker
-from time import sleep
+from database import load_env, authenticate_user, register_user, insert_history, seek_history, history_summary, flush_history
+from time import monotonic
 import os
+from tracing import span, start_exporter
+
+# .env must be read before the modules below pick up MODEL_PATH etc.
+load_env()
+from modelRegistry import get_registry, start_preload
+
+# Heavy imports (pandas, plotting, TensorFlow) are only needed by the prediction page:
+# load them and warm the model in the background while the user is still logging in.
+PREDICTION_MODULES = ("pandas", "searchTicker", "priceStore", "pipeline", "forecastCache", "charts")
+start_preload(*PREDICTION_MODULES)
+# /metrics endpoint when TRACE_METRICS_PORT is set (see tracing.py)
+start_exporter()
 
 # ------------------- Session State Init -------------------
 
@@ -80,38 +86,41 @@ def history_page():
 
     if "username" in st.session_state:
         username = st.session_state.username
-        seek_history(username)
+        flush_history()
+        summary = history_summary(username)
+        if summary and summary["count"]:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Transactions", summary["count"])
+            col2.metric("Total Invested", f"{summary['total_invested']:,.2f}")
+            col3.metric("Total Profit", f"{summary['total_profit']:,.2f}")
+            st.dataframe(summary["per_ticker"])
+        # Stack of keyset cursors, one per page visited
+        cursors = st.session_state.setdefault("history_cursors", [None])
+        next_cursor = seek_history(username, before_id=cursors[-1])
+        cols = st.columns([1, 1, 8])
+        if len(cursors) > 1 and cols[0].button("Previous"):
+            cursors.pop()
+            st.rerun()
+        if next_cursor is not None and cols[1].button("Next"):
+            cursors.append(next_cursor)
+            st.rerun()
     else:
         st.warning("You must be logged in to view your history.")
     if st.button("Back to Main"):
         st.session_state.page = "main"
+        st.session_state.history_cursors = [None]
         st.rerun()
 # ------------------- Model Loading -------------------
 def load_stock_model():
-    """Attempt to load the LSTM model with fallback options and detailed error reporting"""
+    """Return the process-wide cached LSTM model, reporting load errors in the page"""
     import traceback
-    model_paths = [
-        'best_model.keras'
-    ]
-    for model_path in model_paths:
-        if os.path.exists(model_path):
-            # Check if file is not empty
-            if os.path.getsize(model_path) == 0:
-                st.error(f"Model file {model_path} is empty or corrupted.")
-                continue
-            try:
-                model = load_model(model_path, compile=False)
-                model.compile(optimizer='adam', loss='mean_squared_error')
-                return model
-            except Exception as e1:
-                try:
-                    model = load_model(model_path, compile=True)
-                    model.compile(optimizer='adam', loss='mean_squared_error')
-                    return model
-                except Exception as e2:
-                    st.error(f"Failed to load {model_path}: {str(e1)}\n{traceback.format_exc()}")
-                    continue
-    st.error("Failed to load any model. Please check model files. If you retrained the model, ensure the architecture matches and the file is not corrupted.")
+    registry = get_registry()
+    try:
+        return registry.get()
+    except FileNotFoundError:
+        st.error("Failed to load any model. Please check model files. If you retrained the model, ensure the architecture matches and the file is not corrupted.")
+    except Exception as e:
+        st.error(f"Failed to load {registry.path}: {str(e)}\n{traceback.format_exc()}")
     return None
 
 # ------------------- Currency Symbol Helper -------------------
@@ -132,8 +141,72 @@ def get_currency_symbol(currency_code):
     }
     return symbols.get(currency_code, currency_code + " ")
 
+# ------------------- Per-session Result Cache -------------------
+MAX_SESSION_RESULTS = 5
+
+def get_prediction(stock, model, end):
+    """Data, forecast, trade plan and charts for `stock`, kept across reruns of this session.
+
+    Results are keyed by (ticker, last bar date, model version) and shared between
+    sessions through the process-wide forecast cache, which also makes concurrent
+    sessions asking for the same ticker wait on one computation. Within the price
+    store's TTL this session's entry is returned without touching the store, so reruns
+    caused by widgets (investment amount, Calculate Profit) do no I/O and no model calls.
+    """
+    from priceStore import get_price_store
+    from pipeline import predict_ticker
+    from forecastCache import get_forecast_cache
+
+    store = get_price_store()
+    registry = get_registry()
+    sessions = st.session_state.setdefault("predictions", {})
+    entry = sessions.get(stock)
+    now = monotonic()
+    if entry and now - entry["checked_at"] < store.ttl and entry["key"][2] == registry.version:
+        return entry["result"]
+    # The store serialises downloads per ticker, so only one session refreshes the bars
+    with span("prices"):
+        data = store.get(stock, end=end)
+    if data.empty:
+        return None
+    key = (stock, data.index[-1].date(), registry.version)
+
+    def compute():
+        # feature scaling: the artifact's training scaler for this ticker, else the stored per-ticker min/max
+        features, matrix = registry.features, None
+        with span("scaler"):
+            if len(features) > 1:
+                from featureStore import get_feature_store
+
+                matrix, scaler = get_feature_store().inputs(stock, features, rows=len(data), end=end)
+                scaler = registry.scaler(stock) or scaler
+            else:
+                scaler = registry.scaler(stock) or store.scaler(stock)
+        if scaler is None:
+            return None
+        with span("indicators"):
+            indicators = store.indicators(stock, end=end)
+        with span("predict_ticker"):
+            result = predict_ticker(stock, data, indicators, model, scaler, features=matrix)
+        with span("currency"):
+            result["currency"] = store.currency(stock, default="INR")
+        return result
+
+    with span("prediction"):
+        result = get_forecast_cache().get_or_compute(key, compute)
+    sessions.pop(stock, None)
+    sessions[stock] = {"key": key, "checked_at": now, "result": result}
+    while len(sessions) > MAX_SESSION_RESULTS:
+        sessions.pop(next(iter(sessions)))
+    return result
+
 # ------------------- Main Page -------------------
 def main():
+    import pandas as pd
+    from searchTicker import resolve_company_to_ticker
+    from strategy import compound
+    from charts import CLIENT_CHARTS, figures, line_chart_frames
+
     st.set_page_config(page_title="Stock Market Price Prediction", page_icon="📈", layout="wide")
     # Position the Logout button to the right using streamlit columns
     cols = st.columns([10, 1])
@@ -155,15 +228,15 @@ def main():
                 st.session_state.page = "history"
                 st.rerun()
 
-    # Load the model using the new function
-    model = load_stock_model()
+    # Shared model, loaded and warmed up once per process
+    with span("model.get"):
+        model = load_stock_model()
     if model is None:
         return
 
     # Rest of the main function
     end = datetime.today().strftime('%Y-%m-%d')
     company_name = st.text_input("Enter Company Name", "TCS")
-    sleep(3) 
     try:
         if st.button("Resolve & Predict", key="resolve_button"):
             ticker = resolve_company_to_ticker(company_name)
@@ -178,199 +251,51 @@ def main():
 
     if st.session_state.predict_clicked and st.session_state.resolved_ticker:
         stock = st.session_state.resolved_ticker
-        # Get currency code and symbol
-        try:
-            ticker_info = yf.Ticker(stock).info
-            currency_code = ticker_info.get("currency", "INR")
-        except Exception:
-            currency_code = "INR"
-        currency_symbol = get_currency_symbol(currency_code)
-        
-        data = yf.download(stock, end=end)
-        if data.empty:
+        # Recomputed only when new bars arrive or the served model changes
+        result = get_prediction(stock, model, end)
+        if result is None:
             st.error("No stock data found. Please check the company name or ticker.")
             return
-    # Fetch and display historical data
-        data = yf.download(stock, end=end)
+        currency_symbol = get_currency_symbol(result["currency"])
+
+        # Charts are downsampled and rendered once per (ticker, as-of date, model version)
+        with span("charts"):
+            if CLIENT_CHARTS:
+                frames = line_chart_frames(result)
+            else:
+                pngs = figures(stock, result, version=get_registry().version)
+        if CLIENT_CHARTS:
+            show_chart = lambda name: st.line_chart(frames[name])
+        else:
+            show_chart = lambda name: st.image(pngs[name], use_container_width=True)
+
         st.subheader("Historical Data")
-        st.write(data[::-1])
-
-    #train data from start to today
-        data_train=pd.DataFrame(data.Close[0:int(len(data)*0.80)])
-        data_test=pd.DataFrame(data.Close[int(len(data)*0.80):int(len(data))])
-    #feature scaling
-        from sklearn.preprocessing import MinMaxScaler
-        scaler=MinMaxScaler(feature_range=(0,1))
-        data_train_array=scaler.fit_transform(data_train)
-        x=[]
-        y=[]
-        for i in range(100,data_train_array.shape[0]):
-          x.append(data_train_array[i-100:i])
-          y.append(data_train_array[i,0])
-        x,y=np.array(x),np.array(y)
-    #moving average
+        st.write(result["data"][::-1])
         st.subheader("Moving Average 100 and 200 days")
-        ma_100_days = data['Close'].rolling(100).mean()
-        ma_200_days=data.Close.rolling(200).mean()
-        fig1=plt.figure(figsize=(18,10))
-        plt.plot(ma_100_days,'r',label="100 Days average")
-        plt.plot(ma_200_days,'b',label="200 Days average")
-        plt.plot(data.Close,'g',label='closing price')
-        plt.legend()
-        plt.xlabel('No of Days')
-        plt.ylabel('Closing Price')
-        plt.title(f'{stock} closing price vs 100 days average vs 200 days closing price')
-        st.pyplot(fig1)
-    #predicting the stock price
+        show_chart("moving_average")
         st.subheader("Prediction vs actual price")
-        pas_100_days=data_train.tail(100)
-        data_test=pd.concat([pas_100_days,data_test],ignore_index=True)
-        data_test_array=scaler.fit_transform(data_test)
-        x=[]
-        y=[]
-        for i in range(100,data_test_array.shape[0]):
-          x.append(data_train_array[i-100:i])
-          y.append(data_train_array[i,0])
-        x,y=np.array(x),np.array(y)
-        y_predict=model.predict(x)
-        scale=1/scaler.scale_
-        y_predict=y_predict*scale
-        y=y*scale
-    #plotting the graph
-        fig2=plt.figure(figsize=(12,6))
-        plt.plot(y,'b',label='original price')
-        plt.plot(y_predict,'r',label='predicted price')
-        plt.xlabel('time')
-        plt.ylabel('price')
-        plt.title("Test Result of the prediction model using LSTM")
-        plt.legend()
-        st.pyplot(fig2)
-
+        show_chart("test")
 
     # ----- Improved Next 30 Days Prediction -----
         st.subheader("Next 30 days prediction")
-        # Use last 100 days from test set to seed predictions
-        inputs = data_test_array[-100:].flatten()
-        future_preds_scaled = []
-        for _ in range(30):
-            x_input = inputs[-100:].reshape(1, 100, 1)
-            pred_scaled = model.predict(x_input, verbose=0)[0, 0]
-            future_preds_scaled.append(pred_scaled)
-            inputs = np.append(inputs, pred_scaled)
-
-        # Optional: Apply a moving average smoothing to reduce prediction noise
-        def smooth_predictions(preds, window=3):
-            if len(preds) < window:
-                return preds
-            smoothed = np.convolve(preds, np.ones(window) / window, mode='valid')
-            # Prepend the unsmoothed values to maintain the length
-            pad_width = len(preds) - len(smoothed)
-            return np.concatenate((preds[:pad_width], smoothed))
-
-        # Adjust the smoothing window size as needed
-        future_preds_scaled = smooth_predictions(future_preds_scaled, window=3)
-
-        # Inverse transform to original price scale
-        future_prices = scaler.inverse_transform(
-            np.array(future_preds_scaled).reshape(-1, 1)
-        ).flatten()
-
-        # Generate next 30 business days
-        future_dates = []
-        current_date = datetime.today()
-        days_added = 0
-        while days_added < 30:
-            current_date += timedelta(days=1)
-            if current_date.weekday() < 5:  # Mon-Fri
-                future_dates.append(current_date.date())
-                days_added += 1
-
-        # Create predictions DataFrame
-        pred_df = pd.DataFrame({
-            'Date': future_dates,
-            'Predicted_Price': future_prices
-        })
+        pred_df = result["pred_df"]
         st.write(pred_df.set_index('Date'))
-
-        # Prepare historical data with Date as a column
-        df_hist = data.reset_index().iloc[-100:]
-        # Use the future dates and predictions (future_prices) generated earlier
-        plt.figure(figsize=(12, 6))
-        plt.plot(df_hist['Date'], df_hist['Close'], label='Historical Data')
-        plt.plot(pred_df['Date'], pred_df['Predicted_Price'], label='Future Predictions')
-        plt.xlabel("Date")
-        plt.ylabel("Closing Price")
-        plt.title(f"{stock} Price Prediction")
-        plt.legend()
-        plt.xticks(rotation=45)
-        st.pyplot(plt.gcf())
-        plt.clf()
+        show_chart("future")
+        if result.get("bands") is not None:
+            st.caption(f"Forecast: median of {result['samples']} sampled forecasts; band: 10th to 90th percentile. "
+                       "Only trades whose 10th-percentile return covers costs are recommended.")
 
         # ----- Optimal Trading Strategy (Multiple Transactions) -----
         st.subheader("Recommended Transaction Plan")
-        transactions = []
-        n = len(pred_df)
-        i = 0
-        while i < n - 1:
-            # Find buy point (local minima)
-            while i < n - 1 and pred_df['Predicted_Price'].iloc[i+1] <= pred_df['Predicted_Price'].iloc[i]:
-                i += 1
-            buy_idx = i
-            # Find sell point (local maxima)
-            j = i + 1
-            while j < n and pred_df['Predicted_Price'].iloc[j] >= pred_df['Predicted_Price'].iloc[j-1]:
-                j += 1
-            sell_idx = j - 1
-            # Record profitable trade
-            if sell_idx > buy_idx:
-                transactions.append({
-                    'buy_date': pred_df.at[buy_idx, 'Date'],
-                    'buy_price': pred_df.at[buy_idx, 'Predicted_Price'],
-                    'sell_date': pred_df.at[sell_idx, 'Date'],
-                    'sell_price': pred_df.at[sell_idx, 'Predicted_Price']
-                })
-            i = j
-
-        # Simulate compounding trades
 
         # Trading recommendations (Optimized for multiple transactions)
         st.subheader("Optimal Trading Strategy")
 
-        # Ensure the predictions DataFrame is sorted by Date
-        pred_df = pred_df.sort_values(by="Date").reset_index(drop=True)
-        transactions = []
-        n = len(pred_df)
-
-        if n < 2:
+        predicted_prices = result["prices"]
+        if len(pred_df) < 2:
           st.warning("Insufficient predicted data for a reliable trading strategy.")
-        else:
-          i = 0
-          # Iterate over the predicted days to identify multiple buy-sell opportunities
-          while i < n - 1:
-            # Find the local minimum (buy point)
-            while i < n - 1 and pred_df['Predicted_Price'].iloc[i + 1] <= pred_df['Predicted_Price'].iloc[i]:
-              i += 1
-            if i == n - 1:
-              break
-            buy_date = pred_df['Date'].iloc[i]
-            buy_price = pred_df['Predicted_Price'].iloc[i]
-
-            # Find the local maximum (sell point)
-            j = i + 1
-            while j < n and pred_df['Predicted_Price'].iloc[j] >= pred_df['Predicted_Price'].iloc[j - 1]:
-              j += 1
-            sell_date = pred_df['Date'].iloc[j - 1]
-            sell_price = pred_df['Predicted_Price'].iloc[j - 1]
-
-            if sell_price > buy_price:
-              transactions.append({
-                'buy_date': buy_date,
-                'buy_price': buy_price,
-                'sell_date': sell_date,
-                'sell_price': sell_price
-              })
-            # Continue from where we left off
-            i = j
+        # Buy at each predicted valley, sell at the following peak (planned with the forecast)
+        buy_idx, sell_idx = result["buys"], result["sells"]
 
         # Get user investment amount
         investment = st.number_input(f"Enter Investment Amount ({currency_symbol})", 
@@ -380,24 +305,20 @@ def main():
                              step=1000)
 
         if st.button("Calculate Profit", key="calculate_profit"):
-            current_capital = investment
+            with span("strategy.compound"):
+                returns = compound(predicted_prices, buy_idx, sell_idx, investment, cost=result["cost"])
+            current_capital = returns['final']
             transaction_history = []
 
-            for trade in transactions:
-                # Calculate the number of shares bought at the buy price
-                shares = current_capital / trade['buy_price']
-                # Calculate profit from this trade and update the capital for compounding transactions
-                profit = shares * (trade['sell_price'] - trade['buy_price'])
-                current_capital = shares * trade['sell_price']
-
+            for k, (buy, sell) in enumerate(zip(buy_idx, sell_idx)):
                 transaction_history.append({
-                    'Buy Date': trade['buy_date'].strftime('%Y-%m-%d'),
-                    'Buy Price': f"{currency_symbol}{trade['buy_price']:.2f}",
-                    'Sell Date': trade['sell_date'].strftime('%Y-%m-%d'),
-                    'Sell Price': f"{currency_symbol}{trade['sell_price']:.2f}",
-                    'Shares': shares,
-                    'Profit': profit,
-                    'Total Value': current_capital
+                    'Buy Date': pred_df['Date'].iloc[buy].strftime('%Y-%m-%d'),
+                    'Buy Price': f"{currency_symbol}{predicted_prices[buy]:.2f}",
+                    'Sell Date': pred_df['Date'].iloc[sell].strftime('%Y-%m-%d'),
+                    'Sell Price': f"{currency_symbol}{predicted_prices[sell]:.2f}",
+                    'Shares': returns['shares'][k],
+                    'Profit': returns['profit'][k],
+                    'Total Value': returns['capital'][k]
                 })
 
             # Display results
@@ -422,16 +343,18 @@ def main():
                 st.warning("No profitable trading opportunities found in the prediction window")
                 st.metric("Recommended Action", "Hold Cash", delta_color="off")
 #------------------- Routing Logic -------------------
-if st.session_state.page == "login":
-    login_page()
-elif st.session_state.page == "signup":
-    signup_page()
-elif st.session_state.page == "main" and st.session_state.authenticated:
-    main()
-elif st.session_state.page == "history" and st.session_state.authenticated:
-    history_page()
-else:
-    st.warning("You must be logged in to access this page.")
+# One root span per script run: per-page latency, and the unit the sampling profiler dumps
+with span(f"page.{st.session_state.page}", root=True):
+    if st.session_state.page == "login":
+        login_page()
+    elif st.session_state.page == "signup":
+        signup_page()
+    elif st.session_state.page == "main" and st.session_state.authenticated:
+        main()
+    elif st.session_state.page == "history" and st.session_state.authenticated:
+        history_page()
+    else:
+        st.warning("You must be logged in to access this page.")
 
 st.markdown("<hr>", unsafe_allow_html=True)
 st.markdown("""
@@ -0,0 +1,298 @@
+"""Walk-forward backtest of the LSTM forecast and the peak/valley trading plan.
+
+    python backtest.py --known --years 5 --stride 5 --workers 4 --out backtest.csv
+    python backtest.py --known --offline          # only tickers already in the price cache
+    python backtest.py --synthetic 32 --days 2500 # no price data needed at all
+
+At every origin t (every --stride bars) the 100 closes before t are scaled with
+the min/max of the history up to t (nothing after t is used), forecast 30 days
+ahead exactly like the app (smoothed, back to prices), and the transaction plan
+drawn from that forecast is executed at the closes that actually followed.
+All origins of a group of tickers are forecast together in large batches; groups
+run in a process pool. Reports RMSE/MAPE, directional hit rate and realized ROI
+against buy-and-hold over the same 30 days.
+
+A multi-feature model (features listed in its artifact manifest) is fed the
+same columns from the feature store, each scaled with its own min/max up to t;
+synthetic series get features derived from their closes (featureStore.close_features).
+"""
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from forecaster import HORIZON, LOOKBACK, forecast, smooth
+from predictor import as_predictor
+from strategy import compound, plan_trades
+
+TRADING_DAYS = 252
+
+
+def synthetic_prices(n_tickers, n_days, seed=0):
+    """Geometric random walks with per-ticker drift and volatility."""
+    rng = np.random.default_rng(seed)
+    drift = rng.normal(0.0003, 0.0004, (n_tickers, 1))
+    vol = rng.uniform(0.008, 0.03, (n_tickers, 1))
+    paths = 100 * np.exp(np.cumsum(drift + vol * rng.standard_normal((n_tickers, n_days)), axis=1))
+    return {f"SYN{i:03d}": path for i, path in enumerate(paths)}
+
+
+def _close(series):
+    series = np.asarray(series, dtype=np.float64)
+    return series if series.ndim == 1 else series[:, 0]
+
+
+def prepare(series, lookback=LOOKBACK, horizon=HORIZON, stride=1):
+    """Origins and their scaled seed windows, realized paths and scaling.
+
+    `series` is a close series or a (bars, F) feature matrix with Close first.
+    Returns (origins, seeds (N, lookback) or (N, lookback, F), actual (N, horizon),
+    lo (N,), span (N,)), with lo/span those of Close.
+    """
+    values = np.asarray(series, dtype=np.float64)
+    close = _close(values)
+    t = np.arange(lookback, len(close) - horizon + 1, stride)
+    if len(t) == 0:
+        empty = np.empty((0, lookback) + values.shape[1:])
+        return t, empty, np.empty((0, horizon)), np.empty(0), np.empty(0)
+    # fmin/fmax skip the NaN warm-up rows of the indicator features
+    lo = np.fmin.accumulate(values)[t - 1]
+    hi = np.fmax.accumulate(values)[t - 1]
+    span = np.where(hi > lo, hi - lo, 1.0)
+    windows = sliding_window_view(values, lookback, axis=0)[t - lookback]
+    actual = sliding_window_view(close, horizon)[t]
+    if values.ndim == 1:
+        seeds = (windows - lo[:, None]) / span[:, None]
+        return t, seeds, actual, lo, span
+    seeds = np.nan_to_num((windows.transpose(0, 2, 1) - lo[:, None]) / span[:, None])
+    return t, seeds, actual, lo[:, 0], span[:, 0]
+
+
+def rising_steps(paths):
+    """(N, H-1) mask of the steps held by the turning-point plan of each path.
+
+    Row-wise equivalent of strategy.turning_points(): step j -> j+1 is held when
+    the last non-flat move up to it was a rise.
+    """
+    sign = np.sign(np.diff(paths, axis=1))
+    steps = np.arange(sign.shape[1])
+    last_move = np.maximum.accumulate(np.where(sign != 0, steps, 0), axis=1)
+    return np.take_along_axis(sign, last_move, axis=1) > 0
+
+
+def realized_growth(pred, actual, max_trades=None, cost=0.0):
+    """Growth multiple and trade count of each forecast's plan, executed on `actual`."""
+    if max_trades is None and cost == 0:
+        held = rising_steps(pred)
+        growth = np.exp((held * np.diff(np.log(actual), axis=1)).sum(axis=1))
+        starts = np.diff(held.astype(np.int8), axis=1, prepend=0) == 1
+        return growth, starts.sum(axis=1)
+    growth = np.empty(len(pred))
+    trades = np.empty(len(pred), dtype=np.intp)
+    for i, (p, a) in enumerate(zip(pred, actual)):
+        buys, sells = plan_trades(p, max_trades=max_trades, cost=cost)
+        growth[i] = compound(a, buys, sells, 1.0, cost)["final"]
+        trades[i] = len(buys)
+    return growth, trades
+
+
+def evaluate(pred, actual, last_close, max_trades=None, cost=0.0):
+    """Forecast error and strategy metrics over all origins of one ticker."""
+    err = pred - actual
+    ape = np.abs(err) / np.abs(actual) * 100
+    growth, trades = realized_growth(pred, actual, max_trades, cost)
+    buy_hold = actual[:, -1] / actual[:, 0]
+    return {
+        "origins": len(pred),
+        "rmse": float(np.sqrt(np.mean(err ** 2))),
+        "mape": float(ape.mean()),
+        "mape_day1": float(ape[:, 0].mean()),
+        f"mape_day{pred.shape[1]}": float(ape[:, -1].mean()),
+        "hit_rate": float(np.mean(np.sign(pred[:, -1] - last_close) == np.sign(actual[:, -1] - last_close))),
+        "strategy_roi_pct": float((growth.mean() - 1) * 100),
+        "buy_hold_roi_pct": float((buy_hold.mean() - 1) * 100),
+        "beat_buy_hold": float(np.mean(growth > buy_hold)),
+        "trades_per_origin": float(trades.mean()),
+    }
+
+
+def backtest_tickers(closes, model, lookback=LOOKBACK, horizon=HORIZON, stride=5,
+                     batch_size=1024, max_trades=None, cost=0.0):
+    """One row of metrics per ticker; every ticker's origins share the same batches."""
+    prepared = {ticker: prepare(close, lookback, horizon, stride) for ticker, close in closes.items()}
+    prepared = {ticker: p for ticker, p in prepared.items() if len(p[0])}
+    if not prepared:
+        return []
+    seeds = np.concatenate([p[1] for p in prepared.values()]).astype(np.float32)
+    width, features = as_predictor(model).input_shape[-1], (seeds.shape[2] if seeds.ndim == 3 else 1)
+    if width is not None and width != features:
+        raise ValueError(f"The model takes {width} input features but the series have {features}; "
+                         "pass the feature matrices named in its manifest (see run())")
+    scaled = np.concatenate([forecast(model, seeds[i:i + batch_size], horizon=horizon)
+                             for i in range(0, len(seeds), batch_size)])
+    scaled = smooth(scaled, window=3)
+
+    rows, offset = [], 0
+    for ticker, (t, ticker_seeds, actual, lo, span) in prepared.items():
+        pred = scaled[offset:offset + len(t)] * span[:, None] + lo[:, None]
+        offset += len(t)
+        last_close = _close(closes[ticker])[t - 1]
+        rows.append(dict(ticker=ticker, **evaluate(pred, actual, last_close, max_trades, cost)))
+    return rows
+
+
+_model = None
+
+
+def _init_worker(model_path, threads):
+    global _model
+    from predictor import load_predictor
+
+    if model_path.endswith(".keras") and threads:
+        import tensorflow as tf
+
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    _model = load_predictor(model_path, num_threads=threads)
+
+
+def _run_group(closes, options):
+    return backtest_tickers(closes, _model, **options)
+
+
+def resolve_model(model_path=None):
+    """(model file, its input features); the file defaults to what the app would serve."""
+    from modelRegistry import get_registry, model_features
+
+    if model_path is None:
+        model_path = get_registry().served_path()
+    return model_path, model_features(model_path)
+
+
+def run(closes, model_path=None, workers=None, group_size=8, **options):
+    """Backtest every series in `closes` ({ticker: closes}); returns a per-ticker DataFrame.
+
+    `model_path` defaults to the file the app's model registry would serve. Tickers are
+    split into groups of `group_size`, each forecast in one process of the pool. For
+    a multi-feature model, plain close series are expanded with close_features().
+    """
+    model_path, features = resolve_model(model_path)
+    if len(features) > 1:
+        from featureStore import close_features
+
+        closes = {ticker: close_features(series, features) if np.ndim(series) == 1 else series
+                  for ticker, series in closes.items()}
+    workers = workers or os.cpu_count() or 1
+    groups = [dict(list(closes.items())[i:i + group_size]) for i in range(0, len(closes), group_size)]
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    if workers == 1 or len(groups) == 1:
+        _init_worker(model_path, None)
+        rows = [row for group in groups for row in _run_group(group, options)]
+    else:
+        # spawn: TensorFlow's thread pools do not survive fork()
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(model_path, threads)) as pool:
+            rows = [row for result in pool.map(_run_group, groups, [options] * len(groups))
+                    for row in result]
+    return pd.DataFrame(rows)
+
+
+def summarize(results):
+    """Origin-weighted averages over tickers (RMSE is per ticker only, being in price units)."""
+    weights = results["origins"]
+    columns = [c for c in results.columns if c not in ("ticker", "origins", "rmse")]
+    summary = {c: float(np.average(results[c], weights=weights)) for c in columns}
+    summary.update(tickers=len(results), origins=int(weights.sum()))
+    return summary
+
+
+def load_closes(tickers, offline=False, years=None, features=None):
+    """{ticker: closes}, or with several `features` {ticker: (bars, F) feature matrix}."""
+    from priceStore import PriceStore, get_price_store
+
+    # Offline: only what is already cached, never a refresh
+    store = PriceStore(fetcher=lambda *args, **kwargs: None, ttl=float("inf")) if offline else get_price_store()
+    feature_store = None
+    if features and len(features) > 1:
+        from featureStore import FeatureStore
+
+        feature_store = FeatureStore(store)
+    end = datetime.today().strftime('%Y-%m-%d')
+    closes = {}
+    for ticker in tickers:
+        close = store.get(ticker, end=end)["Close"].to_numpy()
+        if feature_store is not None and len(close):
+            feature_store.sync(ticker)
+            close = feature_store.matrix(ticker, features, end=end)
+        if years:
+            close = close[-(int(years * TRADING_DAYS) + LOOKBACK):]
+        if len(close) >= LOOKBACK + HORIZON:
+            closes[ticker] = close
+        else:
+            print(f"Skipping {ticker}: not enough history")
+    return closes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of forecast and strategy.")
+    parser.add_argument('tickers', nargs='*', help="tickers or known company names")
+    parser.add_argument('--known', action='store_true',
+                        help="include every ticker in company_to_ticker_map")
+    parser.add_argument('--offline', action='store_true', help="use cached prices only")
+    parser.add_argument('--synthetic', type=int, metavar='N', help="backtest N synthetic series")
+    parser.add_argument('--days', type=int, default=5 * TRADING_DAYS, help="length of synthetic series")
+    parser.add_argument('--years', type=float, help="only the last N years of each ticker")
+    parser.add_argument('--stride', type=int, default=5, help="bars between forecast origins")
+    parser.add_argument('--horizon', type=int, default=HORIZON)
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--workers', type=int, help="processes (default: CPU count)")
+    parser.add_argument('--group-size', type=int, default=8, help="tickers per process task")
+    parser.add_argument('--model', help="model file (default: what the app serves)")
+    parser.add_argument('--max-trades', type=int)
+    parser.add_argument('--cost', type=float, default=0.0, help="proportional cost per side")
+    parser.add_argument('--out', help=".csv path for the per-ticker results")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        closes = synthetic_prices(args.synthetic, args.days)
+    else:
+        from searchTicker import company_to_ticker_map
+
+        tickers = [company_to_ticker_map.get(t.upper(), t.upper()) for t in args.tickers]
+        if args.known:
+            tickers += list(company_to_ticker_map.values())
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            parser.error("no tickers given (pass tickers, --known or --synthetic)")
+        _, features = resolve_model(args.model)
+        closes = load_closes(tickers, offline=args.offline, years=args.years, features=features)
+    if not closes:
+        print("No ticker had enough history to backtest.")
+        return 1
+
+    started = perf_counter()
+    results = run(closes, model_path=args.model, workers=args.workers, group_size=args.group_size,
+                  stride=args.stride, horizon=args.horizon, batch_size=args.batch_size,
+                  max_trades=args.max_trades, cost=args.cost)
+    elapsed = perf_counter() - started
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(results.round(3).to_string(index=False))
+    summary = summarize(results)
+    print(f"\n{summary['tickers']} tickers, {summary['origins']} origins in {elapsed:.1f}s "
+          f"({summary['origins'] / elapsed:.0f} origins/s)")
+    for key, value in summary.items():
+        if key not in ("tickers", "origins"):
+            print(f"  {key:<18} {value:8.3f}")
+    if args.out:
+        results.to_csv(args.out, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,168 @@
+"""Headless batch forecasts for many tickers.
+
+    python batchPredict.py --known --watchlist watchlist.txt --out forecasts.csv
+
+Prices come from the local price store (fetched concurrently and rate-limited by
+fetcher.BulkFetcher), every ticker's
+seed window is stacked into batches of --batch-size, and each batch is forecast
+with one model call per step. Results are written to CSV, or Parquet when the
+output path ends in .parquet.
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from forecaster import HORIZON, LOOKBACK, forecast, smooth
+from pipeline import future_business_days
+from priceStore import get_price_store
+from searchTicker import company_to_ticker_map
+from strategy import compound, plan_trades
+
+
+def _prepare(ticker, frame, store, registry=None, features=None):
+    """Scale the last LOOKBACK closes the way main() does; None if history is too short.
+
+    With several `features` the seed is the last LOOKBACK rows of the ticker's
+    feature matrix; lo/span are always those of Close.
+    """
+    close = frame["Close"].to_numpy(dtype=np.float64)
+    if len(close) < LOOKBACK:
+        return None
+    saved = registry.scaler(ticker) if registry else None
+    if features and len(features) > 1:
+        from featureStore import FeatureStore
+
+        matrix, scaler = FeatureStore(store).inputs(ticker, features, rows=len(close))
+        if matrix is None or len(matrix) < LOOKBACK:
+            return None
+        scaler = saved or scaler
+        seed = np.nan_to_num(scaler.transform(matrix[-LOOKBACK:]))
+        return seed, scaler.lo[0], scaler.span[0]
+    scaler = saved or store.scaler(ticker)
+    return scaler.transform(close[-LOOKBACK:]), scaler.lo, scaler.span
+
+
+def fetch_prices(tickers, store=None, workers=8, rate=2.0):
+    """Download/refresh every ticker through the rate-limited bulk fetcher; returns {ticker: DataFrame}."""
+    from fetcher import BulkFetcher
+
+    store = store or get_price_store()
+    fetcher = BulkFetcher(store, workers=workers, rate=rate)
+    report = fetcher.run(tickers, resume=False)
+    for ticker, error in report["failures"].items():
+        print(f"Error fetching {ticker}: {error}")
+    end = datetime.today().strftime('%Y-%m-%d')
+    frames = {t: fetcher.store.get(t, end=end) for t in tickers}
+    return {t: f for t, f in frames.items() if not f.empty}
+
+
+def predict_tickers(tickers, model, store=None, batch_size=256, horizon=HORIZON,
+                    investment=1000.0, workers=8, max_trades=None, cost=0.0, registry=None,
+                    rate=2.0):
+    """Forecast and plan trades for every ticker; returns one row per ticker.
+
+    `registry` (a ModelRegistry) supplies the artifact's per-ticker scalers when given.
+    """
+    store = store or get_price_store()
+    prices = fetch_prices(tickers, store=store, workers=workers, rate=rate)
+    features = registry.features if registry else None
+    prepared = {t: _prepare(t, f, store, registry, features) for t, f in prices.items()}
+    ready = [t for t, p in prepared.items() if p is not None]
+    if not ready:
+        return pd.DataFrame()
+
+    seeds = np.stack([prepared[t][0] for t in ready])
+    lo = np.array([prepared[t][1] for t in ready])[:, None]
+    scale = np.array([prepared[t][2] for t in ready])[:, None]
+    scaled = np.concatenate([forecast(model, seeds[i:i + batch_size], horizon=horizon)
+                             for i in range(0, len(seeds), batch_size)])
+    future = smooth(scaled, window=3) * scale + lo
+
+    dates = future_business_days(datetime.today(), horizon)
+    rows = []
+    for ticker, path in zip(ready, future):
+        buys, sells = plan_trades(path, max_trades=max_trades, cost=cost)
+        capital = compound(path, buys, sells, investment, cost=cost)['final']
+        plan = [{'buy_date': str(dates[buy]), 'buy_price': float(path[buy]),
+                 'sell_date': str(dates[sell]), 'sell_price': float(path[sell])}
+                for buy, sell in zip(buys, sells)]
+        row = {
+            'ticker': ticker,
+            'as_of': str(prices[ticker].index[-1].date()),
+            'last_close': float(prices[ticker]['Close'].iloc[-1]),
+            'trades': len(plan),
+            'final_value': capital,
+            'roi_pct': (capital - investment) / investment * 100,
+            'plan': json.dumps(plan),
+        }
+        row.update({str(d): float(p) for d, p in zip(dates, path)})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def write_results(results, path):
+    if path.endswith('.parquet'):
+        results.to_parquet(path, index=False)
+    else:
+        results.to_csv(path, index=False)
+
+
+def _read_watchlist(path):
+    with open(path) as f:
+        names = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    return [company_to_ticker_map.get(name.upper(), name.upper()) for name in names]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch stock forecasts for a watchlist.")
+    parser.add_argument('tickers', nargs='*', help="tickers or known company names")
+    parser.add_argument('--watchlist', help="file with one ticker or company name per line")
+    parser.add_argument('--known', action='store_true',
+                        help="include every ticker in company_to_ticker_map")
+    parser.add_argument('--out', default='forecasts.csv', help=".csv or .parquet output path")
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--workers', type=int, default=8, help="concurrent price downloads")
+    parser.add_argument('--rate', type=float, default=2.0, help="price requests per second")
+    parser.add_argument('--horizon', type=int, default=HORIZON)
+    parser.add_argument('--investment', type=float, default=1000.0)
+    parser.add_argument('--max-trades', type=int, help="cap on trades per ticker")
+    parser.add_argument('--cost', type=float, default=0.0,
+                        help="proportional transaction cost per side, e.g. 0.001")
+    args = parser.parse_args(argv)
+
+    tickers = [company_to_ticker_map.get(t.upper(), t.upper()) for t in args.tickers]
+    if args.watchlist:
+        tickers += _read_watchlist(args.watchlist)
+    if args.known:
+        tickers += list(company_to_ticker_map.values())
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        parser.error("no tickers given (pass tickers, --watchlist or --known)")
+
+    from modelRegistry import get_registry
+
+    registry = get_registry()
+    model = registry.get()
+    started = perf_counter()
+    results = predict_tickers(tickers, model, batch_size=args.batch_size,
+                              horizon=args.horizon, investment=args.investment,
+                              workers=args.workers, max_trades=args.max_trades,
+                              cost=args.cost, registry=registry, rate=args.rate)
+    elapsed = perf_counter() - started
+    if results.empty:
+        print("No ticker had enough history to forecast.")
+        return 1
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    write_results(results, args.out)
+    print(f"{len(results)}/{len(tickers)} tickers in {elapsed:.1f}s "
+          f"({len(results) / elapsed:.1f} tickers/s) -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,426 @@
+"""Offline end-to-end benchmark of the prediction pipeline, as a JSON report.
+
+    python benchmark.py --json bench.json                 # synthetic prices
+    python benchmark.py --fixtures fixtures/prices --json bench.json
+    python benchmark.py --record fixtures/prices TCS.NS INFY.NS   # save cached series as fixtures
+    python benchmark.py --compare bench.json              # rerun and diff; exit 1 on regressions
+
+No network and no MySQL: prices come from seeded synthetic series or recorded
+CSV fixtures (Date,Open,High,Low,Close,Volume, see fetcher.CsvDirSource) loaded
+into a temporary PriceStore, and history queries run through database.py
+against a SQLite stand-in plugged into the connection pool.
+
+Stages are timed separately (window construction, model inference per batch
+size, the 30-day forecast, the trading strategy, history queries), then whole
+requests (store lookup through charts and profit, like the prediction page
+with cold caches) at 1 and N concurrent sessions. Peak RSS is recorded after
+each section.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from dbpool import SqliteConnection
+from forecaster import HORIZON, LOOKBACK, forecast, smooth
+from strategy import compound, plan_trades
+from windowing import sliding_windows, train_test_split
+
+BATCH_SIZES = (1, 8, 32, 128, 512)
+# Differences below this are noise whatever the ratio
+NOISE_MS = 0.5
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def timed(fn, repeats=10, warmup=1):
+    """Latency stats (ms) of `repeats` calls of fn() after `warmup` untimed ones."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        started = perf_counter()
+        fn()
+        samples.append((perf_counter() - started) * 1e3)
+    return latency_stats(samples)
+
+
+def latency_stats(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {"runs": len(samples), "p50_ms": float(np.percentile(samples, 50)),
+            "p95_ms": float(np.percentile(samples, 95)), "min_ms": float(samples.min()),
+            "mean_ms": float(samples.mean())}
+
+
+# ------------------- Fixtures -------------------
+
+def synthetic_frames(n_tickers, n_days, seed=0):
+    """Seeded OHLCV frames ending yesterday, shaped like yf.download's."""
+    from backtest import synthetic_prices
+
+    index = pd.bdate_range(end=date.today() - pd.Timedelta(days=1), periods=n_days, name="Date")
+    rng = np.random.default_rng(seed + 1)
+    frames = {}
+    for ticker, close in synthetic_prices(n_tickers, n_days, seed).items():
+        spread = close * rng.uniform(0, 0.01, n_days)
+        frames[ticker] = pd.DataFrame({"Open": close + spread * rng.uniform(-1, 1, n_days),
+                                       "High": close + spread, "Low": close - spread, "Close": close,
+                                       "Volume": rng.integers(10**5, 10**7, n_days).astype(float)},
+                                      index=index)
+    return frames
+
+
+def fixture_frames(directory):
+    from fetcher import CsvDirSource
+
+    source = CsvDirSource(directory)
+    tickers = sorted(name[:-4] for name in os.listdir(directory) if name.endswith(".csv"))
+    return {ticker: source(ticker, None, None) for ticker in tickers}
+
+
+def record_fixtures(tickers, directory):
+    """Write the price store's series for `tickers` as CSV fixtures."""
+    from priceStore import get_price_store
+
+    os.makedirs(directory, exist_ok=True)
+    store = get_price_store()
+    for ticker in tickers:
+        frame = store.get(ticker)
+        if frame.empty:
+            print(f"Skipping {ticker}: no data")
+            continue
+        frame.to_csv(os.path.join(directory, f"{ticker.upper()}.csv"), index_label="Date")
+        print(f"{ticker}: {len(frame)} bars")
+
+
+def offline_store(frames, root):
+    """A PriceStore in `root` filled from `frames`; it never reaches the network afterwards."""
+    from priceStore import PriceStore
+
+    store = PriceStore(root, fetcher=lambda ticker, start=None, end=None: frames[ticker],
+                       currency_fetcher=lambda ticker: "INR", ttl=float("inf"))
+    for ticker in frames:
+        store.update(ticker)
+    return store
+
+
+# ------------------- Database stand-in -------------------
+
+HISTORY_SCHEMA = """
+CREATE TABLE history (
+    Id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT, company_name TEXT, company_ticker TEXT,
+    investment_amount REAL, final_value REAL, total_profit REAL,
+    timestamp TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_history_username_id ON history (username, Id);
+"""
+
+
+def sqlite_history(path, users=20, rows_per_user=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(HISTORY_SCHEMA)
+    tickers = [f"SYN{i:03d}" for i in range(50)]
+    rows = []
+    for i in range(users * rows_per_user):
+        invested = float(rng.integers(1, 100)) * 1000
+        final = invested * float(rng.normal(1.02, 0.05))
+        rows.append((f"user{i % users}", "Synthetic", tickers[i % len(tickers)], invested, final,
+                     final - invested))
+    conn.executemany("INSERT INTO history (username, company_name, company_ticker, investment_amount, "
+                     "final_value, total_profit) VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def bench_history(tmp, repeats):
+    try:
+        import database
+    except ImportError as e:
+        return {"skipped": f"database.py unavailable: {e}"}
+    path = os.path.join(tmp, "history.db")
+    sqlite_history(path)
+    database.configure_pool(factory=lambda: SqliteConnection(path))
+
+    def uncached(call):
+        def run():
+            database.invalidate_history("user0")
+            call()
+        return run
+
+    first = lambda: database.fetch_history_page("user0", page_size=25)
+    cursor = database.fetch_history_page("user0", page_size=25)[1]
+    for _ in range(20):
+        cursor = database.fetch_history_page("user0", before_id=cursor, page_size=25)[1]
+    deep = lambda: database.fetch_history_page("user0", before_id=cursor, page_size=25)
+    return {
+        "first_page": timed(uncached(first), repeats),
+        "page_21": timed(uncached(deep), repeats),
+        "summary": timed(uncached(lambda: database.history_summary("user0")), repeats),
+        "first_page_cached": timed(first, repeats),
+        "pool": database.pool_metrics(),
+    }
+
+
+# ------------------- Pipeline stages -------------------
+
+def bench_windows(close, repeats):
+    def build():
+        _, test = train_test_split(close, train_fraction=0.80, lookback=LOOKBACK)
+        x, y = sliding_windows(test.reshape(-1, 1), lookback=LOOKBACK)
+        # Materialise, as model.predict does
+        return np.ascontiguousarray(x, dtype=np.float32)
+    return timed(build, repeats)
+
+
+def bench_inference(model, batch_sizes, repeats, features=1):
+    rng = np.random.default_rng(0)
+    results = {}
+    for batch in batch_sizes:
+        x = rng.random((batch, LOOKBACK, features), dtype=np.float32)
+        stats = timed(lambda: model.predict(x), repeats)
+        stats["windows_per_s"] = batch / (stats["p50_ms"] / 1e3)
+        results[str(batch)] = stats
+    return results
+
+
+def bench_forecast(model, repeats, horizon=HORIZON, features=1):
+    seed = np.random.default_rng(0).random((1, LOOKBACK, features), dtype=np.float32)
+    return timed(lambda: smooth(forecast(model, seed, horizon=horizon), window=3), repeats)
+
+
+def bench_strategy(repeats):
+    prices = 100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, HORIZON)))
+
+    def run():
+        buys, sells = plan_trades(prices)
+        return compound(prices, buys, sells, 1000.0)
+    return {"unlimited": timed(run, repeats * 100),
+            "max_trades_3": timed(lambda: plan_trades(prices, max_trades=3, cost=0.001), repeats * 100)}
+
+
+# ------------------- Whole requests -------------------
+
+def full_request(store, ticker, model, end, features=None, feature_store=None):
+    """What the prediction page does for one ticker with cold forecast and chart caches.
+
+    With several `features` the inputs come from `feature_store`, as in app.get_prediction().
+    """
+    from charts import figures
+    from forecastCache import ForecastCache
+    from pipeline import predict_ticker
+
+    data = store.get(ticker, end=end)
+    matrix = None
+    if features and len(features) > 1:
+        matrix, scaler = feature_store.inputs(ticker, features, rows=len(data), end=end)
+    else:
+        scaler = store.scaler(ticker)
+    result = predict_ticker(ticker, data, store.indicators(ticker, end=end), model, scaler, features=matrix)
+    result["currency"] = store.currency(ticker)
+    figures(ticker, result, version="benchmark", cache=ForecastCache(disk_dir=None))
+    compound(result["prices"], result["buys"], result["sells"], 1000.0)
+
+
+def bench_concurrency(store, tickers, model, sessions, requests_per_session, features=None,
+                      feature_store=None):
+    end = datetime.today().strftime('%Y-%m-%d')
+    latencies, lock = [], threading.Lock()
+
+    def session(i):
+        for k in range(requests_per_session):
+            ticker = tickers[(i * requests_per_session + k) % len(tickers)]
+            started = perf_counter()
+            full_request(store, ticker, model, end, features, feature_store)
+            with lock:
+                latencies.append((perf_counter() - started) * 1e3)
+
+    started = perf_counter()
+    with ThreadPoolExecutor(sessions) as pool:
+        list(pool.map(session, range(sessions)))
+    elapsed = perf_counter() - started
+    stats = latency_stats(latencies)
+    stats.update(sessions=sessions, wall_s=elapsed, requests_per_s=len(latencies) / elapsed)
+    return stats
+
+
+# ------------------- Report -------------------
+
+def _installed_version(*distributions):
+    """Version of the first installed distribution, read without importing it (None if absent)."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    for name in distributions:
+        try:
+            return version(name)
+        except PackageNotFoundError:
+            pass
+    return None
+
+
+def environment(model_path):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+            "tensorflow": _installed_version("tensorflow", "tensorflow-cpu"), "cpus": os.cpu_count(), "platform": platform.platform(),
+            "model": model_path, "started": datetime.now().isoformat(timespec="seconds")}
+
+
+def run(frames, model_path=None, repeats=10, batch_sizes=BATCH_SIZES, concurrency=(1, 4),
+        requests_per_session=2):
+    from backtest import resolve_model
+    from predictor import load_predictor
+
+    model_path, features = resolve_model(model_path)
+    width = len(features)
+    report = {"environment": dict(environment(model_path), features=features),
+              "fixtures": {"tickers": len(frames), "bars": int(sum(len(f) for f in frames.values()))},
+              "stages": {}, "rss_mb": {"start": peak_rss_mb()}}
+    stages, rss = report["stages"], report["rss_mb"]
+    started = perf_counter()
+    model = load_predictor(model_path)
+    model.predict(np.zeros((1, LOOKBACK, width), dtype=np.float32))
+    stages["model_load"] = {"p50_ms": (perf_counter() - started) * 1e3, "runs": 1}
+    rss["model"] = peak_rss_mb()
+
+    tickers = sorted(frames)
+    close = frames[tickers[0]]["Close"].to_numpy()
+    stages["windows"] = bench_windows(close, repeats)
+    stages["inference"] = bench_inference(model, batch_sizes, repeats, width)
+    stages["forecast_30d"] = bench_forecast(model, max(3, repeats // 3), features=width)
+    stages["strategy"] = bench_strategy(repeats)
+    rss["stages"] = peak_rss_mb()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stages["history"] = bench_history(tmp, repeats)
+        started = perf_counter()
+        store = offline_store(frames, os.path.join(tmp, "prices"))
+        stages["store_fill"] = {"p50_ms": (perf_counter() - started) * 1e3, "runs": 1}
+        feature_store = None
+        if width > 1:
+            from featureStore import FeatureStore
+
+            feature_store = FeatureStore(store, os.path.join(tmp, "features"))
+        end = datetime.today().strftime('%Y-%m-%d')
+        # first-call costs (matplotlib, fonts)
+        full_request(store, tickers[0], model, end, features, feature_store)
+        report["requests"] = {str(n): bench_concurrency(store, tickers, model, n, requests_per_session,
+                                                        features, feature_store)
+                              for n in concurrency}
+    rss["peak"] = peak_rss_mb()
+    return report
+
+
+def _flatten(report, prefix=""):
+    for key, value in report.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", value
+
+
+def compare(old, new, threshold=0.10):
+    """[(metric, old, new, change)] of the metrics that got worse by more than `threshold`.
+
+    Latencies (p50/p95, lower is better) and throughputs (*_per_s, higher is better)
+    are compared; everything else is context.
+    """
+    old_metrics = dict(_flatten({k: old.get(k, {}) for k in ("stages", "requests")}))
+    regressions = []
+    for name, value in _flatten({k: new.get(k, {}) for k in ("stages", "requests")}):
+        before = old_metrics.get(name)
+        if not isinstance(before, (int, float)) or not isinstance(value, (int, float)) or not before:
+            continue
+        if name.endswith(("p50_ms", "p95_ms")):
+            worse = value > before * (1 + threshold) and value - before > NOISE_MS
+        elif name.endswith("_per_s"):
+            worse = value < before / (1 + threshold)
+        else:
+            continue
+        if worse:
+            regressions.append((name, before, value, value / before - 1))
+    return regressions
+
+
+def print_report(report):
+    stages = report["stages"]
+    print(f"model load            {stages['model_load']['p50_ms']:9.1f} ms")
+    print(f"windows               {stages['windows']['p50_ms']:9.3f} ms")
+    for batch, stats in stages["inference"].items():
+        print(f"predict batch {batch:>4}    {stats['p50_ms']:9.2f} ms  {stats['windows_per_s']:9.0f} windows/s")
+    print(f"forecast 30 days      {stages['forecast_30d']['p50_ms']:9.1f} ms")
+    print(f"strategy              {stages['strategy']['unlimited']['p50_ms']:9.3f} ms")
+    history = stages["history"]
+    if "skipped" in history:
+        print(f"history               skipped ({history['skipped']})")
+    else:
+        for name in ("first_page", "page_21", "summary", "first_page_cached"):
+            print(f"history {name:<13} {history[name]['p50_ms']:9.2f} ms")
+    for sessions, stats in report["requests"].items():
+        print(f"requests x{sessions:<3}         p50 {stats['p50_ms']:8.0f} ms  p95 {stats['p95_ms']:8.0f} ms  "
+              f"{stats['requests_per_s']:6.2f} req/s")
+    print(f"peak RSS              {report['rss_mb']['peak']:9.0f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the prediction pipeline.")
+    parser.add_argument('tickers', nargs='*', help="with --record: tickers to save as fixtures")
+    parser.add_argument('--fixtures', help="directory of <TICKER>.csv price fixtures")
+    parser.add_argument('--record', metavar='DIR', help="save cached prices of the tickers as fixtures")
+    parser.add_argument('--synthetic', type=int, default=8, help="synthetic tickers (without --fixtures)")
+    parser.add_argument('--days', type=int, default=2500, help="bars per synthetic ticker")
+    parser.add_argument('--model', help="model file (default: what the app serves)")
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--batch-sizes', default=",".join(map(str, BATCH_SIZES)))
+    parser.add_argument('--concurrency', default="1,4", help="concurrent sessions to test")
+    parser.add_argument('--requests', type=int, default=2, help="requests per session")
+    parser.add_argument('--json', help="write the report here")
+    parser.add_argument('--compare', help="previous --json report; exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed slowdown (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record_fixtures(args.tickers, args.record)
+        return 0
+    frames = fixture_frames(args.fixtures) if args.fixtures else synthetic_frames(args.synthetic, args.days)
+    report = run(frames, model_path=args.model, repeats=args.repeats,
+                 batch_sizes=[int(b) for b in args.batch_sizes.split(",")],
+                 concurrency=[int(c) for c in args.concurrency.split(",")],
+                 requests_per_session=args.requests)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before:.3f} -> {after:.3f} ({change:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,319 @@
+"""Charts for the prediction page, downsampled to screen resolution and cached.
+
+A multi-decade daily series has far more points than the figure has pixels, so
+series are reduced with LTTB (shape-preserving) or min/max bucketing (keeps every
+peak and trough) before plotting. Rendered PNGs are cached process-wide by
+ticker and as-of date (plus model version for the model's charts), and every
+figure is cleared as soon as it is saved.
+
+Matplotlib's Agg backend already simplifies long line paths, so downsampling
+only shortens the PNG render well above ~10k points (and keeps the client-side
+charts small); for daily bars the saving on reruns comes from the cache.
+"""
+import io
+import os
+import threading
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from forecastCache import ForecastCache
+
+MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "2000"))
+CACHE_MB = float(os.getenv("CHART_CACHE_MB", "64"))
+# Send downsampled arrays to Streamlit's client-side line charts instead of PNGs
+CLIENT_CHARTS = os.getenv("CLIENT_CHARTS", "0") == "1"
+
+
+def lttb(y, n_out, x=None):
+    """Indices of `n_out` points chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; each bucket in between contributes
+    the point forming the largest triangle with the previous pick and the mean of
+    the next bucket. The triangle area is linear in the previous pick, so every
+    bucket's coefficients are computed up front as (buckets, width) matrices and the
+    sequential part is one small expression per bucket. NaNs (e.g. the warm-up of a
+    moving average) are never picked unless a bucket holds nothing else.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    starts, stops = edges[:-1], edges[1:]
+    cols = starts[:, None] + np.arange(int((stops - starts).max()))
+    valid = cols < stops[:, None]
+    cols = np.minimum(cols, n - 1)
+    X, Y = x[cols], y[cols]
+    valid &= np.isfinite(Y)
+    count = valid.sum(axis=1)
+    fallback = np.nanmean(y) if np.isfinite(y).any() else 0.0
+    mean_x = np.where(valid, X, 0.0).sum(axis=1) / np.maximum(count, 1)
+    mean_y = np.where(count > 0, np.where(valid, Y, 0.0).sum(axis=1) / np.maximum(count, 1), fallback)
+    # Each bucket looks ahead to the next bucket's mean; the last one to the final point
+    ax = np.append(mean_x[1:], x[-1])[:, None]
+    ay = np.append(mean_y[1:], y[-1] if np.isfinite(y[-1]) else fallback)[:, None]
+    # |area| * 2 = |xa * P + ya * Q + R| for previous pick (xa, ya)
+    P = np.where(valid, Y - ay, 0.0)
+    Q = np.where(valid, ax - X, 0.0)
+    R = np.where(valid, X * ay - ax * Y, 0.0)
+    penalty = np.where(valid, 0.0, -np.inf)
+
+    idx = np.empty(n_out, dtype=np.intp)
+    idx[0], idx[-1] = 0, n - 1
+    xa, ya = x[0], y[0] if np.isfinite(y[0]) else fallback
+    for i in range(len(starts)):
+        k = int(np.argmax(np.abs(xa * P[i] + ya * Q[i] + R[i]) + penalty[i]))
+        idx[i + 1] = cols[i, k]
+        if valid[i, k]:
+            xa, ya = X[i, k], Y[i, k]
+    return idx
+
+
+def _loop_lttb(y, n_out):
+    # Textbook per-bucket LTTB, kept as the reference for tests/test_charts.py.
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    idx, a = [0], 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx.append(a)
+    return np.array(idx + [n - 1])
+
+
+def minmax(y, n_out):
+    """Indices of the min and max of each of n_out // 2 buckets, plus both ends."""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    buckets = n_out // 2
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.where(np.isnan(padded), np.inf, padded).argmin(axis=1)
+    highs = offsets + np.where(np.isnan(padded), -np.inf, padded).argmax(axis=1)
+    idx = np.unique(np.concatenate(([0, n - 1], lows, highs)))
+    return idx[idx < n]
+
+
+def downsample(y, n_out=MAX_POINTS, method="lttb"):
+    return lttb(y, n_out) if method == "lttb" else minmax(y, n_out)
+
+
+def to_png(fig):
+    """Render and release a figure; returns the PNG bytes."""
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format="png")
+    finally:
+        fig.clear()
+    return buffer.getvalue()
+
+
+def moving_average_png(stock, dates, close, sma_100, sma_200, max_points=MAX_POINTS):
+    # Indices come from the close series and are applied to the averages too,
+    # so all three lines share the same x positions.
+    keep = downsample(close, max_points)
+    fig = Figure(figsize=(18, 10))
+    ax = fig.subplots()
+    ax.plot(dates[keep], sma_100[keep], 'r', label="100 Days average")
+    ax.plot(dates[keep], sma_200[keep], 'b', label="200 Days average")
+    ax.plot(dates[keep], close[keep], 'g', label='closing price')
+    ax.legend()
+    ax.set_xlabel('No of Days')
+    ax.set_ylabel('Closing Price')
+    ax.set_title(f'{stock} closing price vs 100 days average vs 200 days closing price')
+    return to_png(fig)
+
+
+def prediction_png(y, y_predict, max_points=MAX_POINTS):
+    keep = downsample(y, max_points)
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    ax.plot(keep, np.asarray(y)[keep], 'b', label='original price')
+    ax.plot(keep, np.asarray(y_predict).reshape(-1)[keep], 'r', label='predicted price')
+    ax.set_xlabel('time')
+    ax.set_ylabel('price')
+    ax.set_title("Test Result of the prediction model using LSTM")
+    ax.legend()
+    return to_png(fig)
+
+
+def future_png(stock, hist_dates, hist_close, future_dates, future_prices, band=None):
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    ax.plot(hist_dates, hist_close, label='Historical Data')
+    ax.plot(future_dates, future_prices, label='Future Predictions')
+    if band is not None:
+        ax.fill_between(future_dates, band[0], band[1], alpha=0.25, label='Prediction band')
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Closing Price")
+    ax.set_title(f"{stock} Price Prediction")
+    ax.legend()
+    ax.tick_params(axis='x', labelrotation=45)
+    return to_png(fig)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_chart_cache():
+    """Process-wide LRU of rendered charts (memory only)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ForecastCache(max_bytes=CACHE_MB * 2**20, disk_dir=None)
+    return _cache
+
+
+def _series(result):
+    data = result["data"]
+    return data.index.values, data["Close"].to_numpy()
+
+
+def figures(stock, result, version=None, cache=None):
+    """PNG bytes of the page's three charts for a pipeline.predict_ticker() result.
+
+    The moving-average chart only depends on the bars, so it is shared by every model
+    version; the test and forecast charts are keyed by `version` as well, and the
+    forecast chart by the number of sampled paths behind its band.
+    """
+    cache = cache or get_chart_cache()
+    as_of = result["as_of"]
+    dates, close = _series(result)
+    lookback = 100
+    return {
+        "moving_average": cache.get_or_compute(
+            (stock, as_of, "moving_average"),
+            lambda: moving_average_png(stock, dates, close, result["sma_100"], result["sma_200"])),
+        "test": cache.get_or_compute(
+            (stock, as_of, version, "test"),
+            lambda: prediction_png(result["y"], result["y_predict"])),
+        "future": cache.get_or_compute(
+            (stock, as_of, version, "future", result.get("samples", 0)),
+            lambda: future_png(stock, dates[-lookback:], close[-lookback:],
+                               result["pred_df"]["Date"], result["pred_df"]["Predicted_Price"],
+                               _band(result))),
+    }
+
+
+def _band(result):
+    pred_df = result["pred_df"]
+    if "Lower_Band" not in pred_df:
+        return None
+    return pred_df["Lower_Band"].to_numpy(), pred_df["Upper_Band"].to_numpy()
+
+
+def line_chart_frames(result, max_points=MAX_POINTS):
+    """Downsampled DataFrames for st.line_chart, as an alternative to figures()."""
+    import pandas as pd
+
+    dates, close = _series(result)
+    keep = downsample(close, max_points)
+    moving_average = pd.DataFrame({"closing price": close[keep],
+                                   "100 Days average": result["sma_100"][keep],
+                                   "200 Days average": result["sma_200"][keep]},
+                                  index=pd.DatetimeIndex(dates[keep], name="Date"))
+    y = np.asarray(result["y"])
+    keep = downsample(y, max_points)
+    test = pd.DataFrame({"original price": y[keep],
+                         "predicted price": np.asarray(result["y_predict"]).reshape(-1)[keep]},
+                        index=pd.Index(keep, name="time"))
+    history = pd.Series(close[-100:], index=pd.DatetimeIndex(dates[-100:]), name="Historical Data")
+    forecast = pd.Series(result["prices"], index=pd.DatetimeIndex(result["pred_df"]["Date"]),
+                         name="Future Predictions")
+    series = [history, forecast]
+    band = _band(result)
+    if band is not None:
+        series += [pd.Series(values, index=forecast.index, name=name)
+                   for name, values in zip(("Lower Band", "Upper Band"), band)]
+    future = pd.concat(series, axis=1)
+    future.index.name = "Date"
+    return {"moving_average": moving_average, "test": test, "future": future}
+
+
+if __name__ == "__main__":
+    import gc
+    import tracemalloc
+    from time import perf_counter
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    plt.rcParams["figure.max_open_warning"] = 0
+
+    rng = np.random.default_rng(0)
+
+    def timed(fn, repeats=5):
+        started = perf_counter()
+        for _ in range(repeats):
+            fn()
+        return (perf_counter() - started) / repeats
+
+    # ~40 years of daily bars, and a 100k-point series (intraday or tick history)
+    for n in (10_000, 100_000):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+        dates = np.arange(np.datetime64("1985-01-01"), np.datetime64("1985-01-01") + n)
+        sma = np.convolve(close, np.ones(100) / 100, mode="full")[:n]
+        sma[:99] = np.nan
+        full_s = timed(lambda: moving_average_png("T", dates, close, sma, sma, max_points=n), 3)
+        small_s = timed(lambda: moving_average_png("T", dates, close, sma, sma), 3)
+        print(f"18x10 moving-average chart, {n:>7} bars: full {full_s * 1e3:4.0f} ms, "
+              f"downsampled to {MAX_POINTS} {small_s * 1e3:4.0f} ms")
+    # Agg already simplifies long line paths, so downsampling only pays off well above
+    # ~10k points; for daily bars the saving on reruns comes from the cache below.
+
+    n = 10_000
+    close, dates, sma = close[:n], dates[:n], sma[:n]
+
+    def pyplot_rerun():
+        # What main() did on every rerun: a new pyplot figure that is never closed
+        plt.figure(figsize=(18, 10))
+        plt.plot(dates, sma)
+        plt.plot(dates, sma)
+        plt.plot(dates, close)
+        plt.savefig(io.BytesIO(), format="png")
+
+    cache = ForecastCache(max_bytes=CACHE_MB * 2**20, disk_dir=None)
+    reruns = iter(range(10**6))
+
+    def cold_rerun():
+        # A new as-of date every time: always rendered, then cached (the PNGs are the memory growth)
+        key = ("T", next(reruns), "moving_average")
+        return cache.get_or_compute(key, lambda: moving_average_png("T", dates, close, sma, sma))
+
+    def cached_rerun():
+        return cache.get_or_compute(("T", "2025-01-02", "moving_average"),
+                                    lambda: moving_average_png("T", dates, close, sma, sma))
+
+    for label, rerun in (
+        ("pyplot, unclosed", pyplot_rerun),
+        ("charts, cold", cold_rerun),
+        ("charts, cache hit", cached_rerun),
+    ):
+        rerun()
+        elapsed = timed(rerun, 10)
+        # Memory is measured separately: tracemalloc slows every allocation down
+        gc.collect()
+        tracemalloc.start()
+        for _ in range(10):
+            rerun()
+        gc.collect()
+        grown, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"10 reruns, {label:<17}: {elapsed * 1e3:8.3f} ms/rerun, "
+              f"memory grew {grown / 2**20:6.1f} MB, open pyplot figures {len(plt.get_fignums())}")
+        plt.close("all")
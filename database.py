@@ -1,91 +1,260 @@
 import pymysql as mysql
-import pandas as pd
 import streamlit as st
 import os
-from dotenv import load_dotenv
-load_dotenv()
+import threading
+from contextlib import contextmanager
+from cachetools import TTLCache
+from dbpool import ConnectionPool, PoolTimeout
+from historyWriter import HistoryWriter
+from tracing import span, traced
+
+_env_loaded = False
+
+def load_env():
+    """Read .env into os.environ once per process (on first use, not at import)."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+def history_page_size():
+    load_env()
+    return int(os.getenv("HISTORY_PAGE_SIZE", "25"))
+
+# Short-lived per-user cache of history pages and aggregates; insert_history() invalidates it.
+_history_cache = None
+_history_cache_lock = threading.Lock()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _connect():
+    # autocommit so a pooled connection never holds a stale read snapshot between checkouts
+    return mysql.connect(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT","12564")),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+        autocommit=True
+    )
+
+def configure_pool(factory=None, **options):
+    """(Re)create the shared pool; `factory` plugs in a stand-in, e.g. dbpool.SqliteConnection."""
+    global _pool
+    load_env()
+    options.setdefault("size", int(os.getenv("DB_POOL_SIZE", "5")))
+    options.setdefault("idle_timeout", float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")))
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(factory or _connect, **options)
+    return _pool
+
+def get_pool():
+    if _pool is None:
+        configure_pool()
+    return _pool
+
+def pool_metrics():
+    return get_pool().metrics()
+
+@contextmanager
 def get_db_connection():
+    pool = get_pool()
     try:
-        connection = mysql.connect(
-            host=os.getenv("DB_HOST"),
-            port=int(os.getenv("DB_PORT","12564")),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME")
-        )
-        return connection
+        with span("db.checkout"):
+            connection = pool.checkout()
+    except PoolTimeout:
+        # Transient (every connection busy): the caller reports it and the page goes on
+        raise
     except Exception as e:
         st.error(f"Connection error: {e}")
         st.stop()
+    broken = True
+    try:
+        yield connection
+        broken = False
+    finally:
+        pool.release(connection, broken=broken)
 
+@traced("db.authenticate_user")
 def authenticate_user(username, password):
     username = username.strip().lower()
-    conn = get_db_connection()
     try:
-        cursor = conn.cursor()
-        query = "SELECT COUNT(*) FROM userlogin WHERE userName=%s AND userPassword=%s"
-        cursor.execute(query, (username, password))
-        result = cursor.fetchone()
-        return result and result[0] == 1
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                query = "SELECT COUNT(*) FROM userlogin WHERE userName=%s AND userPassword=%s"
+                cursor.execute(query, (username, password))
+                result = cursor.fetchone()
+                return result and result[0] == 1
+            finally:
+                cursor.close()
     except Exception as e:
         st.error(f"Authentication error: {e}")
         return False
-    finally:
-        conn.close()
 
+@traced("db.register_user")
 def register_user(username, password):
     username = username.strip().lower()
-    conn = get_db_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM userlogin WHERE userName=%s", (username,))
-        if cursor.fetchone()[0] > 0:
-            st.warning("Username already exists.")
-            return False
-        cursor.execute("INSERT INTO userlogin (userName, userPassword) VALUES (%s, %s)", (username, password))
-        conn.commit()
-        st.success("Account created! Please log in.")
-        return True
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT COUNT(*) FROM userlogin WHERE userName=%s", (username,))
+                if cursor.fetchone()[0] > 0:
+                    st.warning("Username already exists.")
+                    return False
+                cursor.execute("INSERT INTO userlogin (userName, userPassword) VALUES (%s, %s)", (username, password))
+                conn.commit()
+                st.success("Account created! Please log in.")
+                return True
+            finally:
+                cursor.close()
     except Exception as e:
         st.error(f"Registration error: {e}")
         return False
-    finally:
-        conn.close()
-def insert_history(username, company_name, company_ticker, investment_amount, final_value, total_profit):
-    connection = get_db_connection()
-    if connection:
+_INSERT_HISTORY = """
+INSERT INTO history (username, company_name, company_ticker, investment_amount, final_value, total_profit)
+VALUES (%s, %s, %s, %s, %s, %s)
+"""
+_history_writer = None
+
+@traced("db.write_history_rows")
+def _write_history_rows(rows):
+    # Runs on the writer thread, so errors propagate to the writer (which spools them) instead of st.error.
+    pool = get_pool()
+    connection = pool.checkout()
+    broken = True
+    try:
         cursor = connection.cursor()
         try:
-            query = """
-            INSERT INTO history (username, company_name, company_ticker, investment_amount, final_value, total_profit)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(query, (username, company_name, company_ticker, investment_amount, final_value, total_profit))
+            cursor.executemany(_INSERT_HISTORY, rows)
             connection.commit()
-            st.success("Transaction history saved successfully.")
-        except mysql.MySQLError as err:
-            st.error(f"Error saving transaction: {err}")
         finally:
             cursor.close()
-            connection.close()
+        broken = False
+    finally:
+        pool.release(connection, broken=broken)
+    for username in {row[0] for row in rows}:
+        invalidate_history(username)
 
-def seek_history(username):
-    connection = get_db_connection()
-    if connection:
-        cursor = connection.cursor()
+def get_history_writer():
+    global _history_writer
+    load_env()
+    with _pool_lock:
+        if _history_writer is None:
+            _history_writer = HistoryWriter(_write_history_rows,
+                batch_size=int(os.getenv("HISTORY_BATCH_SIZE", "50")),
+                flush_interval=float(os.getenv("HISTORY_FLUSH_INTERVAL", "1.0")))
+    return _history_writer
+
+@traced("db.flush_history")
+def flush_history():
+    """Write any queued history rows now, e.g. before reading the History page."""
+    if _history_writer is not None:
         try:
-            query = "SELECT username, company_name, company_ticker, investment_amount, final_value, total_profit,timestamp FROM history WHERE username = %s order by Id desc"
-            cursor.execute(query, (username,))
-            history_data = cursor.fetchall()
-            if history_data:
-                # Adjust the column names to match the actual table schema
-                df_history = pd.DataFrame(history_data, 
-                    columns=["Username", "Company Name", "Company Ticker", "Investment Amount", "Final Value", "Total Profit", "Transaction Date"])
-                st.dataframe(df_history)
-            else:
-                st.warning("No history found.")
-        except mysql.connector.Error as err:
-            st.error(f"Error fetching transaction history: {err}")
-        finally:
-            cursor.close()
-            connection.close()
\ No newline at end of file
+            _history_writer.flush()
+        except (mysql.MySQLError, PoolTimeout) as err:
+            st.error(f"Error saving queued transactions: {err}")
+
+@traced("db.insert_history")
+def insert_history(username, company_name, company_ticker, investment_amount, final_value, total_profit):
+    # Only enqueues; the background writer batches the INSERTs.
+    writer = get_history_writer()
+    writer.enqueue((username, company_name, company_ticker, float(investment_amount), float(final_value), float(total_profit)))
+    if writer.metrics()["spool_pending"]:
+        # The last write failed; rows wait in the local spool until the database is back
+        st.warning("Transaction queued, but the history database is unreachable; "
+                   "it will be saved once the connection is restored.")
+    else:
+        st.success("Transaction queued; it will appear in your history shortly.")
+
+def _get_history_cache():
+    # Caller holds _history_cache_lock
+    global _history_cache
+    if _history_cache is None:
+        load_env()
+        _history_cache = TTLCache(maxsize=1024, ttl=float(os.getenv("HISTORY_CACHE_TTL", "60")))
+    return _history_cache
+
+def invalidate_history(username):
+    with _history_cache_lock:
+        cache = _get_history_cache()
+        for key in [key for key in list(cache.keys()) if key[0] == username]:
+            cache.pop(key, None)
+
+def _cached_history(key, load):
+    with _history_cache_lock:
+        cache = _get_history_cache()
+        if key in cache:
+            return cache[key]
+    value = load()
+    with _history_cache_lock:
+        cache[key] = value
+    return value
+
+@traced("db.fetch_history_page")
+def fetch_history_page(username, before_id=None, page_size=None):
+    """One page of history, newest first, using keyset pagination on (username, Id).
+
+    Returns (rows, next_before_id); next_before_id is None on the last page.
+    """
+    page_size = page_size or history_page_size()
+    def load():
+        query = "SELECT Id, username, company_name, company_ticker, investment_amount, final_value, total_profit, timestamp FROM history WHERE username = %s"
+        params = [username]
+        if before_id is not None:
+            query += " AND Id < %s"
+            params.append(before_id)
+        query += " ORDER BY Id DESC LIMIT %s"
+        params.append(page_size + 1)
+        with get_db_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        next_before_id = rows[page_size - 1][0] if len(rows) > page_size else None
+        return [row[1:] for row in rows[:page_size]], next_before_id
+    return _cached_history((username, "page", before_id, page_size), load)
+
+@traced("db.history_summary")
+def history_summary(username):
+    """Totals and per-ticker counts for a user, aggregated in SQL."""
+    def load():
+        with get_db_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT COUNT(*), COALESCE(SUM(investment_amount), 0), COALESCE(SUM(total_profit), 0) FROM history WHERE username = %s", (username,))
+                count, invested, profit = cursor.fetchone()
+                cursor.execute("SELECT company_ticker, COUNT(*), SUM(total_profit) FROM history WHERE username = %s GROUP BY company_ticker ORDER BY COUNT(*) DESC", (username,))
+                per_ticker = [{"Company Ticker": ticker, "Transactions": n, "Total Profit": total} for ticker, n, total in cursor.fetchall()]
+            finally:
+                cursor.close()
+        return {"count": count, "total_invested": invested, "total_profit": profit, "per_ticker": per_ticker}
+    try:
+        return _cached_history((username, "summary"), load)
+    except (mysql.MySQLError, PoolTimeout) as err:
+        st.error(f"Error fetching history summary: {err}")
+        return None
+
+def seek_history(username, before_id=None, page_size=None):
+    """Render one page of the user's history and return the cursor for the next page."""
+    import pandas as pd
+    try:
+        history_data, next_before_id = fetch_history_page(username, before_id, page_size)
+    except (mysql.MySQLError, PoolTimeout) as err:
+        st.error(f"Error fetching transaction history: {err}")
+        return None
+    if history_data:
+        # Adjust the column names to match the actual table schema
+        df_history = pd.DataFrame(history_data,
+            columns=["Username", "Company Name", "Company Ticker", "Investment Amount", "Final Value", "Total Profit", "Transaction Date"])
+        st.dataframe(df_history)
+    else:
+        st.warning("No history found.")
+    return next_before_id
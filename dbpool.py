@@ -0,0 +1,179 @@
+import queue
+import sqlite3
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def _ping(conn):
+    # PyMySQL connections can ping; anything else (sqlite3, SqliteConnection) runs a no-op query
+    ping = getattr(conn, "ping", None)
+    if ping is not None:
+        ping(reconnect=False)
+    else:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        finally:
+            cursor.close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of DB-API connections shared across Streamlit sessions.
+
+    At most `size` connections are checked out at once; callers beyond that wait
+    up to `checkout_timeout` seconds. Idle connections older than `idle_timeout`
+    are closed instead of reused, and every reused connection is pinged first so
+    a stale one (server restart, wait_timeout) is replaced transparently.
+    `factory()` opens a new connection; with `lambda: SqliteConnection(path)`
+    the pool and database.py run against a local SQLite file instead of MySQL.
+    """
+
+    def __init__(self, factory, size=5, idle_timeout=300, checkout_timeout=10,
+                 ping=_ping, connect_retries=2):
+        self.factory = factory
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.ping = ping
+        self.connect_retries = connect_retries
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._counters = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "created": 0,
+            "stale": 0,
+            "expired": 0,
+            "discarded": 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _create(self):
+        for attempt in range(self.connect_retries + 1):
+            try:
+                conn = self.factory()
+                self._count("created")
+                return conn
+            except Exception:
+                if attempt == self.connect_retries:
+                    raise
+                time.sleep(0.1 * 2 ** attempt)
+
+    def _healthy(self, conn):
+        if self.ping is None:
+            return True
+        try:
+            self.ping(conn)
+            return True
+        except Exception:
+            return False
+
+    def checkout(self):
+        if not self._slots.acquire(blocking=False):
+            started = time.perf_counter()
+            acquired = self._slots.acquire(timeout=self.checkout_timeout)
+            self._count("waits")
+            self._count("wait_seconds", time.perf_counter() - started)
+            if not acquired:
+                raise PoolTimeout(f"no database connection free after {self.checkout_timeout}s")
+        try:
+            while True:
+                try:
+                    conn, returned_at = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = self._create()
+                    break
+                if time.monotonic() - returned_at > self.idle_timeout:
+                    self._count("expired")
+                    self._close(conn)
+                elif self._healthy(conn):
+                    break
+                else:
+                    self._count("stale")
+                    self._close(conn)
+        except Exception:
+            self._slots.release()
+            raise
+        self._count("checkouts")
+        return conn
+
+    def release(self, conn, broken=False):
+        """Return a connection; `broken` ones are rolled back, or dropped if that fails."""
+        try:
+            if broken:
+                try:
+                    conn.rollback()
+                except Exception:
+                    self._count("discarded")
+                    self._close(conn)
+                    return
+            self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+    def metrics(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters.update(size=self.size, idle=self._idle.qsize())
+        return counters
+
+
+class _SqliteCursor:
+    # database.py's queries use PyMySQL's %s placeholders; sqlite3 wants ?
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        return self._cursor.execute(query.replace("%s", "?"), tuple(params))
+
+    def executemany(self, query, rows):
+        return self._cursor.executemany(query.replace("%s", "?"), rows)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class SqliteConnection:
+    """A SQLite file behind the slice of the PyMySQL connection API database.py uses."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+
+    def cursor(self):
+        return _SqliteCursor(self._conn.cursor())
+
+    def commit(self):
+        pass  # autocommit, like the MySQL connections
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        self._conn.close()
+
@@ -0,0 +1,267 @@
+"""Per-ticker float32 feature matrices on disk, served as zero-copy windows.
+
+Each ticker's features (FEATURES: OHLC, log volume, log return and the
+indicators of indicators.py, one row per stored bar) live in an append-only
+raw float32 file next to a small JSON sidecar. sync() only computes the rows
+added since the last call (plus the trailing bar, which may have been
+revised), and matrix()/windows() return memory-mapped views, so thousands of
+tickers can be served or trained on without loading them into RAM or
+building a DataFrame per request.
+
+Close is always the first column and the forecast target; a model is trained
+on any subset of FEATURES that starts with Close (see train.py
+--features), recorded in its manifest.
+"""
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from indicators import INDICATORS, compute_table
+from priceStore import COLUMNS, get_price_store
+from scaler import MinMaxState
+from windowing import sliding_windows
+
+FEATURE_DIR = os.getenv("FEATURE_STORE_DIR", ".feature_store")
+FEATURES = ["Close", "Open", "High", "Low", "log_volume", "log_return"] + INDICATORS
+_OHLC = [COLUMNS.index(name) for name in ("Close", "Open", "High", "Low")]
+_CLOSE, _VOLUME = COLUMNS.index("Close"), COLUMNS.index("Volume")
+
+
+def compute_rows(ohlcv, indicators, start=0):
+    """float32 feature rows [start, len(ohlcv)) of one ticker (NaN where undefined)."""
+    ohlcv = np.asarray(ohlcv, dtype=np.float64)
+    close = ohlcv[:, _CLOSE]
+    prev = close[start - 1:-1] if start > 0 else np.concatenate(([np.nan], close[:-1]))
+    rows = np.empty((len(ohlcv) - start, len(FEATURES)), dtype=np.float32)
+    rows[:, :4] = ohlcv[start:, _OHLC]
+    rows[:, 4] = np.log1p(np.maximum(ohlcv[start:, _VOLUME], 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rows[:, 5] = np.log(close[start:] / prev)
+    rows[:, 6:] = indicators[start:]
+    return rows
+
+
+def close_features(close, features=None):
+    """(bars, F) features of a bare close series (OHLC = close, constant volume).
+
+    For synthetic series and anything else that never went through the price store.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    ohlcv = np.empty((len(close), len(COLUMNS)))
+    ohlcv[:, _OHLC] = close[:, None]
+    ohlcv[:, _VOLUME] = 1e6
+    return select(compute_rows(ohlcv, compute_table(close)), features)
+
+
+def feature_columns(features=None):
+    """Column indices of `features` (names, default all); Close must come first."""
+    features = list(features or FEATURES)
+    unknown = [name for name in features if name not in FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown features {unknown}; choose from {FEATURES}")
+    if features[0] != "Close":
+        raise ValueError("The first feature must be Close (the forecast target)")
+    return [FEATURES.index(name) for name in features]
+
+
+def select(matrix, features=None):
+    """Columns of `matrix`; a view when they are contiguous (always for the default)."""
+    columns = feature_columns(features)
+    if columns == list(range(columns[0], columns[0] + len(columns))):
+        return matrix[:, columns[0]:columns[0] + len(columns)]
+    return matrix[:, columns]
+
+
+class FeatureStore:
+    def __init__(self, prices=None, root=FEATURE_DIR):
+        self.prices = prices or get_price_store()
+        self.root = root
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._row_bytes = len(FEATURES) * 4
+
+    def _lock_for(self, ticker):
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _path(self, ticker, suffix):
+        safe = re.sub(r"[^A-Za-z0-9._-]", "_", ticker.upper())
+        return os.path.join(self.root, f"{safe}.{suffix}")
+
+    def _read_meta(self, ticker):
+        try:
+            with open(self._path(ticker, "json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, ticker, meta):
+        path = self._path(ticker, "json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def _stored_rows(self, ticker):
+        try:
+            return os.path.getsize(self._path(ticker, "f32")) // self._row_bytes
+        except OSError:
+            return 0
+
+    def sync(self, ticker):
+        """Bring the ticker's features up to date with the price store; returns the row count.
+
+        Rows before the trailing stored one are final, so they are never rewritten:
+        the trailing row is overwritten in place and new rows appended. The file
+        only shrinks (by being replaced) when the stored history no longer lines up.
+        """
+        dates, ohlcv, indicators = self.prices.arrays(ticker)
+        if dates is None:
+            return 0
+        n = len(dates)
+        path = self._path(ticker, "f32")
+        with self._lock_for(ticker):
+            meta = self._read_meta(ticker)
+            stored = min(self._stored_rows(ticker), meta.get("rows", 0))
+            last_close = float(ohlcv[-1, _CLOSE])
+            lined_up = (0 < stored <= n and meta.get("columns") == FEATURES
+                        and meta.get("first_date") == str(dates[0])
+                        and meta.get("last_date") == str(dates[stored - 1]))
+            if lined_up and stored == n and meta.get("last_close") == last_close:
+                return n
+            # Created on first write, so read-only use leaves no directory behind
+            os.makedirs(self.root, exist_ok=True)
+            if lined_up:
+                start = stored - 1
+                rows = compute_rows(ohlcv, indicators, start)
+                with open(path, "r+b") as f:
+                    f.seek(start * self._row_bytes)
+                    f.write(rows.tobytes())
+            else:
+                start, rows = 0, compute_rows(ohlcv, indicators)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(rows.tobytes())
+                # Replacing (never truncating) keeps readers' existing maps valid
+                os.replace(path + ".tmp", path)
+            valid_from = meta.get("valid_from") if lined_up else None
+            if valid_from is None:
+                finite = np.isfinite(rows).all(axis=1)
+                valid_from = start + int(finite.argmax()) if finite.any() else None
+            meta.update(rows=n, columns=FEATURES, first_date=str(dates[0]),
+                        last_date=str(dates[n - 1]), last_close=last_close,
+                        valid_from=valid_from)
+            self._write_meta(ticker, meta)
+        return n
+
+    def matrix(self, ticker, features=None, end=None):
+        """(rows, len(features)) float32 memory map of the ticker's synced features.
+
+        `end` (exclusive date) drops later rows. None if the ticker was never synced.
+        """
+        with self._lock_for(ticker):
+            rows = min(self._stored_rows(ticker), self._read_meta(ticker).get("rows", 0))
+            if rows == 0:
+                return None
+            matrix = np.memmap(self._path(ticker, "f32"), dtype=np.float32, mode="r",
+                               shape=(rows, len(FEATURES)))
+        if end is not None:
+            dates, _ = self.prices.bars(ticker)
+            matrix = matrix[:np.searchsorted(dates[:rows], np.datetime64(end, "D"))]
+        return select(matrix, features)
+
+    def valid_from(self, ticker):
+        """First row where every feature is defined (after the longest indicator warm-up)."""
+        return self._read_meta(ticker).get("valid_from")
+
+    def windows(self, ticker, lookback=100, features=None, horizon=1, stride=1, end=None):
+        """Zero-copy (x, y) windows over the ticker's defined rows; y is the Close column."""
+        matrix, start = self.matrix(ticker, features, end), self.valid_from(ticker)
+        if matrix is None or start is None:
+            return None, None
+        return sliding_windows(matrix[start:], lookback=lookback, horizon=horizon, stride=stride, target=0)
+
+    def scaler(self, ticker, features=None, end=None):
+        """Per-feature min/max of the ticker's defined rows, or None."""
+        matrix, start = self.matrix(ticker, features, end), self.valid_from(ticker)
+        if matrix is None or start is None or start >= len(matrix):
+            return None
+        return MinMaxState().update(matrix[start:])
+
+    def inputs(self, ticker, features, rows=None, end=None):
+        """(matrix, scaler) for a multi-feature model: sync, then the first `rows` rows.
+
+        `rows` aligns the matrix with a price frame read earlier (bars are only ever
+        appended, so that frame is a prefix). (None, None) without enough history.
+        """
+        self.sync(ticker)
+        matrix, scaler = self.matrix(ticker, features, end), self.scaler(ticker, features, end)
+        if matrix is None or scaler is None:
+            return None, None
+        return (matrix if rows is None else matrix[:rows]), scaler
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_feature_store():
+    """Process-wide feature store over the process-wide price store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FeatureStore()
+    return _store
+
+
+if __name__ == "__main__":
+    import resource
+    import tempfile
+    from time import perf_counter
+
+    import pandas as pd
+
+    from backtest import synthetic_prices
+    from priceStore import PriceStore
+
+    def frame(close, days):
+        index = pd.bdate_range("2010-01-01", periods=days, name="Date")
+        return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                             "Volume": 1e6}, index=index)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Many tickers: the newest window from the memmaps vs a DataFrame per request
+        n_tickers, days = 300, 2500
+        frames = {t: frame(c, days) for t, c in synthetic_prices(n_tickers, days).items()}
+        prices = PriceStore(os.path.join(tmp, "many"), fetcher=lambda t, start=None, end=None: frames[t],
+                            currency_fetcher=lambda t: "INR", ttl=float("inf"))
+        features = FeatureStore(prices, os.path.join(tmp, "many-features"))
+        started = perf_counter()
+        for ticker in frames:
+            prices.update(ticker)
+            features.sync(ticker)
+        build = perf_counter() - started
+        tickers = list(frames)
+        del frames
+        names = ["Close", "log_return", "rsi_14"]
+
+        def from_store(ticker):
+            return np.array(features.windows(ticker, features=names)[0][-1])
+
+        def from_frames(ticker):
+            table = pd.concat([prices.get(ticker), prices.indicators(ticker)], axis=1)
+            table["log_return"] = np.log(table["Close"]).diff()
+            values = table[names].dropna().to_numpy(np.float32)
+            return sliding_windows(values, 100)[0][-1]
+
+        for name, serve in (("feature store", from_store), ("DataFrames", from_frames)):
+            started = perf_counter()
+            for ticker in tickers:
+                serve(ticker)
+            print(f"{name:<14}: {(perf_counter() - started) / n_tickers * 1e3:6.2f} ms per ticker window")
+        size = sum(os.path.getsize(os.path.join(tmp, "many-features", f))
+                   for f in os.listdir(os.path.join(tmp, "many-features")))
+        print(f"synced {n_tickers} x {days} bars in {build:.1f}s ({size / 2**20:.0f} MB of features); "
+              f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
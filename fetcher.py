@@ -0,0 +1,366 @@
+"""Bulk, rate-limited downloads of daily prices into the local price store.
+
+    python fetcher.py --known --watchlist watchlist.txt --rate 2 --workers 8
+    python fetcher.py --source csv-dir:fixtures/prices AAPL MSFT
+    python fetcher.py --source http://localhost:8000 --progress warmup.json
+    python fetcher.py --fake 300                 # local fake server, as a throughput benchmark
+
+Tickers are fetched on a thread pool. Every request to the source takes a token
+from a shared token bucket and is retried with exponential backoff and jitter.
+Results go straight into the PriceStore (incremental, atomic writes), and each
+finished ticker is recorded in a progress file, so an interrupted run resumes
+where it stopped. The file belongs to one run: it is deleted once every ticker
+has been fetched, and entries older than FETCH_PROGRESS_MAX_AGE seconds are
+ignored, so the next warm-up fetches everything again.
+
+A source is any callable `source(ticker, start, end) -> DataFrame` with the
+columns of yf.download (Open, High, Low, Close, Volume) indexed by date; an
+empty frame means the ticker has no data.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from priceStore import CACHE_DIR, PriceStore, yahoo_fetcher
+
+PROGRESS_PATH = os.getenv("FETCH_PROGRESS_PATH", "fetch_progress.json")
+PROGRESS_MAX_AGE = float(os.getenv("FETCH_PROGRESS_MAX_AGE", str(12 * 3600)))
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate or 1.0)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        """Block until `tokens` are available; returns the seconds spent waiting."""
+        if not self.rate:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            self.sleep(wait)
+            waited += wait
+
+
+def backoff_delays(retries, base=0.5, cap=30.0, rng=random.random):
+    """Exponential backoff with jitter: each delay is 50-100% of min(cap, base * 2**n)."""
+    return [min(cap, base * 2 ** attempt) * (0.5 + rng() / 2) for attempt in range(retries)]
+
+
+# ------------------- Sources -------------------
+
+class YahooSource:
+    def __call__(self, ticker, start, end):
+        return yahoo_fetcher(ticker, start, end)
+
+
+def _trim(frame, start, end):
+    if start is not None:
+        frame = frame[frame.index >= pd.Timestamp(start)]
+    if end is not None:
+        frame = frame[frame.index < pd.Timestamp(end)]
+    return frame
+
+
+def _read_csv(text):
+    return pd.read_csv(io.StringIO(text), index_col="Date", parse_dates=True)
+
+
+class CsvDirSource:
+    """Fixture source: <directory>/<TICKER>.csv files with Date,Open,High,Low,Close,Volume."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, ticker, start, end):
+        try:
+            with open(os.path.join(self.directory, f"{ticker.upper()}.csv")) as f:
+                return _trim(_read_csv(f.read()), start, end)
+        except FileNotFoundError:
+            return pd.DataFrame()
+
+
+class HttpCsvSource:
+    """GET {base_url}/{TICKER}.csv?start=&end= returning the same CSV layout.
+
+    404 means no data; other error statuses raise so the fetcher retries them.
+    """
+
+    def __init__(self, base_url, timeout=10):
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def __call__(self, ticker, start, end):
+        params = {key: str(value) for key, value in (("start", start), ("end", end)) if value}
+        response = self.session.get(f"{self.base_url}/{ticker.upper()}.csv", params=params,
+                                    timeout=self.timeout)
+        if response.status_code == 404:
+            return pd.DataFrame()
+        response.raise_for_status()
+        return _read_csv(response.text)
+
+
+def make_source(spec):
+    """'yahoo', 'csv-dir:PATH' or an http(s):// base URL."""
+    if spec == "yahoo":
+        return YahooSource()
+    if spec.startswith("csv-dir:"):
+        return CsvDirSource(spec[len("csv-dir:"):])
+    if spec.startswith(("http://", "https://")):
+        return HttpCsvSource(spec)
+    raise ValueError(f"Unknown source {spec!r}")
+
+
+# ------------------- Bulk fetcher -------------------
+
+class BulkFetcher:
+    """Concurrent, rate-limited, retrying downloads of many tickers into a PriceStore.
+
+    `source` defaults to the store's own fetcher.
+    """
+
+    def __init__(self, store=None, source=None, rate=2.0, burst=5, workers=8, retries=4,
+                 backoff=0.5, progress_path=None, progress_max_age=PROGRESS_MAX_AGE, sleep=time.sleep):
+        root = store.root if store is not None else CACHE_DIR
+        ttl = store.ttl if store is not None else None
+        self.source = source or (store.fetcher if store is not None else YahooSource())
+        self.bucket = TokenBucket(rate, burst, sleep=sleep)
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self.progress_path = progress_path
+        self.progress_max_age = progress_max_age
+        # Same files as `store`, but every network call goes through the limiter and retries
+        self.store = PriceStore(root, fetcher=self._fetch, **({"ttl": ttl} if ttl is not None else {}))
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "retries": 0, "request_errors": 0, "throttled_seconds": 0.0}
+        self._progress = {}
+
+    def _fetch(self, ticker, start=None, end=None):
+        delays = backoff_delays(self.retries, self.backoff)
+        for attempt in range(self.retries + 1):
+            waited = self.bucket.acquire()
+            with self._lock:
+                self._counters["requests"] += 1
+                self._counters["throttled_seconds"] += waited
+            try:
+                return self.source(ticker, start, end)
+            except Exception:
+                with self._lock:
+                    self._counters["request_errors"] += 1
+                if attempt == self.retries:
+                    raise
+                with self._lock:
+                    self._counters["retries"] += 1
+                self.sleep(delays[attempt])
+
+    def _load_progress(self):
+        if not self.progress_path:
+            return {}
+        try:
+            with open(self.progress_path) as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Left over from an interrupted run long ago: those tickers are due again
+        oldest = time.time() - self.progress_max_age
+        return {ticker: entry for ticker, entry in progress.items() if entry.get("at", 0) >= oldest}
+
+    def _record(self, ticker, entry):
+        with self._lock:
+            self._progress[ticker] = entry
+            if self.progress_path:
+                with open(self.progress_path + ".tmp", "w") as f:
+                    json.dump(self._progress, f, indent=1)
+                os.replace(self.progress_path + ".tmp", self.progress_path)
+
+    def _one(self, ticker, force):
+        started = perf_counter()
+        try:
+            bars = self.store.update(ticker, force=force)
+            status, error = ("done" if bars else "empty"), None
+        except Exception as e:
+            bars, status, error = 0, "failed", f"{type(e).__name__}: {e}"
+        seconds = perf_counter() - started
+        self._record(ticker, {"status": status, "bars": bars, "error": error,
+                              "seconds": round(seconds, 3), "at": time.time()})
+        return ticker, status, bars, seconds
+
+    def run(self, tickers, resume=True, force=False):
+        """Fetch every ticker not already done in the progress file; returns a report."""
+        tickers = list(dict.fromkeys(tickers))
+        self._progress = self._load_progress() if resume else {}
+        todo = [t for t in tickers if self._progress.get(t, {}).get("status") != "done"]
+        started = perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(lambda t: self._one(t, force), todo))
+        elapsed = perf_counter() - started
+
+        statuses = [status for _, status, _, _ in results]
+        if "failed" not in statuses and self.progress_path and os.path.exists(self.progress_path):
+            os.remove(self.progress_path)  # run complete; only failures are worth resuming
+        latencies = np.array([seconds for *_, seconds in results]) if results else np.zeros(1)
+        with self._lock:
+            counters = dict(self._counters)
+        return dict(
+            tickers=len(tickers),
+            resumed=len(tickers) - len(todo),
+            done=statuses.count("done"),
+            empty=statuses.count("empty"),
+            failed=statuses.count("failed"),
+            failures={t: self._progress[t]["error"] for t, status, _, _ in results if status == "failed"},
+            bars=int(sum(bars for _, _, bars, _ in results)),
+            seconds=elapsed,
+            tickers_per_second=len(todo) / elapsed if elapsed else None,
+            error_rate=statuses.count("failed") / len(todo) if todo else 0.0,
+            request_error_rate=counters["request_errors"] / counters["requests"] if counters["requests"] else 0.0,
+            p50_seconds=float(np.percentile(latencies, 50)),
+            p95_seconds=float(np.percentile(latencies, 95)),
+            **counters,
+        )
+
+
+# ------------------- Fake HTTP source -------------------
+
+def serve_fake_prices(n_days=1000, failure_rate=0.1, latency=0.02, seed=0):
+    """Local HTTP server in the HttpCsvSource layout, for tests and benchmarks.
+
+    Every ticker gets a deterministic random walk; `failure_rate` of requests answer
+    503 and tickers starting with "MISSING" answer 404. Returns (server, base_url).
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    rng = random.Random(seed)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=1), periods=n_days)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            ticker = os.path.basename(url.path).removesuffix(".csv")
+            time.sleep(latency)
+            if ticker.startswith("MISSING"):
+                self.send_error(404)
+                return
+            if rng.random() < failure_rate:
+                self.send_error(503)
+                return
+            # crc32, not hash(): str hashes are salted per process
+            walk = np.random.default_rng(zlib.crc32(ticker.encode())).normal(0, 0.01, n_days)
+            close = 100 * np.exp(np.cumsum(walk))
+            frame = pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close,
+                                  "Volume": 1e6}, index=pd.DatetimeIndex(dates, name="Date"))
+            query = parse_qs(url.query)
+            frame = _trim(frame, query.get("start", [None])[0], query.get("end", [None])[0])
+            body = frame.to_csv().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def print_report(report):
+    print(f"{report['tickers']} tickers: {report['done']} done, {report['resumed']} resumed, "
+          f"{report['empty']} without data, {report['failed']} failed")
+    print(f"{report['seconds']:.1f}s, {report['tickers_per_second'] or 0:.1f} tickers/s, "
+          f"{report['bars']} bars, p50 {report['p50_seconds'] * 1e3:.0f} ms, "
+          f"p95 {report['p95_seconds'] * 1e3:.0f} ms per ticker")
+    print(f"{report['requests']} requests, {report['retries']} retries, "
+          f"request error rate {report['request_error_rate']:.1%}, "
+          f"ticker error rate {report['error_rate']:.1%}, "
+          f"throttled {report['throttled_seconds']:.1f}s in total")
+    for ticker, error in report["failures"].items():
+        print(f"  {ticker}: {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download prices for many tickers into the price store.")
+    parser.add_argument('tickers', nargs='*', help="tickers or known company names")
+    parser.add_argument('--watchlist', help="file with one ticker or company name per line")
+    parser.add_argument('--known', action='store_true',
+                        help="include every ticker in company_to_ticker_map")
+    parser.add_argument('--source', default="yahoo", help="yahoo, csv-dir:PATH or http(s)://base-url")
+    parser.add_argument('--rate', type=float, default=2.0, help="requests per second (0: unlimited)")
+    parser.add_argument('--burst', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--retries', type=int, default=4)
+    parser.add_argument('--progress', default=PROGRESS_PATH, help="resumable progress file")
+    parser.add_argument('--fresh', action='store_true', help="ignore the progress file")
+    parser.add_argument('--force', action='store_true', help="refresh even tickers within the cache TTL")
+    parser.add_argument('--store', default=CACHE_DIR, help="price store directory")
+    parser.add_argument('--fake', type=int, metavar='N',
+                        help="benchmark against a local fake server with N tickers")
+    parser.add_argument('--json', help="also write the report here")
+    args = parser.parse_args(argv)
+
+    if args.fake:
+        import tempfile
+
+        server, url = serve_fake_prices()
+        tickers = [f"FAKE{i:04d}" for i in range(args.fake)] + ["MISSING0"]
+        tmp = tempfile.TemporaryDirectory()
+        store, source, progress = PriceStore(tmp.name), HttpCsvSource(url), None
+    else:
+        from batchPredict import _read_watchlist
+        from searchTicker import company_to_ticker_map
+
+        tickers = [company_to_ticker_map.get(t.upper(), t.upper()) for t in args.tickers]
+        if args.watchlist:
+            tickers += _read_watchlist(args.watchlist)
+        if args.known:
+            tickers += list(company_to_ticker_map.values())
+        if not tickers:
+            parser.error("no tickers given (pass tickers, --watchlist, --known or --fake)")
+        store, source, progress = PriceStore(args.store), make_source(args.source), args.progress
+
+    fetcher = BulkFetcher(store, source, rate=args.rate, burst=args.burst, workers=args.workers,
+                          retries=args.retries, progress_path=progress)
+    report = fetcher.run(tickers, resume=not args.fresh, force=args.force)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.fake:
+        server.shutdown()
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,227 @@
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+
+# Process-wide memory cap, and an optional directory that keeps results across restarts.
+MAX_MB = float(os.getenv("FORECAST_CACHE_MB", "256"))
+CACHE_DIR = os.getenv("FORECAST_CACHE_DIR") or None
+MAX_DISK_ENTRIES = int(os.getenv("FORECAST_CACHE_DISK_ENTRIES", "512"))
+
+
+def estimate_size(value):
+    """Approximate bytes held by a result: arrays, frames and PNG bytes dominate."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if hasattr(value, "nbytes"):  # ndarray
+        return int(value.nbytes)
+    if hasattr(value, "memory_usage"):  # DataFrame / Series
+        usage = value.memory_usage(deep=True)
+        return int(getattr(usage, "sum", lambda: usage)())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class _Flight:
+    # One in-progress computation that later callers for the same key wait on.
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ForecastCache:
+    """LRU of per-ticker forecast results shared by every session in the process.
+
+    Keys are (ticker, as-of date, model version), so a new bar or a new model is a
+    new key and old entries simply age out. Entries are evicted least recently used
+    first once their estimated size passes `max_bytes`. get_or_compute() is
+    single-flight: while one caller computes a key, concurrent callers for the same
+    key wait for that result (or its exception) instead of recomputing it.
+
+    With `disk_dir`, results are also pickled there (at most `max_disk_entries`,
+    oldest removed first) so a restarted process starts warm. The directory must only
+    be writable by the app, since entries are unpickled on read.
+    """
+
+    def __init__(self, max_bytes=MAX_MB * 2**20, disk_dir=CACHE_DIR,
+                 max_disk_entries=MAX_DISK_ENTRIES, sizeof=estimate_size):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self.sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0,
+                          "evictions": 0, "errors": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, hashlib.sha1(repr(key).encode()).hexdigest() + ".pkl")
+
+    def _load(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                stored_key, value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated or written by an incompatible version
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        if stored_key != key:
+            return None
+        os.utime(path)  # keeps recently read entries from being pruned
+        return value
+
+    def _save(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+        files = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir)
+                 if name.endswith(".pkl")]
+        if len(files) > self.max_disk_entries:
+            files.sort(key=os.path.getmtime)
+            for old in files[:len(files) - self.max_disk_entries]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+    def _put(self, key, value):
+        # Caller holds the lock
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self._counters["evictions"] += 1
+
+    def get(self, key):
+        """Cached value for `key` from memory, or None. Never computes."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return self._entries[key][0]
+        return None
+
+    def get_or_compute(self, key, compute):
+        """Value for `key`, calling compute() at most once across concurrent callers.
+
+        A None result (e.g. no data or scaler for the ticker yet) is handed to the
+        waiting callers but not cached, so the next request tries again.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return self._entries[key][0]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._counters["coalesced"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = self._load(key)
+            if value is None:
+                with self._lock:
+                    self._counters["misses"] += 1
+                value = compute()
+                if value is not None:
+                    self._save(key, value)
+            else:
+                with self._lock:
+                    self._counters["disk_hits"] += 1
+            if value is not None:
+                with self._lock:
+                    self._put(key, value)
+            flight.value = value
+            return value
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def metrics(self):
+        with self._lock:
+            # Callers that waited on another's computation were served without computing too
+            lookups = sum(self._counters[name] for name in ("hits", "disk_hits", "coalesced", "misses"))
+            return dict(self._counters, entries=len(self._entries), bytes=self._bytes,
+                        in_flight=len(self._flights),
+                        hit_rate=(lookups - self._counters["misses"]) / lookups if lookups else None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_forecast_cache():
+    """Process-wide forecast cache shared by every Streamlit session."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ForecastCache()
+    return _cache
+
+
+if __name__ == "__main__":
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    import numpy as np
+
+    def slow_forecast():
+        time.sleep(0.2)
+        return {"prices": np.zeros(30), "png": b"x" * 100_000}
+
+    # 32 sessions asking for the same ticker at once: one computation
+    cache = ForecastCache(max_bytes=2**20)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(32) as pool:
+        list(pool.map(lambda _: cache.get_or_compute(("TCS.NS", "2025-01-02", "v1"), slow_forecast), range(32)))
+    elapsed = time.perf_counter() - started
+    print(f"32 concurrent requests: {cache.metrics()['misses']} computation in {elapsed * 1e3:.0f} ms, "
+          f"metrics {cache.metrics()}")
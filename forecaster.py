@@ -0,0 +1,133 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from predictor import as_predictor
+
+LOOKBACK = 100
+HORIZON = 30
+
+
+def forecast(model, seeds, horizon=HORIZON, stochastic=False):
+    """Autoregressively forecast `horizon` steps for every seed window at once.
+
+    `model` is a Predictor (see predictor.py) or a Keras model. `seeds` is
+    (N, lookback) or (N, lookback, 1) in model (scaled) units; the result is an
+    (N, horizon) float32 array. Each step is one batched forward pass over
+    all N windows: windows are views into a preallocated (N, lookback + horizon, F)
+    buffer, so nothing is re-appended or copied between steps.
+
+    With F > 1 features (see featureStore.py) the model predicts feature 0 (Close)
+    only; the other features of each forecast step are carried forward from the
+    previous step.
+
+    With `stochastic=True` every step calls the predictor's sample() instead
+    (dropout active, or one ensemble member per block of rows).
+    """
+    seeds = np.asarray(seeds, dtype=np.float32)
+    if seeds.ndim == 2:
+        seeds = seeds[:, :, None]
+    n, lookback, features = seeds.shape
+    buffer = np.empty((n, lookback + horizon, features), dtype=np.float32)
+    buffer[:, :lookback] = seeds
+    predictor = as_predictor(model)
+    step = predictor.sample if stochastic else predictor.predict
+    for t in range(horizon):
+        out = step(buffer[:, t:t + lookback])
+        buffer[:, lookback + t, 0] = out[:, 0]
+        buffer[:, lookback + t, 1:] = buffer[:, lookback + t - 1, 1:]
+    return buffer[:, lookback:, 0].copy()
+
+
+def sample_paths(model, seeds, samples=100, horizon=HORIZON):
+    """`samples` stochastic forecasts per seed window as one batched computation.
+
+    The seeds are stacked `samples` times into a (samples * N) batch and run
+    through forecast(stochastic=True), so every step is a single forward pass
+    over all draws instead of samples x horizon calls. With MC dropout each row
+    gets its own dropout mask; with an EnsemblePredictor and samples equal to the
+    number of members, copy k is forecast by member k. Returns (N, samples, horizon).
+
+    Batching removes the per-call overhead, not the arithmetic: on a CPU the
+    (samples * N)-row pass is compute-bound, so K=100 still costs several times
+    one forecast (see the benchmark below).
+    """
+    seeds = np.asarray(seeds, dtype=np.float32)
+    stacked = np.concatenate([seeds] * samples)
+    paths = forecast(model, stacked, horizon, stochastic=True)
+    return paths.reshape(samples, len(seeds), horizon).transpose(1, 0, 2)
+
+
+def quantile_bands(paths, quantiles=(0.1, 0.5, 0.9)):
+    """{q: (..., horizon) quantile} across the sample axis (-2) of sample_paths() output."""
+    values = np.quantile(paths, quantiles, axis=-2)
+    return dict(zip(quantiles, values))
+
+
+def smooth(preds, window=3):
+    """Trailing moving average along the last axis, keeping the first `window - 1`
+    values unsmoothed so the length is unchanged. Works on (horizon,) or (N, horizon)."""
+    preds = np.asarray(preds)
+    if preds.shape[-1] < window:
+        return preds
+    smoothed = sliding_window_view(preds, window, axis=-1).mean(axis=-1)
+    return np.concatenate((preds[..., :window - 1], smoothed), axis=-1)
+
+
+def _loop_forecast(model, seed, horizon=HORIZON):
+    # The original per-day loop from main(), kept for the benchmark below and tests/test_forecaster.py.
+    inputs = seed.flatten()
+    preds = []
+    for _ in range(horizon):
+        x_input = inputs[-LOOKBACK:].reshape(1, LOOKBACK, 1)
+        pred = model.predict(x_input, verbose=0)[0, 0]
+        preds.append(pred)
+        inputs = np.append(inputs, pred)
+    return np.array(preds)
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    from modelRegistry import get_registry
+
+    model = get_registry().get()
+    seeds = np.random.default_rng(0).random((64, LOOKBACK)).astype(np.float32)
+    # Trace both batch shapes up front so the timings exclude graph tracing.
+    forecast(model, seeds[:1], horizon=1)
+    forecast(model, seeds, horizon=1)
+
+    started = perf_counter()
+    looped = _loop_forecast(model, seeds[0])
+    loop_s = perf_counter() - started
+
+    started = perf_counter()
+    single = forecast(model, seeds[:1])[0]
+    single_s = perf_counter() - started
+
+    started = perf_counter()
+    batched = forecast(model, seeds)
+    batch_s = perf_counter() - started
+
+    print(f"max |loop - forecast|  : {np.abs(looped - single).max():.2e}")
+    print(f"max |single - batched| : {np.abs(single - batched[0]).max():.2e}")
+    print(f"predict() loop, 1 seed : {loop_s * 1e3:8.1f} ms")
+    print(f"forecast(), 1 seed     : {single_s * 1e3:8.1f} ms")
+    print(f"forecast(), {len(seeds)} seeds   : {batch_s * 1e3:8.1f} ms "
+          f"({batch_s / len(seeds) * 1e3:.2f} ms/seed)")
+
+    # Uncertainty: K=100 MC dropout paths for one seed, batched vs a loop of K forecasts
+    k = 100
+    sample_paths(model, seeds[:1], samples=k, horizon=1)
+    started = perf_counter()
+    paths = sample_paths(model, seeds[:1], samples=k)
+    sampled_s = perf_counter() - started
+    looped_k = 5
+    started = perf_counter()
+    for _ in range(looped_k):
+        forecast(model, seeds[:1], stochastic=True)
+    sample_loop_s = (perf_counter() - started) / looped_k * k
+    bands = quantile_bands(paths[0])
+    print(f"sample_paths(), K={k}  : {sampled_s * 1e3:8.1f} ms "
+          f"({sampled_s / single_s:.1f}x one forecast)")
+    print(f"K forecasts in a loop  : {sample_loop_s * 1e3:8.1f} ms (extrapolated from {looped_k})")
+    print(f"band width at day {HORIZON}  : {bands[0.9][-1] - bands[0.1][-1]:.4f} (scaled units)")
@@ -0,0 +1,152 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+
+class HistoryWriter:
+    """Queues history rows in memory and writes them in batches on a background thread.
+
+    `write_batch(rows)` performs the actual insert (one executemany per batch). A
+    batch is written once `batch_size` rows are waiting or `flush_interval` seconds
+    after its first row arrived. If a write fails the rows are appended to a local
+    JSON-lines spool file, which is replayed (oldest first) before the next batch
+    or every `retry_interval` seconds while idle. The spool path defaults to
+    HISTORY_SPOOL_PATH, read when the writer is created (after .env is loaded).
+    """
+
+    def __init__(self, write_batch, spool_path=None, batch_size=50,
+                 flush_interval=1.0, retry_interval=30.0):
+        self.write_batch = write_batch
+        self.spool_path = spool_path or os.getenv("HISTORY_SPOOL_PATH", "history_spool.jsonl")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self._queue = queue.Queue()
+        self._write_lock = threading.Lock()
+        # Counters are bumped by every enqueuing session thread and by the writer thread
+        self._metrics_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._next_retry = 0.0
+        self._metrics = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "spooled": 0,
+            "errors": 0,
+            "last_error": None,
+            "last_flush_seconds": None,
+            "max_flush_seconds": 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, row):
+        self._queue.put(tuple(row))
+        with self._metrics_lock:
+            self._metrics["enqueued"] += 1
+
+    def _take(self, block):
+        # (rows, flush markers); a marker ends the batch so it is written right away
+        rows, markers = [], []
+        deadline = time.monotonic() + self.flush_interval
+        while len(rows) < self.batch_size:
+            try:
+                if block:
+                    timeout = self.flush_interval if not rows else deadline - time.monotonic()
+                    item = self._queue.get(timeout=max(timeout, 0))
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                markers.append(item)
+                break
+            rows.append(item)
+        return rows, markers
+
+    def _spool(self, rows):
+        with open(self.spool_path, "a") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        with self._metrics_lock:
+            self._metrics["spooled"] += len(rows)
+
+    def _replay_spool(self):
+        if not os.path.exists(self.spool_path):
+            return
+        with open(self.spool_path) as f:
+            rows = [tuple(json.loads(line)) for line in f if line.strip()]
+        if rows:
+            self.write_batch(rows)
+            with self._metrics_lock:
+                self._metrics["written"] += len(rows)
+        os.remove(self.spool_path)
+
+    def _write(self, rows):
+        with self._write_lock:
+            started = time.perf_counter()
+            try:
+                self._replay_spool()
+                if rows:
+                    self.write_batch(rows)
+                    with self._metrics_lock:
+                        self._metrics["written"] += len(rows)
+                        self._metrics["batches"] += 1
+            except Exception as e:
+                with self._metrics_lock:
+                    self._metrics["errors"] += 1
+                    self._metrics["last_error"] = str(e)
+                self._next_retry = time.monotonic() + self.retry_interval
+                if rows:
+                    self._spool(rows)
+                return
+            elapsed = time.perf_counter() - started
+            with self._metrics_lock:
+                self._metrics["last_flush_seconds"] = elapsed
+                self._metrics["max_flush_seconds"] = max(self._metrics["max_flush_seconds"], elapsed)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            rows, markers = self._take(block=True)
+            if rows:
+                self._write(rows)
+            elif os.path.exists(self.spool_path) and time.monotonic() >= self._next_retry:
+                self._write([])
+            for marker in markers:
+                marker.set()
+
+    def _drain(self):
+        while not self._queue.empty():
+            rows, markers = self._take(block=False)
+            self._write(rows)
+            for marker in markers:
+                marker.set()
+
+    def flush(self):
+        """Block until every row enqueued before the call is written (or spooled).
+
+        A marker goes through the queue behind those rows, so rows the writer
+        thread has already taken are covered too; once the thread has stopped
+        the queue is drained on the calling thread instead.
+        """
+        done = threading.Event()
+        self._queue.put(done)
+        while not done.wait(0.05):
+            if not self._thread.is_alive():
+                self._drain()
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def metrics(self):
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        return dict(metrics, queue_depth=self._queue.qsize(),
+                    spool_pending=os.path.exists(self.spool_path))
+
@@ -0,0 +1,213 @@
+import math
+
+import numpy as np
+from scipy.signal import lfilter
+
+INDICATORS = ["sma_20", "sma_100", "sma_200", "ema_12", "ema_26", "macd", "macd_signal",
+              "macd_hist", "rsi_14", "bb_upper", "bb_lower"]
+SMA_WINDOWS = (20, 100, 200)
+RSI_PERIOD = 14
+BB_WINDOW, BB_WIDTH = 20, 2.0
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+
+# All functions below work along the last axis, so a (tickers, bars) matrix is
+# processed in one call. EMAs are seeded with the first value (pandas
+# ewm(adjust=False)); RSI uses Wilder smoothing seeded with the first change.
+
+
+def sma(x, n):
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] < n:
+        return out
+    c = np.cumsum(x, axis=-1)
+    out[..., n - 1] = c[..., n - 1] / n
+    out[..., n:] = (c[..., n:] - c[..., :-n]) / n
+    return out
+
+
+def ema(x, n=None, alpha=None):
+    x = np.asarray(x, dtype=np.float64)
+    a = 2.0 / (n + 1) if alpha is None else alpha
+    if x.shape[-1] == 0:
+        return x.copy()
+    y, _ = lfilter([a], [1.0, a - 1.0], x, axis=-1, zi=(1.0 - a) * x[..., :1])
+    return y
+
+
+def _wilder_averages(x, n=RSI_PERIOD):
+    d = np.diff(np.asarray(x, dtype=np.float64), axis=-1)
+    return ema(np.maximum(d, 0.0), alpha=1.0 / n), ema(np.maximum(-d, 0.0), alpha=1.0 / n)
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+
+
+def rsi(x, n=RSI_PERIOD):
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] > 1:
+        out[..., 1:] = _rsi_from_averages(*_wilder_averages(x, n))
+    return out
+
+
+def macd(x, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+    line = ema(x, fast) - ema(x, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(x, n=BB_WINDOW, width=BB_WIDTH):
+    x = np.asarray(x, dtype=np.float64)
+    mid = sma(x, n)
+    var = np.maximum(sma(x * x, n) - mid * mid, 0.0)
+    std = np.sqrt(var)
+    return mid, mid + width * std, mid - width * std
+
+
+def compute(close):
+    """All indicators for `close` ((bars,) or (tickers, bars)) as {name: array}."""
+    close = np.asarray(close, dtype=np.float64)
+    out = {f"sma_{n}": sma(close, n) for n in SMA_WINDOWS}
+    out["ema_12"], out["ema_26"] = ema(close, MACD_FAST), ema(close, MACD_SLOW)
+    out["macd"], out["macd_signal"], out["macd_hist"] = macd(close)
+    out["rsi_14"] = rsi(close)
+    _, out["bb_upper"], out["bb_lower"] = bollinger(close)
+    return out
+
+
+def compute_table(close):
+    """(bars, len(INDICATORS)) matrix for one ticker, columns in INDICATORS order."""
+    values = compute(close)
+    return np.column_stack([values[name] for name in INDICATORS]) if len(close) else \
+        np.empty((0, len(INDICATORS)))
+
+
+class IndicatorState:
+    """Running state that produces the next row of indicators in O(1) per bar.
+
+    Matches compute() on the same series (up to float rounding), so a stored
+    table can be extended bar by bar instead of being recomputed.
+    """
+
+    RING = max(SMA_WINDOWS)
+
+    def __init__(self):
+        self.count = 0
+        self.ring = [0.0] * self.RING
+        self.sums = [0.0] * len(SMA_WINDOWS)
+        self.sumsq = 0.0
+        self.ema_fast = None
+        self.ema_slow = None
+        self.signal = None
+        self.prev = None
+        self.avg_gain = None
+        self.avg_loss = None
+
+    def update(self, price):
+        price = float(price)
+        count = self.count
+        for k, n in enumerate(SMA_WINDOWS):
+            if count >= n:
+                self.sums[k] -= self.ring[(count - n) % self.RING]
+        if count >= BB_WINDOW:
+            self.sumsq -= self.ring[(count - BB_WINDOW) % self.RING] ** 2
+        self.ring[count % self.RING] = price
+        self.sums = [s + price for s in self.sums]
+        self.sumsq += price * price
+        self.count = count = count + 1
+
+        smas = [s / n if count >= n else math.nan for s, n in zip(self.sums, SMA_WINDOWS)]
+
+        a_fast, a_slow, a_sig = 2 / (MACD_FAST + 1), 2 / (MACD_SLOW + 1), 2 / (MACD_SIGNAL + 1)
+        if self.ema_fast is None:
+            self.ema_fast = self.ema_slow = price
+        else:
+            self.ema_fast += a_fast * (price - self.ema_fast)
+            self.ema_slow += a_slow * (price - self.ema_slow)
+        line = self.ema_fast - self.ema_slow
+        self.signal = line if self.signal is None else self.signal + a_sig * (line - self.signal)
+
+        rsi_value = math.nan
+        if self.prev is not None:
+            change = price - self.prev
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            if self.avg_gain is None:
+                self.avg_gain, self.avg_loss = gain, loss
+            else:
+                self.avg_gain += (gain - self.avg_gain) / RSI_PERIOD
+                self.avg_loss += (loss - self.avg_loss) / RSI_PERIOD
+            rsi_value = float(_rsi_from_averages(self.avg_gain, self.avg_loss))
+        self.prev = price
+
+        mid = smas[SMA_WINDOWS.index(BB_WINDOW)]
+        std = math.sqrt(max(self.sumsq / BB_WINDOW - mid * mid, 0.0)) if count >= BB_WINDOW else math.nan
+        return smas + [self.ema_fast, self.ema_slow, line, self.signal, line - self.signal,
+                       rsi_value, mid + BB_WIDTH * std, mid - BB_WIDTH * std]
+
+    @classmethod
+    def from_history(cls, close):
+        """State after consuming `close`, derived from vectorized results (no per-bar loop)."""
+        close = np.asarray(close, dtype=np.float64)
+        state = cls()
+        count = len(close)
+        if count == 0:
+            return state
+        state.count = count
+        for i in range(max(count - cls.RING, 0), count):
+            state.ring[i % cls.RING] = float(close[i])
+        state.sums = [float(close[-n:].sum()) for n in SMA_WINDOWS]
+        state.sumsq = float((close[-BB_WINDOW:] ** 2).sum())
+        fast, slow = ema(close, MACD_FAST), ema(close, MACD_SLOW)
+        state.ema_fast, state.ema_slow = float(fast[-1]), float(slow[-1])
+        state.signal = float(ema(fast - slow, MACD_SIGNAL)[-1])
+        state.prev = float(close[-1])
+        if count > 1:
+            gains, losses = _wilder_averages(close)
+            state.avg_gain, state.avg_loss = float(gains[-1]), float(losses[-1])
+        return state
+
+    def to_dict(self):
+        return dict(vars(self), ring=list(self.ring), sums=list(self.sums))
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        vars(state).update(data)
+        return state
+
+
+if __name__ == "__main__":
+    import sys
+    from time import perf_counter
+
+    tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    bars = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    chunk = 500
+    rng = np.random.default_rng(0)
+
+    series = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+
+    elapsed = 0.0
+    for start in range(0, tickers, chunk):
+        n = min(chunk, tickers - start)
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n, bars)), axis=1))
+        started = perf_counter()
+        compute(prices)
+        elapsed += perf_counter() - started
+    print(f"vectorized compute, {tickers} x {bars} bars : {elapsed:8.2f} s "
+          f"({tickers * bars / elapsed / 1e6:.1f} M bars/s)")
+
+    state = IndicatorState.from_history(series)
+    updates = 100_000
+    started = perf_counter()
+    for price in rng.normal(series[-1], 1.0, updates):
+        state.update(price)
+    per_bar = (perf_counter() - started) / updates
+    started = perf_counter()
+    compute_table(series)
+    full = perf_counter() - started
+    print(f"incremental update, one new bar          : {per_bar * 1e6:8.2f} us")
+    print(f"full recompute, one ticker ({bars} bars)  : {full * 1e6:8.2f} us")
@@ -0,0 +1,502 @@
+"""Shared inference service: one process owns the model, UI workers call it over HTTP.
+
+    python inferenceServer.py serve --port 8601 --max-batch 64 --max-wait-ms 2
+    INFERENCE_URL=http://127.0.0.1:8601 streamlit run app.py --server.port 8501
+    python inferenceServer.py loadtest --concurrency 1,2,4,8,16,32
+
+Concurrent /predict requests from many sessions are merged by a MicroBatcher
+into one forward pass of up to --max-batch rows, waiting at most --max-wait-ms
+for companions, so N sessions forecasting at once cost about one batched call
+per step instead of N. The server reloads the model through its own
+ModelRegistry when a new artifact is trained.
+
+With INFERENCE_URL set, get_registry() in the app returns a RemoteRegistry:
+predict() becomes an HTTP call, and the version and per-ticker scalers come
+from the server, so UI workers never import TensorFlow. If the server cannot
+be reached, the model is loaded in process instead (INFERENCE_FALLBACK=0 to
+fail instead) and the server is retried after INFERENCE_RETRY_SECONDS.
+
+Wire format: POST /predict with the raw little-endian float32 array as body
+and its shape in the X-Shape header ("n,100,1"), plus X-Sample: 1 for a
+stochastic (MC dropout) pass; the response is the same for the (n, 1)
+output, plus X-Model-Version. A stochastic pass the served backend cannot run
+is answered with 501. GET /info and /metrics describe the served
+model and the batcher.
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from predictor import Predictor
+from tracing import get_tracer
+
+URL = os.getenv("INFERENCE_URL") or None
+PORT = int(os.getenv("INFERENCE_PORT", "8601"))
+MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "64"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "2"))
+TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "30"))
+FALLBACK = os.getenv("INFERENCE_FALLBACK", "1") == "1"
+RETRY_SECONDS = float(os.getenv("INFERENCE_RETRY_SECONDS", "30"))
+_STOP = object()
+
+
+class MicroBatcher:
+    """Merges concurrent predict calls into batched calls of `predict`.
+
+    A single worker thread takes the first queued request, then keeps adding
+    requests until the batch holds `max_batch` rows or `max_wait_ms` have passed.
+    A request larger than `max_batch` runs on its own; requests whose window
+    shapes differ, and stochastic (`sample`) requests, are run as separate calls.
+    """
+
+    def __init__(self, predict, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, sample=None):
+        self._predict = predict
+        self._sample = sample
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._carry = None
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "rows": 0, "batches": 0, "errors": 0}
+        self._worker = threading.Thread(target=self._run, daemon=True, name="micro-batcher")
+        self._worker.start()
+
+    def submit(self, x, stochastic=False):
+        """Queue (n, ...) windows; returns a Future of the (n, 1) output."""
+        future = Future()
+        self._queue.put((np.asarray(x, dtype=np.float32), future, stochastic))
+        return future
+
+    def predict(self, x):
+        return self.submit(x).result()
+
+    def sample(self, x):
+        return self.submit(x, stochastic=True).result()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._worker.join()
+
+    def _next_batch(self):
+        first = self._carry if self._carry is not None else self._queue.get()
+        self._carry = None
+        if first is _STOP:
+            return None
+        batch, rows = [first], len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _STOP or rows + len(item[0]) > self.max_batch:
+                self._carry = item  # starts the next batch (or stops the worker)
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            groups = {}
+            for x, future, stochastic in batch:
+                groups.setdefault((stochastic, x.shape[1:]), []).append((x, future))
+            for (stochastic, _), items in groups.items():
+                self._run_group(items, self._sample if stochastic else self._predict)
+
+    def _run_group(self, items, predict):
+        xs = [x for x, _ in items]
+        started = perf_counter()
+        try:
+            if predict is None:
+                raise NotImplementedError("this server does not sample")
+            out = np.asarray(predict(np.concatenate(xs) if len(xs) > 1 else xs[0]))
+        except Exception as e:
+            with self._lock:
+                self._counters["errors"] += 1
+            for _, future in items:
+                future.set_exception(e)
+            return
+        get_tracer().record("inference.batch", perf_counter() - started)
+        with self._lock:
+            self._counters["requests"] += len(items)
+            self._counters["rows"] += sum(len(x) for x in xs)
+            self._counters["batches"] += 1
+        for part, (_, future) in zip(np.split(out, np.cumsum([len(x) for x in xs[:-1]])), items):
+            future.set_result(part)
+
+    def metrics(self):
+        with self._lock:
+            counters = dict(self._counters)
+        batches = counters["batches"]
+        return dict(counters, max_batch=self.max_batch, max_wait_ms=self.max_wait * 1000,
+                    queued=self._queue.qsize(),
+                    mean_batch_rows=counters["rows"] / batches if batches else None,
+                    mean_batch_requests=counters["requests"] / batches if batches else None)
+
+
+# ------------------- Server -------------------
+
+def _encode_shape(shape):
+    return ",".join(str(int(d)) for d in shape)
+
+
+def _decode_shape(header):
+    return tuple(int(d) for d in header.split(","))
+
+
+def make_server(registry, host="127.0.0.1", port=PORT, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+    """ThreadingHTTPServer serving `registry`'s model through a MicroBatcher."""
+    batcher = MicroBatcher(lambda x: registry.get().predict(x), max_batch, max_wait_ms,
+                           sample=lambda x: registry.get().sample(x))
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive: one connection per client thread
+        disable_nagle_algorithm = True  # headers and body are separate writes
+
+        def _reply(self, status, body, content_type, headers=()):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self.send_error(404)
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                x = np.frombuffer(body, dtype="<f4").reshape(_decode_shape(self.headers["X-Shape"]))
+                predict = batcher.sample if self.headers.get("X-Sample") == "1" else batcher.predict
+                out = np.ascontiguousarray(predict(x), dtype="<f4")
+            except NotImplementedError as e:
+                self._reply(501, str(e).encode(), "text/plain")
+                return
+            except Exception as e:
+                self._reply(500, str(e).encode(), "text/plain")
+                return
+            self._reply(200, out.tobytes(), "application/octet-stream",
+                        [("X-Shape", _encode_shape(out.shape)), ("X-Model-Version", registry.version or "")])
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._reply(200, get_tracer().prometheus().encode(), "text/plain; version=0.0.4")
+            elif self.path in ("/info", "/health"):
+                registry.get()
+                info = {"version": registry.version, "path": registry.path, "features": registry.features,
+                        "input_shape": list(registry.input_shape), "scalers": registry.scaler_params(),
+                        "registry": registry.metrics(), "batcher": batcher.metrics()}
+                self._reply(200, json.dumps(info, default=str).encode(), "application/json")
+            else:
+                self.send_error(404)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.batcher = batcher
+    return server
+
+
+# ------------------- Client -------------------
+
+class InferenceUnavailable(Exception):
+    pass
+
+
+class SamplingUnavailable(NotImplementedError):
+    """The server's backend has no stochastic forward pass (HTTP 501)."""
+
+
+class RemotePredictor(Predictor):
+    """Predictor whose forward pass runs on an inference server.
+
+    `fallback()` returns a local Predictor used while the server is unreachable.
+    """
+
+    backend = "remote"
+
+    def __init__(self, url=URL, timeout=TIMEOUT, fallback=None, retry_seconds=RETRY_SECONDS):
+        parts = urlsplit(url)
+        self.url = url
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.fallback = fallback
+        self.retry_seconds = retry_seconds
+        self.version = None
+        self._down_until = 0.0
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def request(self, method, path, body=None, headers=None):
+        """(status, headers, body); retried once on a dropped keep-alive connection."""
+        for attempt in (0, 1):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                return response.status, response.headers, response.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise InferenceUnavailable(f"{self.url}: {e}") from e
+
+    def _remote(self, x, stochastic=False):
+        x = np.ascontiguousarray(x, dtype="<f4")
+        status, headers, body = self.request("POST", "/predict", x.tobytes(),
+                                             {"X-Shape": _encode_shape(x.shape),
+                                              "X-Sample": "1" if stochastic else "0",
+                                              "Content-Type": "application/octet-stream"})
+        if status == 501:
+            raise SamplingUnavailable(f"Inference server cannot sample: {body.decode(errors='replace')}")
+        if status != 200:
+            raise RuntimeError(f"Inference server error {status}: {body.decode(errors='replace')}")
+        self.version = headers.get("X-Model-Version") or None
+        return np.frombuffer(body, dtype="<f4").reshape(_decode_shape(headers["X-Shape"]))
+
+    @property
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    def predict(self, x, **kwargs):
+        return self._call(x, stochastic=False)
+
+    def sample(self, x):
+        return self._call(x, stochastic=True)
+
+    def _call(self, x, stochastic):
+        if self.fallback is None or self.available:
+            try:
+                return self._remote(x, stochastic)
+            except InferenceUnavailable as e:
+                if self.fallback is None:
+                    raise
+                self._down_until = time.monotonic() + self.retry_seconds
+                warnings.warn(f"{e}; predicting in process for {self.retry_seconds:.0f}s")
+        local = self.fallback()
+        return local.sample(x) if stochastic else local.predict(x)
+
+
+class RemoteRegistry:
+    """Stands in for ModelRegistry when the model is served by an inference server.
+
+    get() returns a RemotePredictor; version and scaler() come from the server's
+    /info (refreshed every `refresh` seconds), or from a local ModelRegistry while
+    the server is unreachable and `fallback` is on.
+    """
+
+    def __init__(self, url=URL, fallback=FALLBACK, refresh=5.0):
+        self.path = url
+        self.refresh = refresh
+        self._local = None
+        self._local_lock = threading.Lock()
+        self._info = {}
+        self._info_at = -float("inf")
+        self.predictor = RemotePredictor(url, fallback=self._local_model if fallback else None)
+
+    def _local_registry(self):
+        with self._local_lock:
+            if self._local is None:
+                from modelRegistry import ModelRegistry
+
+                self._local = ModelRegistry()
+        return self._local
+
+    def _local_model(self):
+        return self._local_registry().get()
+
+    def info(self):
+        """Server /info, or None while it is unreachable."""
+        if self.predictor.available and time.monotonic() - self._info_at >= self.refresh:
+            try:
+                status, _, body = self.predictor.request("GET", "/info")
+                if status == 200:
+                    self._info, self._info_at = json.loads(body), time.monotonic()
+            except InferenceUnavailable as e:
+                if self.predictor.fallback is None:
+                    raise
+                self.predictor._down_until = time.monotonic() + self.predictor.retry_seconds
+                warnings.warn(f"{e}; predicting in process for {self.predictor.retry_seconds:.0f}s")
+        return self._info if self.predictor.available else None
+
+    def get(self):
+        if self.info() is None:
+            # Load (and warm) the local model now rather than on the first forecast step
+            self._local_model()
+        return self.predictor
+
+    def served_path(self):
+        return self._local_registry().served_path()
+
+    @property
+    def version(self):
+        info = self.info()
+        if info is None:
+            return self._local_registry().version
+        return info.get("version")
+
+    @property
+    def features(self):
+        info = self.info()
+        if info is None:
+            return self._local_registry().features
+        return info.get("features") or ["Close"]
+
+    def scaler(self, ticker):
+        info = self.info()
+        if info is None:
+            return self._local_registry().scaler(ticker)
+        from scaler import MinMaxState
+
+        params = info.get("scalers", {}).get(ticker)
+        return MinMaxState.from_dict(params) if params else None
+
+    def metrics(self):
+        info = self.info() or {}
+        return {"url": self.path, "version": self.version, "remote": self.predictor.available,
+                "batcher": info.get("batcher"), "server": info.get("registry")}
+
+
+# ------------------- Load test -------------------
+
+def _wait_ready(client, seconds=120):
+    deadline = time.monotonic() + seconds
+    while True:
+        try:
+            if client.request("GET", "/info")[0] == 200:
+                return
+        except InferenceUnavailable:
+            if time.monotonic() > deadline:
+                raise
+        time.sleep(0.5)
+
+
+def load_test(url, concurrency, requests, rows=1, lookback=100):
+    """Throughput and latency of `concurrency` clients each sending `requests` predicts."""
+    client = RemotePredictor(url)
+    x = np.random.default_rng(0).random((rows, lookback, 1), dtype=np.float32)
+    client.predict(x)
+    before = json.loads(client.request("GET", "/info")[2])["batcher"]
+    latencies = []
+
+    def worker(_):
+        out = []
+        for _ in range(requests):
+            started = perf_counter()
+            client.predict(x)
+            out.append((perf_counter() - started) * 1e3)
+        return out
+
+    started = perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for result in pool.map(worker, range(concurrency)):
+            latencies.extend(result)
+    elapsed = perf_counter() - started
+    after = json.loads(client.request("GET", "/info")[2])["batcher"]
+    batches = after["batches"] - before["batches"]
+    return {"concurrency": concurrency, "requests_per_s": len(latencies) / elapsed,
+            "p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95)),
+            "mean_batch_rows": (after["rows"] - before["rows"]) / batches if batches else None}
+
+
+def _spawn_server(port, max_batch, max_wait_ms, model=None):
+    command = [sys.executable, os.path.abspath(__file__), "serve", "--port", str(port),
+               "--max-batch", str(max_batch), "--max-wait-ms", str(max_wait_ms)]
+    if model:
+        command += ["--model", model]
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared, micro-batching inference server.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="serve the model over HTTP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=PORT)
+    serve.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    serve.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    serve.add_argument("--model", help="model file (default: what the app would serve)")
+    load = sub.add_parser("loadtest", help="throughput as concurrency grows")
+    load.add_argument("--url", help="existing server (default: start one per --max-batch value)")
+    load.add_argument("--concurrency", default="1,2,4,8,16,32")
+    load.add_argument("--requests", type=int, default=50, help="requests per client")
+    load.add_argument("--rows", type=int, default=1, help="windows per request (1 = a forecast step)")
+    load.add_argument("--max-batch", default="1,64", help="server batch limits to compare")
+    load.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    load.add_argument("--port", type=int, default=PORT + 1)
+    load.add_argument("--model")
+    load.add_argument("--json", help="also write the results here")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        from modelRegistry import ModelRegistry
+
+        # Always a local registry, even if INFERENCE_URL is set for the app
+        registry = ModelRegistry(path=args.model, model_dir=None) if args.model else ModelRegistry()
+        registry.get()
+        server = make_server(registry, args.host, args.port, args.max_batch, args.max_wait_ms)
+        print(f"Serving {registry.path} (version {registry.version}) on http://{args.host}:{args.port} "
+              f"with max batch {args.max_batch}, max wait {args.max_wait_ms} ms")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    targets = [(args.url, None)] if args.url else [(None, int(b)) for b in args.max_batch.split(",")]
+    results = []
+    for url, max_batch in targets:
+        process = None
+        if url is None:
+            url = f"http://127.0.0.1:{args.port}"
+            process = _spawn_server(args.port, max_batch, args.max_wait_ms, args.model)
+        try:
+            _wait_ready(RemotePredictor(url))
+            label = f"max batch {max_batch}" if max_batch else url
+            print(f"\n{label}")
+            print(f"{'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'rows/batch':>10}")
+            for level in levels:
+                row = load_test(url, level, args.requests, args.rows)
+                row["max_batch"] = max_batch
+                results.append(row)
+                print(f"{level:>8} {row['requests_per_s']:8.1f} {row['p50_ms']:8.1f} {row['p95_ms']:8.1f} "
+                      f"{row['mean_batch_rows'] or 0:10.1f}")
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,3 @@
+-- Supports keyset pagination and per-user aggregates on the History page:
+-- WHERE username = ? [AND id < ?] ORDER BY id DESC LIMIT n
+CREATE INDEX idx_history_username_id ON history (username, id);
@@ -0,0 +1,216 @@
+import hashlib
+import importlib
+import json
+import os
+import threading
+import time
+import warnings
+
+import numpy as np
+
+from predictor import BACKEND, backend_path, load_predictor
+from scaler import MinMaxState
+from tracing import get_tracer
+
+MODEL_PATH = os.getenv("MODEL_PATH", "best_model.keras")
+# Versioned artifacts written by train.py; LATEST names the one to serve.
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+# Served by a shared inference server instead of in process (see inferenceServer.py)
+INFERENCE_URL = os.getenv("INFERENCE_URL") or None
+LOOKBACK = 100
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def latest_artifact(model_dir=MODEL_DIR):
+    """Directory of the artifact named by model_dir/LATEST, or None."""
+    try:
+        with open(os.path.join(model_dir, "LATEST")) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    path = os.path.join(model_dir, version)
+    return path if version and os.path.exists(os.path.join(path, "model.keras")) else None
+
+
+def model_features(path):
+    """Input features of the model file at `path`: its artifact manifest's, else ["Close"]."""
+    manifest = _read_json(os.path.join(os.path.dirname(os.path.abspath(path)), "manifest.json"), {})
+    return manifest.get("features") or ["Close"]
+
+
+def _read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+class ModelRegistry:
+    """Keeps one inference-only model per process and reloads it when the file changes.
+
+    The model is served as a Predictor for PREDICTOR_BACKEND, from the converted file
+    next to the .keras one when that backend is not keras (Keras models are loaded
+    with compile=False; predict does not need an optimizer). It is warmed up with a
+    dummy batch so the first real request does not pay graph tracing.
+    The file's mtime/size is checked on every get(); the sha256 is only recomputed
+    when those change, so an unchanged file costs a single stat call.
+
+    When `model_dir` holds a trained artifact (see train.py) it is served instead of
+    `path`, together with its manifest and per-ticker scaler parameters.
+    """
+
+    def __init__(self, path=MODEL_PATH, model_dir=MODEL_DIR, input_shape=(1, LOOKBACK, 1),
+                 backend=BACKEND):
+        self.default_path = path
+        self.path = path
+        self.backend = backend
+        self.model_dir = model_dir
+        self.input_shape = input_shape
+        self.manifest = {}
+        self._scalers = {}
+        self._lock = threading.Lock()
+        self._model = None
+        self._stat = None
+        self._sha256 = None
+        self._warned = None
+        self._metrics = {
+            "loads": 0,
+            "load_seconds": None,
+            "warmup_seconds": None,
+            "loaded_at": None,
+        }
+
+    def _current(self):
+        artifact = latest_artifact(self.model_dir) if self.model_dir else None
+        path = os.path.join(artifact, "model.keras") if artifact else self.default_path
+        if self.backend != "keras":
+            converted = backend_path(path, self.backend)
+            if os.path.exists(converted):
+                path = converted
+            elif path != self._warned:
+                self._warned = path
+                warnings.warn(f"{converted} not found (run predictor.py convert); "
+                              f"serving {path} with keras")
+        st = os.stat(path)
+        return artifact, path, (path, st.st_mtime_ns, st.st_size)
+
+    def _load(self, artifact, path, stat):
+        if stat[2] == 0:
+            raise ValueError(f"Model file {path} is empty or corrupted.")
+        sha256 = file_sha256(path)
+        if self._model is not None and sha256 == self._sha256:
+            # Touched but unchanged: keep the warm model.
+            self._stat = stat
+            return
+
+        started = time.perf_counter()
+        model = load_predictor(path)
+        loaded = time.perf_counter()
+        input_shape = (1,) + tuple(model.input_shape[1:])
+        model.predict(np.zeros(input_shape, dtype=np.float32))
+        warmed = time.perf_counter()
+        get_tracer().record("model.load", loaded - started)
+        get_tracer().record("model.warmup", warmed - loaded)
+
+        self._model = model
+        self._stat = stat
+        self._sha256 = sha256
+        self.path = path
+        self.input_shape = input_shape
+        self.manifest = _read_json(os.path.join(artifact, "manifest.json"), {}) if artifact else {}
+        self._scalers = _read_json(os.path.join(artifact, "scaler.json"), {}) if artifact else {}
+        self._metrics.update(
+            loads=self._metrics["loads"] + 1,
+            load_seconds=loaded - started,
+            warmup_seconds=warmed - loaded,
+            loaded_at=time.time(),
+        )
+
+    def served_path(self):
+        """File get() would load right now (artifact or default, converted for the backend)."""
+        return self._current()[1]
+
+    def get(self):
+        """Return the loaded Predictor, (re)loading it if the file on disk changed."""
+        artifact, path, stat = self._current()
+        if self._model is not None and stat == self._stat:
+            return self._model
+        with self._lock:
+            if self._model is None or stat != self._stat:
+                self._load(artifact, path, stat)
+            return self._model
+
+    def scaler(self, ticker):
+        """MinMaxState the served artifact was trained with for `ticker`, or None."""
+        params = self._scalers.get(ticker)
+        return MinMaxState.from_dict(params) if params else None
+
+    def scaler_params(self):
+        """{ticker: MinMaxState dict} of the served artifact."""
+        return dict(self._scalers)
+
+    @property
+    def features(self):
+        """Input feature names of the served model (featureStore.FEATURES subset)."""
+        return self.manifest.get("features") or ["Close"]
+
+    @property
+    def version(self):
+        return self.manifest.get("version") or (self._sha256[:12] if self._sha256 else None)
+
+    def metrics(self):
+        backend = self._model.backend if self._model is not None else None
+        return dict(self._metrics, path=self.path, version=self.version, backend=backend)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Process-wide registry shared by every Streamlit session."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None and INFERENCE_URL:
+                from inferenceServer import RemoteRegistry
+
+                _registry = RemoteRegistry(INFERENCE_URL)
+            elif _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+_preload = None
+
+
+def start_preload(*modules):
+    """Import `modules`, then load and warm the served model, on a background thread.
+
+    Started once per process (later calls return the same thread), so the login page
+    can kick it off and the prediction page finds TensorFlow and the model ready;
+    get() simply waits on the registry lock if the preload is still running.
+    """
+    global _preload
+
+    def run():
+        try:
+            for name in modules:
+                importlib.import_module(name)
+            get_registry().get()
+        except Exception:
+            pass  # the prediction page reports load errors when it calls get() itself
+
+    with _registry_lock:
+        if _preload is None:
+            _preload = threading.Thread(target=run, name="model-preload", daemon=True)
+            _preload.start()
+    return _preload
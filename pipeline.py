@@ -0,0 +1,183 @@
+"""Everything the prediction page computes for one ticker, without Streamlit.
+
+predict_ticker() returns the forecast, the transaction plan and the series the
+charts are drawn from (see charts.py) as one result, so the page can keep it per
+session and only redo the strategy step when the investment amount changes.
+
+With FORECAST_SAMPLES=K the forecast also gets quantile bands from K stochastic
+paths (MC dropout, or the models listed in FORECAST_MEMBERS), their median is
+the forecast, and a planned trade is only kept if its lower-band return covers
+TRADE_COST on both legs.
+"""
+import os
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from forecaster import forecast, quantile_bands, sample_paths, smooth
+from predictor import EnsemblePredictor
+from scaler import MinMaxState
+from strategy import confident_trades, plan_trades
+from tracing import span
+from windowing import sliding_windows, train_test_split
+
+LOOKBACK = 100
+HORIZON = 30
+SAMPLES = int(os.getenv("FORECAST_SAMPLES", "0"))
+MEMBERS = [p for p in os.getenv("FORECAST_MEMBERS", "").split(",") if p]
+BANDS = (0.1, 0.5, 0.9)
+COST = float(os.getenv("TRADE_COST", "0"))
+_ensembles = {}
+
+
+def future_business_days(start, n):
+    return list(pd.bdate_range(start + timedelta(days=1), periods=n).date)
+
+
+def target_scaler(scaler):
+    """The Close part of a per-feature MinMaxState (Close is feature 0)."""
+    if scaler.lo.ndim == 0:
+        return scaler
+    return MinMaxState(scaler.lo[0], scaler.hi[0], scaler.count)
+
+
+def sampler(model, members=MEMBERS):
+    """What sample_paths() runs: an ensemble of `members` model files, else `model` (MC dropout)."""
+    if not members:
+        return model
+    key = tuple(members)
+    if key not in _ensembles:
+        from predictor import load_predictor
+
+        _ensembles[key] = EnsemblePredictor([load_predictor(path) for path in members])
+    return _ensembles[key]
+
+
+def predict_ticker(stock, data, indicators, model, scaler, horizon=HORIZON, today=None, features=None,
+                   samples=SAMPLES, cost=COST):
+    """Test-set predictions, the `horizon`-day forecast and its trade plan.
+
+    `data` is the store's OHLCV frame, `scaler` the ticker's MinMaxState. For a
+    multi-feature model, `features` is the ticker's (bars, F) matrix aligned with
+    `data` (featureStore.FeatureStore.matrix) and `scaler` has one min/max per feature.
+    With `samples` > 0 the forecast is the median of the sampled paths, the result
+    also has "bands" ({quantile: prices}) and the plan keeps only trades whose 10%
+    band return clears `cost` (returned as "cost" for compound()).
+    """
+    close = data['Close'].to_numpy()
+    values = close if features is None else features
+    close_scaler = target_scaler(scaler)
+    with span("windowing"):
+        # test data: the last 20% of history, starting with the 100 days before it
+        _, data_test = train_test_split(values, train_fraction=0.80, lookback=LOOKBACK)
+        data_test_array = scaler.transform(data_test).reshape(len(data_test), -1)
+        if features is not None:
+            # Indicator warm-up rows of short histories
+            np.nan_to_num(data_test_array, copy=False)
+        x, y = sliding_windows(data_test_array, lookback=LOOKBACK)
+    with span("model.predict"):
+        y_predict = close_scaler.inverse(model.predict(x))[:, 0]
+    y = close_scaler.inverse(y[:, 0])
+
+    seed = data_test_array[None, -LOOKBACK:]
+    paths = bands = None
+    if samples:
+        stochastic = sampler(model)
+        if isinstance(stochastic, EnsemblePredictor):
+            samples = len(stochastic.members)  # one path per ensemble member
+        try:
+            with span("forecast.samples"):
+                paths = sample_paths(stochastic, seed, samples, horizon)[0]
+                paths = close_scaler.inverse(smooth(paths, window=3))
+                bands = quantile_bands(paths, BANDS)
+        except NotImplementedError as e:
+            # No stochastic pass for this backend (TFLite/ONNX, or a server answering
+            # inferenceServer.SamplingUnavailable); other failures propagate
+            paths = None
+            warnings.warn(f"No forecast bands: {e}")
+    if bands is not None:
+        # The median path is the forecast: no separate deterministic pass
+        future_prices = bands[0.5]
+    else:
+        with span("forecast"):
+            # Seed with the last 100 test days, smooth the noise, back to price units
+            future_scaled = forecast(model, seed, horizon=horizon)[0]
+            future_prices = close_scaler.inverse(smooth(future_scaled, window=3))
+    pred_df = pd.DataFrame({
+        'Date': future_business_days(today or datetime.today(), horizon),
+        'Predicted_Price': future_prices,
+    })
+    if bands is not None:
+        pred_df['Lower_Band'] = bands[BANDS[0]]
+        pred_df['Upper_Band'] = bands[BANDS[-1]]
+    # Buy at each predicted valley, sell at the following peak
+    with span("strategy.plan"):
+        buy_idx, sell_idx = plan_trades(future_prices, cost=cost)
+        if paths is not None:
+            buy_idx, sell_idx, _ = confident_trades(paths, buy_idx, sell_idx, cost, q=BANDS[0])
+    return {
+        "as_of": data.index[-1].date(),
+        "data": data,
+        "pred_df": pred_df,
+        "prices": np.asarray(future_prices, dtype=np.float64),
+        "buys": buy_idx,
+        "sells": sell_idx,
+        "bands": bands,
+        "samples": samples if bands is not None else 0,
+        "cost": cost,
+        "y": y,
+        "y_predict": y_predict,
+        "sma_100": indicators["sma_100"].to_numpy(),
+        "sma_200": indicators["sma_200"].to_numpy(),
+    }
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    from indicators import INDICATORS, compute_table
+    from modelRegistry import get_registry
+    from scaler import MinMaxState
+    from strategy import compound
+    from charts import figures
+
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 2500)))
+    index = pd.DatetimeIndex(pd.bdate_range("2015-01-01", periods=len(close)), name="Date")
+    data = pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close,
+                         "Volume": 1e6}, index=index)
+    indicators = pd.DataFrame(compute_table(close), columns=INDICATORS, index=index)
+    model = get_registry().get()
+    scaler = MinMaxState().update(close)
+
+    started = perf_counter()
+    result = predict_ticker("TEST", data, indicators, model, scaler)
+    full_s = perf_counter() - started
+    started = perf_counter()
+    figures("TEST", result)
+    charts_s = perf_counter() - started
+    started = perf_counter()
+    for investment in range(1000, 101_000, 1000):
+        compound(result["prices"], result["buys"], result["sells"], investment)
+    rerun_s = (perf_counter() - started) / 100
+    print(f"full pipeline      : {full_s * 1e3:8.1f} ms")
+    print(f"charts (first time): {charts_s * 1e3:8.1f} ms")
+    print(f"cached rerun (plan): {rerun_s * 1e3:8.3f} ms")
+
+    started = perf_counter()
+    predict_ticker("TEST", data, indicators, model, scaler)
+    single_s = perf_counter() - started
+    started = perf_counter()
+    banded = predict_ticker("TEST", data, indicators, model, scaler, samples=100)
+    banded_s = perf_counter() - started
+    planned = plan_trades(banded["prices"])
+    figures("TEST", banded)
+    print(f"with K=100 bands   : {banded_s * 1e3:8.1f} ms ({banded_s / single_s:.1f}x a warm run), "
+          f"{len(banded['buys'])}/{len(planned[0])} trades clear the 10% band")
+
+    from tracing import get_tracer
+
+    for name, stats in get_tracer().snapshot().items():
+        print(f"  {name:<16} {stats['count']:4d} x  p50 {stats['p50'] * 1e3:8.2f} ms  max {stats['max'] * 1e3:8.2f} ms")
@@ -0,0 +1,359 @@
+"""Pluggable inference backends for the LSTM.
+
+    python predictor.py convert best_model.keras --backend tflite --quantize float16
+    python predictor.py convert best_model.keras --backend onnx
+    python predictor.py report best_model.keras
+
+Every backend exposes the same `predict(x) -> (batch, 1) float32` call, so main(),
+the forecaster and batchPredict do not care which one is serving. PREDICTOR_BACKEND
+(keras, tflite or onnx) selects the backend; the converted file sits next to the
+.keras file with the backend's extension (best_model.tflite, models/<v>/model.onnx).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import weakref
+from time import perf_counter
+
+import numpy as np
+
+BACKEND = os.getenv("PREDICTOR_BACKEND", "keras")
+EXTENSIONS = {"keras": ".keras", "tflite": ".tflite", "onnx": ".onnx"}
+QUANTIZE = {"tflite": (None, "float16", "int8"), "onnx": (None, "int8")}
+
+
+class Predictor:
+    backend = None
+    input_shape = (None, 100, 1)
+
+    def predict(self, x, **kwargs):
+        """(batch, lookback, features) float32 windows -> (batch, 1) float32."""
+        raise NotImplementedError
+
+    def sample(self, x):
+        """Like predict(), but one draw of a stochastic forward pass (see forecaster.sample_paths)."""
+        raise NotImplementedError(f"the {self.backend} backend has no stochastic forward pass; "
+                                  "serve the .keras model (MC dropout) or set FORECAST_MEMBERS")
+
+    def __call__(self, x):
+        return self.predict(x)
+
+
+class KerasPredictor(Predictor):
+    """Keras model behind a traced forward pass (no per-call predict() overhead)."""
+
+    backend = "keras"
+
+    def __init__(self, model):
+        import tensorflow as tf
+
+        self.model = model
+        self.input_shape = tuple(model.input_shape)
+        self._step = tf.function(lambda x: model(x, training=False), reduce_retracing=True)
+        # MC dropout: the same graph with the Dropout layers active
+        self._sample = tf.function(lambda x: model(x, training=True), reduce_retracing=True)
+
+    def predict(self, x, **kwargs):
+        return np.asarray(self._step(np.asarray(x, dtype=np.float32)))
+
+    def sample(self, x):
+        return np.asarray(self._sample(np.asarray(x, dtype=np.float32)))
+
+
+def _tflite_interpreter(path, num_threads):
+    # Prefer the standalone runtimes, which do not pull in the whole of TensorFlow.
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=path, num_threads=num_threads)
+
+
+class TFLitePredictor(Predictor):
+    """TFLite interpreter; resized whenever the batch size changes.
+
+    An interpreter is not thread-safe, so calls are serialised with a lock.
+    """
+
+    backend = "tflite"
+
+    def __init__(self, path, num_threads=None):
+        self.path = path
+        self._interpreter = _tflite_interpreter(path, num_threads or os.cpu_count())
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]["index"]
+        self.input_shape = (None,) + tuple(int(d) for d in self._input["shape_signature"][1:])
+        self._batch = None
+        self._lock = threading.Lock()
+
+    def predict(self, x, **kwargs):
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        with self._lock:
+            if x.shape[0] != self._batch:
+                self._interpreter.resize_tensor_input(self._input["index"], x.shape)
+                self._interpreter.allocate_tensors()
+                self._batch = x.shape[0]
+            self._interpreter.set_tensor(self._input["index"], x)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output).copy()
+
+
+class OnnxPredictor(Predictor):
+    backend = "onnx"
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.path = path
+        self._session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        inp = self._session.get_inputs()[0]
+        self._input = inp.name
+        self.input_shape = (None,) + tuple(inp.shape[1:])
+
+    def predict(self, x, **kwargs):
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        return self._session.run(None, {self._input: x})[0]
+
+
+class EnsemblePredictor(Predictor):
+    """Several independently trained models; predict() is their mean.
+
+    sample() splits the rows into len(members) contiguous blocks and runs block i
+    through member i, so K = len(members) stacked copies of a batch give one
+    prediction per member in a single call each.
+    """
+
+    backend = "ensemble"
+
+    def __init__(self, members):
+        self.members = list(members)
+        self.input_shape = self.members[0].input_shape
+
+    def predict(self, x, **kwargs):
+        return np.mean([member.predict(x) for member in self.members], axis=0)
+
+    def sample(self, x):
+        blocks = np.array_split(np.asarray(x, dtype=np.float32), len(self.members))
+        return np.concatenate([member.predict(block) for member, block in zip(self.members, blocks)
+                               if len(block)])
+
+
+_wrapped = weakref.WeakKeyDictionary()
+
+
+def as_predictor(model):
+    """`model` itself if it is a Predictor, else a (cached) KerasPredictor around it."""
+    if isinstance(model, Predictor):
+        return model
+    predictor = _wrapped.get(model)
+    if predictor is None:
+        predictor = _wrapped[model] = KerasPredictor(model)
+    return predictor
+
+
+def backend_path(keras_path, backend=BACKEND):
+    """Where the `backend` conversion of `keras_path` lives."""
+    return os.path.splitext(keras_path)[0] + EXTENSIONS[backend]
+
+
+def load_predictor(path, backend=None, num_threads=None):
+    """Load a model file as a Predictor; the backend defaults to the file extension."""
+    if backend is None:
+        ext = os.path.splitext(path)[1]
+        backend = next((b for b, e in EXTENSIONS.items() if e == ext), "keras")
+    if backend == "keras":
+        from tensorflow.keras.models import load_model
+
+        return KerasPredictor(load_model(path, compile=False))
+    if backend == "tflite":
+        return TFLitePredictor(path, num_threads)
+    if backend == "onnx":
+        return OnnxPredictor(path, num_threads)
+    raise ValueError(f"Unknown predictor backend {backend!r}; expected one of {sorted(EXTENSIONS)}")
+
+
+def _unrolled(model):
+    # TFLite builtins cannot express the TensorList loop of a Keras LSTM; with the
+    # sequence length fixed at 100 the recurrence can be unrolled instead, which
+    # converts to plain builtin ops and gives identical outputs.
+    import tensorflow as tf
+
+    config = model.get_config()
+    for layer in config["layers"]:
+        if layer["class_name"] == "Bidirectional":
+            layer["config"]["layer"]["config"]["unroll"] = True
+            if layer["config"].get("backward_layer"):
+                layer["config"]["backward_layer"]["config"]["unroll"] = True
+        elif layer["class_name"] in ("LSTM", "GRU", "SimpleRNN"):
+            layer["config"]["unroll"] = True
+    unrolled = tf.keras.Sequential.from_config(config)
+    unrolled.set_weights(model.get_weights())
+    return unrolled
+
+
+def convert(keras_path, backend="tflite", out=None, quantize=None):
+    """Export a .keras model for `backend`; returns the written path.
+
+    quantize: "float16" (TFLite only) halves the weights; "int8" stores int8 weights
+    with float activations (dynamic-range quantization), which needs no calibration data.
+    """
+    if quantize not in QUANTIZE.get(backend, ()):
+        raise ValueError(f"{backend} does not support quantize={quantize!r}")
+    import tensorflow as tf
+
+    out = out or backend_path(keras_path, backend)
+    model = tf.keras.models.load_model(keras_path, compile=False)
+    if backend == "tflite":
+        converter = tf.lite.TFLiteConverter.from_keras_model(_unrolled(model))
+        if quantize:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantize == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+        flat = converter.convert()
+        with open(out + ".tmp", "wb") as f:
+            f.write(flat)
+        os.replace(out + ".tmp", out)
+    elif backend == "onnx":
+        import tf2onnx
+
+        spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="x"),)
+        fn = tf.function(lambda x: model(x, training=False))
+        tf2onnx.convert.from_function(fn, input_signature=spec, opset=13, output_path=out + ".tmp")
+        if quantize == "int8":
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantize_dynamic(out + ".tmp", out + ".q.tmp", weight_type=QuantType.QInt8)
+            os.replace(out + ".q.tmp", out + ".tmp")
+        os.replace(out + ".tmp", out)
+    else:
+        raise ValueError(f"Cannot convert to {backend!r}")
+    return out
+
+
+def _windows(n, lookback=100, seed=0):
+    # Random-walk closes min/max scaled per window, like the app's inputs.
+    walk = np.cumsum(np.random.default_rng(seed).normal(0, 1, (n, lookback)), axis=1)
+    lo, hi = walk.min(axis=1, keepdims=True), walk.max(axis=1, keepdims=True)
+    return ((walk - lo) / (hi - lo)).astype(np.float32)[:, :, None]
+
+
+def _latency(predictor, batch, repeats=50):
+    x = _windows(batch, predictor.input_shape[1])
+    predictor.predict(x)
+    times = []
+    for _ in range(repeats):
+        started = perf_counter()
+        predictor.predict(x)
+        times.append(perf_counter() - started)
+    return float(np.median(times))
+
+
+def _measure(path, backend):
+    # Runs in a fresh interpreter so RSS reflects one worker serving this backend.
+    import resource
+
+    started = perf_counter()
+    predictor = load_predictor(path, backend)
+    predictor.predict(_windows(1, predictor.input_shape[1]))
+    ready = perf_counter() - started
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"load_seconds": ready, "peak_rss_mb": rss_kb / 1024,
+            "latency_ms_b1": _latency(predictor, 1) * 1e3,
+            "latency_ms_b64": _latency(predictor, 64, repeats=10) * 1e3}
+
+
+def report(keras_path, samples=512, variants=None):
+    """Accuracy delta vs Keras plus load time, peak RSS and latency for each backend."""
+    from forecaster import forecast
+
+    variants = variants or [("keras", None), ("tflite", None), ("tflite", "float16"),
+                            ("tflite", "int8"), ("onnx", None), ("onnx", "int8")]
+    x = _windows(samples)
+    reference = load_predictor(keras_path, "keras")
+    ref_step = reference.predict(x)[:, 0]
+    ref_path = forecast(reference, x[:32, :, 0])
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend, quantize in variants:
+            name = backend + (f"-{quantize}" if quantize else "")
+            try:
+                if backend == "keras":
+                    path = keras_path
+                else:
+                    path = convert(keras_path, backend, os.path.join(tmp, name + EXTENSIONS[backend]),
+                                   quantize)
+                predictor = load_predictor(path, backend)
+            except (ImportError, ValueError) as e:
+                rows.append({"variant": name, "error": str(e)})
+                continue
+            step = predictor.predict(x)[:, 0]
+            path_30 = forecast(predictor, x[:32, :, 0])
+            measured = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "measure", path, "--backend", backend],
+                capture_output=True, text=True, check=True)
+            rows.append(dict(
+                variant=name,
+                size_kb=os.path.getsize(path) / 1024,
+                mae_step=float(np.abs(step - ref_step).mean()),
+                max_err_step=float(np.abs(step - ref_step).max()),
+                max_err_30d=float(np.abs(path_30 - ref_path).max()),
+                **json.loads(measured.stdout.strip().splitlines()[-1]),
+            ))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert and compare LSTM inference backends.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="export a .keras model for tflite or onnx")
+    conv.add_argument("model", nargs="?", default="best_model.keras")
+    conv.add_argument("--backend", choices=["tflite", "onnx"], default="tflite")
+    conv.add_argument("--quantize", choices=["float16", "int8"])
+    conv.add_argument("--out", help="output path (default: next to the model)")
+    rep = sub.add_parser("report", help="accuracy delta, latency and RSS per backend")
+    rep.add_argument("model", nargs="?", default="best_model.keras")
+    rep.add_argument("--samples", type=int, default=512)
+    rep.add_argument("--json", help="also write the rows to this file")
+    meas = sub.add_parser("measure", help=argparse.SUPPRESS)
+    meas.add_argument("path")
+    meas.add_argument("--backend")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        print(f"Saved {convert(args.model, args.backend, args.out, args.quantize)}")
+    elif args.command == "measure":
+        print(json.dumps(_measure(args.path, args.backend)))
+    else:
+        rows = report(args.model, args.samples)
+        for row in rows:
+            if "error" in row:
+                print(f"{row['variant']:<15} skipped: {row['error']}")
+                continue
+            print(f"{row['variant']:<15} {row['size_kb']:8.0f} KB  "
+                  f"mae {row['mae_step']:.1e}  max {row['max_err_step']:.1e}  "
+                  f"30d max {row['max_err_30d']:.1e}  load {row['load_seconds']:5.2f} s  "
+                  f"rss {row['peak_rss_mb']:6.0f} MB  "
+                  f"b1 {row['latency_ms_b1']:6.2f} ms  b64 {row['latency_ms_b64']:7.2f} ms")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    # Go through the importable module so forecaster's as_predictor() sees the same
+    # Predictor class as the one report() builds.
+    from predictor import main
+
+    main()
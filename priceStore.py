@@ -0,0 +1,277 @@
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from indicators import INDICATORS, IndicatorState, compute_table
+from scaler import MinMaxState
+from tracing import traced
+
+CACHE_DIR = os.getenv("PRICE_CACHE_DIR", ".price_cache")
+# How long the last stored bar (possibly today's partial one) is trusted
+# before the next lookup refreshes it.
+TTL_SECONDS = int(os.getenv("PRICE_CACHE_TTL", "3600"))
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+@traced("yahoo.download")
+def yahoo_fetcher(ticker, start=None, end=None):
+    import yfinance as yf
+
+    data = yf.download(ticker, start=start, end=end, progress=False)
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    return data
+
+
+@traced("yahoo.currency")
+def yahoo_currency(ticker):
+    import yfinance as yf
+
+    return yf.Ticker(ticker).fast_info["currency"]
+
+
+def _to_arrays(frame):
+    if frame is None or frame.empty:
+        return np.empty(0, dtype="datetime64[D]"), np.empty((0, len(COLUMNS)))
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame = frame.copy()
+        frame.columns = frame.columns.get_level_values(0)
+    frame = frame.reindex(columns=COLUMNS).dropna(subset=["Close"])
+    dates = pd.DatetimeIndex(frame.index).tz_localize(None).values.astype("datetime64[D]")
+    return dates, frame.to_numpy(dtype=np.float64)
+
+
+class PriceStore:
+    """Per-ticker OHLCV bars kept on local disk as memory-mapped .npy files.
+
+    A lookup within `ttl` seconds of the last fetch is served from disk with no
+    network call. After that, only bars from the last stored date onwards are
+    requested and merged in, so the trailing (possibly partial) bar is replaced.
+    `fetcher(ticker, start, end)` returns a yfinance-style DataFrame and can be
+    swapped for a local fake.
+    """
+
+    def __init__(self, root=CACHE_DIR, fetcher=yahoo_fetcher,
+                 currency_fetcher=yahoo_currency, ttl=TTL_SECONDS, clock=time.time):
+        self.root = root
+        self.fetcher = fetcher
+        self.currency_fetcher = currency_fetcher
+        self.ttl = ttl
+        self.clock = clock
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _lock_for(self, ticker):
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _path(self, ticker, suffix):
+        safe = re.sub(r"[^A-Za-z0-9._-]", "_", ticker.upper())
+        return os.path.join(self.root, f"{safe}.{suffix}")
+
+    def _read_meta(self, ticker):
+        try:
+            with open(self._path(ticker, "json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, ticker, meta):
+        path = self._path(ticker, "json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def _read_bars(self, ticker):
+        try:
+            dates = np.load(self._path(ticker, "dates.npy"), mmap_mode="r")
+            values = np.load(self._path(ticker, "ohlcv.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None, None
+        if len(dates) != len(values):
+            return None, None
+        return dates, values
+
+    def _write_bars(self, ticker, dates, values):
+        for suffix, arr in (("dates.npy", dates), ("ohlcv.npy", values)):
+            path = self._path(ticker, suffix)
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, arr)
+            os.replace(path + ".tmp", path)
+
+    def _refresh(self, ticker, dates, values, meta):
+        if dates is None:
+            new_dates, new_values = _to_arrays(self.fetcher(ticker, start=None, end=None))
+            if len(new_dates) == 0:
+                return None, None
+            self._write_bars(ticker, new_dates, new_values)
+        else:
+            last = str(dates[-1])
+            new_dates, new_values = _to_arrays(self.fetcher(ticker, start=last, end=None))
+            if len(new_dates):
+                keep = dates < new_dates[0]
+                self._write_bars(ticker,
+                                 np.concatenate([dates[keep], new_dates]),
+                                 np.concatenate([values[keep], new_values]))
+        meta["fetched_at"] = self.clock()
+        self._write_meta(ticker, meta)
+        return self._read_bars(ticker)
+
+    def get(self, ticker, end=None):
+        """Return the ticker's daily bars as a DataFrame indexed by Date.
+
+        `end` (exclusive, like yf.download) trims the returned frame only; the
+        store itself always keeps everything fetched so far.
+        """
+        with self._lock_for(ticker):
+            dates, values = self._read_bars(ticker)
+            meta = self._read_meta(ticker)
+            if dates is None:
+                dates, values = self._refresh(ticker, None, None, meta)
+            elif self.clock() - meta.get("fetched_at", 0) >= self.ttl:
+                try:
+                    dates, values = self._refresh(ticker, dates, values, meta)
+                except Exception:
+                    pass  # serve the stored bars rather than failing the lookup
+        if dates is None:
+            return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+        if end is not None:
+            stop = np.searchsorted(dates, np.datetime64(end, "D"))
+            dates, values = dates[:stop], values[:stop]
+        return pd.DataFrame(values, columns=COLUMNS,
+                            index=pd.DatetimeIndex(dates.astype("datetime64[ns]"), name="Date"))
+
+    def update(self, ticker, force=False):
+        """Fetch new bars for `ticker` if it is missing or older than the TTL (or `force`).
+
+        Unlike get(), fetch errors are raised rather than answered with stale bars, so
+        bulk downloads (fetcher.py) can retry them. Returns the number of stored bars.
+        """
+        with self._lock_for(ticker):
+            dates, values = self._read_bars(ticker)
+            meta = self._read_meta(ticker)
+            if dates is None or force or self.clock() - meta.get("fetched_at", 0) >= self.ttl:
+                dates, values = self._refresh(ticker, dates, values, meta)
+        return 0 if dates is None else len(dates)
+
+    def _update_indicators(self, ticker, close):
+        meta = self._read_meta(ticker)
+        saved = meta.get("indicators")
+        try:
+            table = np.load(self._path(ticker, "ind.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            table = None
+        if (table is not None and saved and saved["rows"] == len(table)
+                and 0 < len(table) <= len(close) and saved["columns"] == INDICATORS):
+            if len(table) == len(close) and saved["last_close"] == close[-1]:
+                return table
+            # Rows before the stored trailing bar are final; resume from the checkpoint
+            # taken just before it and extend bar by bar.
+            start = len(table) - 1
+            state = IndicatorState.from_dict(saved["state"])
+            rows = []
+            for k in range(start, len(close)):
+                if k == len(close) - 1:
+                    checkpoint = state.to_dict()
+                rows.append(state.update(close[k]))
+            table = np.concatenate([table[:start], np.array(rows)])
+        else:
+            table = compute_table(close)
+            checkpoint = IndicatorState.from_history(close[:-1]).to_dict()
+        path = self._path(ticker, "ind.npy")
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, table)
+        os.replace(path + ".tmp", path)
+        meta["indicators"] = {"rows": len(table), "columns": INDICATORS,
+                              "last_close": float(close[-1]), "state": checkpoint}
+        self._write_meta(ticker, meta)
+        return table
+
+    def bars(self, ticker):
+        """(dates, OHLCV) read-only memory maps of the stored bars, without refreshing."""
+        with self._lock_for(ticker):
+            return self._read_bars(ticker)
+
+    def arrays(self, ticker):
+        """(dates, OHLCV, indicators) as arrays aligned row by row, without refreshing.
+
+        Bars are read-only memory maps; (None, None, None) when the ticker has no bars.
+        """
+        with self._lock_for(ticker):
+            dates, values = self._read_bars(ticker)
+            if dates is None or len(dates) == 0:
+                return None, None, None
+            return dates, values, self._update_indicators(ticker, np.asarray(values[:, COLUMNS.index("Close")]))
+
+    def indicators(self, ticker, end=None):
+        """Technical indicators aligned with get(), stored next to the bars.
+
+        New bars are folded in incrementally from a saved IndicatorState, so a daily
+        refresh costs O(1) per appended bar rather than a pass over the history.
+        """
+        dates, _, table = self.arrays(ticker)
+        if dates is None:
+            return pd.DataFrame(columns=INDICATORS, index=pd.DatetimeIndex([], name="Date"))
+        if end is not None:
+            stop = np.searchsorted(dates, np.datetime64(end, "D"))
+            dates, table = dates[:stop], table[:stop]
+        return pd.DataFrame(table, columns=INDICATORS,
+                            index=pd.DatetimeIndex(dates.astype("datetime64[ns]"), name="Date"))
+
+    def scaler(self, ticker):
+        """Min/max scaling state of the ticker's closes, kept in the sidecar.
+
+        Like the indicators, the stored state excludes the trailing bar so a revised
+        partial bar is folded in correctly; only bars added since the last call are read.
+        """
+        with self._lock_for(ticker):
+            dates, values = self._read_bars(ticker)
+            if dates is None or len(dates) == 0:
+                return None
+            close = values[:, COLUMNS.index("Close")]
+            meta = self._read_meta(ticker)
+            saved = meta.get("scaler")
+            if saved and 0 < saved["rows"] <= len(close):
+                if saved["rows"] == len(close) and saved["last_close"] == close[-1]:
+                    return MinMaxState.from_dict(saved["state"]).update(close[-1:])
+                checkpoint = MinMaxState.from_dict(saved["state"]).update(close[saved["rows"] - 1:-1])
+            else:
+                checkpoint = MinMaxState().update(close[:-1])
+            meta["scaler"] = {"rows": len(close), "last_close": float(close[-1]),
+                              "state": checkpoint.to_dict()}
+            self._write_meta(ticker, meta)
+            return checkpoint.copy().update(close[-1:])
+
+    def currency(self, ticker, default="INR"):
+        """Trading currency of the ticker, fetched once and then kept with the bars."""
+        meta = self._read_meta(ticker)
+        if "currency" not in meta:
+            try:
+                meta["currency"] = self.currency_fetcher(ticker) or default
+            except Exception:
+                return default
+            with self._lock_for(ticker):
+                latest = self._read_meta(ticker)
+                latest["currency"] = meta["currency"]
+                self._write_meta(ticker, latest)
+        return meta["currency"]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_price_store():
+    """Process-wide price store shared by every Streamlit session."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PriceStore()
+    return _store
@@ -0,0 +1,45 @@
+import numpy as np
+
+
+class MinMaxState:
+    """Running min/max scaling to [0, 1], updated as new values arrive.
+
+    Works on scalars or per-feature vectors (the last axis of the values passed to
+    update()). transform/inverse are plain NumPy expressions, so the request path
+    needs no sklearn import and no pass over the full history.
+    """
+
+    def __init__(self, lo=np.inf, hi=-np.inf, count=0):
+        self.lo = np.asarray(lo, dtype=np.float64)
+        self.hi = np.asarray(hi, dtype=np.float64)
+        self.count = count
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.size:
+            axes = tuple(range(values.ndim - 1)) if values.ndim > 1 else None
+            self.lo = np.minimum(self.lo, np.nanmin(values, axis=axes))
+            self.hi = np.maximum(self.hi, np.nanmax(values, axis=axes))
+            self.count += len(values)
+        return self
+
+    @property
+    def span(self):
+        span = self.hi - self.lo
+        return np.where(span > 0, span, 1.0)
+
+    def transform(self, values):
+        return (np.asarray(values) - self.lo) / self.span
+
+    def inverse(self, scaled):
+        return np.asarray(scaled) * self.span + self.lo
+
+    def copy(self):
+        return MinMaxState(self.lo.copy(), self.hi.copy(), self.count)
+
+    def to_dict(self):
+        return {"min": self.lo.tolist(), "max": self.hi.tolist(), "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["min"], data["max"], data.get("count", 0))
@@ -1,5 +1,22 @@
-import yfinance as yf
+import csv
+import os
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
 import requests
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from tracing import traced
+
+SEARCH_URL = "https://query2.finance.yahoo.com/v1/finance/search"
+# Optional CSV (columns: name,symbol) merged into the local index, e.g. an exchange listing.
+SYMBOLS_FILE = os.getenv("SYMBOLS_FILE")
+REMOTE_TTL = float(os.getenv("TICKER_CACHE_TTL", "86400"))
+NEGATIVE_TTL = float(os.getenv("TICKER_NEGATIVE_CACHE_TTL", "3600"))
 
 # Static fallback dictionary
 company_to_ticker_map = {
@@ -53,35 +70,196 @@ company_to_ticker_map = {
 }
 
 
+_SUFFIXES = {"LTD", "LIMITED", "INC", "CORP", "CORPORATION", "CO", "PLC", "COMPANY"}
+
+
+def normalize(name):
+    words = re.sub(r"[^A-Z0-9& ]", " ", name.upper()).split()
+    while len(words) > 1 and words[-1] in _SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit=None):
+    """Optimal-string-alignment distance (insert, delete, substitute, swap neighbours).
+
+    Stops early and returns limit + 1 once every alignment costs more than `limit`.
+    """
+    if limit is not None and abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                current[j] = min(current[j], before[j - 2] + 1)
+        # A swap on the next row reads the row before this one, so both must be over the limit
+        if limit is not None and min(current) > limit and min(previous) >= limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+class SymbolIndex:
+    """In-memory company name -> ticker index with exact, prefix and typo-tolerant lookup.
+
+    Prefix lookup is a bisect over the sorted names. Fuzzy lookup scores the names
+    that share a trigram with the query by edit distance (1 - distance / longer
+    length) and only answers when the best symbol scores at least `min_similarity`
+    and beats the runner-up by `min_gap`; otherwise the caller should ask the
+    remote search rather than take a local guess.
+    """
+
+    def __init__(self, entries, min_similarity=0.8, min_gap=0.1):
+        self.min_similarity = min_similarity
+        self.min_gap = min_gap
+        self.names = {}
+        self.symbols = {}
+        for name, symbol in entries.items():
+            self.names[normalize(name)] = symbol
+            self.symbols[symbol.upper()] = symbol
+            # Also accept the bare symbol without its exchange suffix, e.g. "INFY" for INFY.NS
+            self.symbols.setdefault(symbol.upper().split(".")[0], symbol)
+        self._sorted = sorted(self.names)
+        self._grams = {name: _trigrams(name) for name in self.names}
+        self._postings = defaultdict(list)
+        for name, grams in self._grams.items():
+            for gram in grams:
+                self._postings[gram].append(name)
+
+    @classmethod
+    def from_csv(cls, path, base=None):
+        entries = dict(base or {})
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("name") and row.get("symbol"):
+                    entries[row["name"]] = row["symbol"].strip()
+        return cls(entries)
+
+    def prefix(self, query):
+        start = bisect_left(self._sorted, query)
+        matches = []
+        for name in self._sorted[start:]:
+            if not name.startswith(query):
+                break
+            matches.append(name)
+        return matches
+
+    def fuzzy(self, query):
+        grams = _trigrams(query)
+        candidates = {name for gram in grams for name in self._postings.get(gram, ())}
+        scores = {}  # best score per symbol, so aliases of one ticker are not rivals
+        for name in candidates:
+            longest = max(len(query), len(name))
+            # Runners-up matter down to min_similarity - min_gap
+            limit = int(longest * (1 - self.min_similarity + self.min_gap))
+            score = 1 - edit_distance(query, name, limit) / longest
+            symbol = self.names[name]
+            if score > scores.get(symbol, (-1.0, None))[0]:
+                scores[symbol] = (score, name)
+        ranked = sorted(scores.values(), reverse=True)
+        if not ranked or ranked[0][0] < self.min_similarity:
+            return None
+        if len(ranked) > 1 and ranked[0][0] - ranked[1][0] < self.min_gap:
+            return None
+        return ranked[0][1]
+
+    def lookup(self, company_name):
+        query = normalize(company_name)
+        if not query:
+            return None
+        if query in self.names:
+            return self.names[query]
+        if query.replace(" ", "") in self.symbols:
+            return self.symbols[query.replace(" ", "")]
+        if len(query) >= 3:
+            # A prefix only counts when it is unambiguous ("HDFC" -> HDFC BANK, not "TATA")
+            candidates = {self.names[name] for name in self.prefix(query)}
+            if len(candidates) == 1:
+                return candidates.pop()
+        name = self.fuzzy(query)
+        return self.names[name] if name else None
+
+
+_index = None
+_session = None
+_init_lock = threading.Lock()
+_positive_cache = TTLCache(maxsize=4096, ttl=REMOTE_TTL)
+_negative_cache = TTLCache(maxsize=4096, ttl=NEGATIVE_TTL)
+_cache_lock = threading.Lock()
+
+
+def get_symbol_index():
+    global _index
+    if _index is None:
+        with _init_lock:
+            if _index is None:
+                if SYMBOLS_FILE and os.path.exists(SYMBOLS_FILE):
+                    _index = SymbolIndex.from_csv(SYMBOLS_FILE, base=company_to_ticker_map)
+                else:
+                    _index = SymbolIndex(company_to_ticker_map)
+    return _index
+
+
+def _http_session():
+    global _session
+    if _session is None:
+        with _init_lock:
+            if _session is None:
+                session = requests.Session()
+                retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+                session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=16, max_retries=retry))
+                session.headers["User-Agent"] = "Mozilla/5.0 (compatible; MyApp/1.0)"
+                _session = session
+    return _session
+
+
+@traced("ticker.search_remote")
+def _search_remote(query):
+    with _cache_lock:
+        if query in _positive_cache:
+            return _positive_cache[query]
+        if query in _negative_cache:
+            return None
+    symbol = None
+    try:
+        response = _http_session().get(SEARCH_URL, params={"q": query, "quotesCount": 5, "newsCount": 0}, timeout=(3.05, 5))
+        response.raise_for_status()  # Raise an error for bad status codes
+        quotes = response.json().get("quotes")
+        if quotes:
+            symbol = quotes[0]["symbol"]
+    except requests.RequestException as e:
+        # Transient failures are not cached
+        print(f"Error during API request: {str(e)}")
+        return None
+    except (KeyError, IndexError, ValueError) as e:
+        print(f"Error processing API response: {str(e)}")
+    with _cache_lock:
+        if symbol:
+            _positive_cache[query] = symbol
+        else:
+            _negative_cache[query] = True
+    return symbol
+
+
+@traced("ticker.resolve")
 def resolve_company_to_ticker(company_name):
     # Input validation
-    company_name = company_name.upper()
     if not company_name or not isinstance(company_name, str):
         return None
 
-    # Normalize company name for lookup
-    company_name = company_name.strip().upper()
-
-    # Try using static map first
-    if company_name in company_to_ticker_map:
-        return company_to_ticker_map[company_name]
-    else:
-        # Try yfinance's search API
-            try:
-                url = f"https://query2.finance.yahoo.com/v1/finance/search?q={company_name}"
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (compatible; MyApp/1.0)"
-                }
-                response = requests.get(url, headers=headers)
-                response.raise_for_status()  # Raise an error for bad status codes
-                data = response.json()
-                if data.get("quotes"):
-                    return data["quotes"][0]["symbol"]
-            except requests.RequestException as e:
-                print(f"Error during API request: {str(e)}")
-            except (KeyError, IndexError) as e:
-                print(f"Error processing API response: {str(e)}")
-    return None
+    # Local index first (exact, prefix, then typo-tolerant), then the cached Yahoo search
+    symbol = get_symbol_index().lookup(company_name)
+    if symbol:
+        return symbol
+    query = normalize(company_name)
+    return _search_remote(query) if query else None
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,94 @@
+"""Cold-start import time of each app page, measured with `python -X importtime`.
+
+    python startupBenchmark.py                      # table of pages, 5 fresh interpreters each
+    python startupBenchmark.py --json startup.json  # save the numbers
+    python startupBenchmark.py --compare startup.json
+
+Every run imports what one page needs in a fresh interpreter and sums the
+top-level cumulative times, so the numbers exclude interpreter start-up and
+Streamlit's own server. `eager` is what every page paid when app.py imported
+everything at the top, kept as the reference point.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Keep in sync with the imports in app.py (module level, then each page function).
+APP = "import streamlit, database; database.load_env(); import modelRegistry"
+PAGES = {
+    "login": APP,
+    "signup": APP,
+    "history": APP + "; import pandas",
+    "main": APP + "; import pandas, searchTicker, priceStore, pipeline, forecastCache, charts, "
+                  "tensorflow",
+    "eager": "import numpy, pandas, matplotlib.pyplot, streamlit, dotenv, database, searchTicker, "
+             "modelRegistry, windowing, priceStore, forecaster, strategy, tensorflow.keras",
+}
+
+
+def import_times(code, python=sys.executable):
+    """[(depth, module, self_us, cumulative_us)] for one fresh interpreter running `code`."""
+    proc = subprocess.run([python, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(code, repeats=5, top=5):
+    # Modules every interpreter imports before running -c (site, encodings, ...)
+    startup = {name for depth, name, _, _ in import_times("pass") if depth == 0}
+    totals, last = [], []
+    for _ in range(repeats):
+        last = [row for row in import_times(code) if not (row[0] == 0 and row[1] in startup)]
+        totals.append(sum(cum for depth, _, _, cum in last if depth == 0) / 1e3)
+    # Heaviest top-level packages (including their children) from the last run
+    heaviest = sorted(((cum, name) for depth, name, _, cum in last if depth == 0), reverse=True)
+    return {
+        "median_ms": statistics.median(totals),
+        "min_ms": min(totals),
+        "modules": len(last),
+        "heaviest": [[name, cum / 1e3] for cum, name in heaviest[:top]],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-page cold-start import time.")
+    parser.add_argument("pages", nargs="*", default=list(PAGES), help=f"subset of {list(PAGES)}")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="previous --json output to diff against")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    results = {}
+    for page in args.pages:
+        try:
+            results[page] = result = measure(PAGES[page], args.repeats)
+        except RuntimeError as e:
+            print(f"{page:<8} failed: {e}")
+            continue
+        delta = ""
+        if page in baseline:
+            delta = f"  ({result['median_ms'] - baseline[page]['median_ms']:+.0f} ms)"
+        heaviest = ", ".join(f"{name} {ms:.0f}" for name, ms in result["heaviest"])
+        print(f"{page:<8} {result['median_ms']:7.0f} ms{delta}  {result['modules']:5d} modules  "
+              f"[{heaviest}]")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def model():
+    """The repo's best_model.keras as a warmed-up Predictor (skipped without TensorFlow)."""
+    pytest.importorskip("tensorflow")
+    path = os.path.join(ROOT, "best_model.keras")
+    if not os.path.exists(path):
+        pytest.skip("best_model.keras not found")
+    from modelRegistry import ModelRegistry
+
+    return ModelRegistry(path, model_dir=None).get()
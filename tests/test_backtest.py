@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from backtest import prepare, realized_growth, run, summarize, synthetic_prices
+from forecaster import HORIZON, LOOKBACK
+from strategy import compound, turning_points
+
+
+def test_vectorized_plan_matches_compound():
+    rng = np.random.default_rng(0)
+    for _ in range(3000):
+        n = int(rng.integers(2, 40))
+        # Rounded walks so flat steps and ties are common
+        pred = np.round(100 + np.cumsum(rng.normal(0, 1, n)), int(rng.integers(0, 2)))
+        actual = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+        growth, trades = realized_growth(pred[None], actual[None])
+        buys, sells = turning_points(pred)
+        assert np.isclose(growth[0], compound(actual, buys, sells, 1.0)["final"]), pred
+        assert trades[0] == len(buys), pred
+
+
+def test_origins_never_see_later_bars():
+    close = synthetic_prices(1, 400)["SYN000"]
+    t, seeds, _, lo, _ = prepare(close, stride=7)
+    future = close.copy()
+    future[t[3]:] *= 3  # changing bars from an origin on must not move its seed
+    _, seeds2, _, lo2, _ = prepare(future, stride=7)
+    assert np.array_equal(seeds[:4], seeds2[:4]) and np.array_equal(lo[:4], lo2[:4])
+
+
+@pytest.mark.usefixtures("model")
+def test_small_walk_forward_run():
+    closes = synthetic_prices(2, 400)
+    results = run(closes, workers=1, stride=20)
+    origins = len(range(LOOKBACK, 400 - HORIZON + 1, 20))
+    assert list(results["ticker"]) == list(closes) and (results["origins"] == origins).all()
+    assert np.isfinite(results.drop(columns="ticker").to_numpy(dtype=np.float64)).all()
+    assert summarize(results)["origins"] == 2 * origins
@@ -0,0 +1,71 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from charts import _loop_lttb, downsample, figures, line_chart_frames, lttb, minmax
+from forecastCache import ForecastCache
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_downsampling_keeps_both_ends_in_order(seed):
+    rng = np.random.default_rng(seed)
+    y = np.cumsum(rng.normal(0, 1, int(rng.integers(0, 5000))))
+    n = len(y)
+    for method in ("lttb", "minmax"):
+        idx = downsample(y, 500, method)
+        assert np.all(np.diff(idx) > 0) and (n == 0 or (idx[0] == 0 and idx[-1] == n - 1))
+        assert len(idx) <= min(n, 500) + (2 if method == "minmax" else 0)
+    assert np.array_equal(lttb(y, 500), _loop_lttb(y, 500))
+    if n > 500:
+        idx = minmax(y, 500)
+        assert y[idx].min() == y.min() and y[idx].max() == y.max()
+
+
+def test_short_series_are_kept_whole():
+    y = np.arange(10.0)
+    assert np.array_equal(lttb(y, 500), np.arange(10)) and np.array_equal(minmax(y, 500), np.arange(10))
+
+
+def test_lttb_skips_the_nan_warm_up():
+    rng = np.random.default_rng(0)
+    y = np.where(np.arange(3000) < 200, np.nan, np.cumsum(rng.normal(0, 1, 3000)))
+    # Only buckets lying entirely in the NaN warm-up may pick a NaN
+    edges = np.linspace(1, 2999, 299).astype(np.intp)
+    assert np.isnan(y[lttb(y, 300)[1:-1]]).sum() == (edges[1:] <= 200).sum()
+
+
+@pytest.fixture
+def result():
+    n = 500
+    close = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, n))
+    data = pd.DataFrame({"Close": close}, index=pd.bdate_range("2023-01-02", periods=n, name="Date"))
+    future = pd.bdate_range("2025-01-01", periods=30).date
+    prices = close[-1] + np.arange(30.0)
+    return {"as_of": date(2024, 11, 29), "data": data, "prices": prices,
+            "pred_df": pd.DataFrame({"Date": future, "Predicted_Price": prices}),
+            "y": close[-100:], "y_predict": close[-100:, None], "samples": 0,
+            "sma_100": pd.Series(close).rolling(100).mean().to_numpy(),
+            "sma_200": pd.Series(close).rolling(200).mean().to_numpy()}
+
+
+def test_figures_are_cached_and_the_moving_average_shared_across_versions(result):
+    cache = ForecastCache(disk_dir=None)
+    first = figures("T", result, version="v1", cache=cache)
+    assert all(png.startswith(b"\x89PNG") for png in first.values())
+    again = figures("T", result, version="v1", cache=cache)
+    assert all(again[name] is first[name] for name in first)
+    other = figures("T", result, version="v2", cache=cache)
+    assert other["moving_average"] is first["moving_average"] and other["test"] is not first["test"]
+    assert cache.metrics()["misses"] == 5
+
+
+def test_line_chart_frames_are_downsampled_and_carry_the_band(result):
+    pred_df = result["pred_df"]
+    result["pred_df"] = pred_df.assign(Lower_Band=pred_df["Predicted_Price"] - 1,
+                                       Upper_Band=pred_df["Predicted_Price"] + 1)
+    frames = line_chart_frames(result, max_points=50)
+    assert len(frames["moving_average"]) == 50 and len(frames["test"]) == 50
+    assert list(frames["future"].columns) == ["Historical Data", "Future Predictions", "Lower Band", "Upper Band"]
+    assert len(frames["future"]) == 130
@@ -0,0 +1,98 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("pymysql")
+pytest.importorskip("streamlit")
+pytest.importorskip("dotenv")
+
+import database  # noqa: E402
+from dbpool import SqliteConnection  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE userlogin (userName TEXT PRIMARY KEY, userPassword TEXT);
+CREATE TABLE history (
+    Id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT, company_name TEXT, company_ticker TEXT,
+    investment_amount REAL, final_value REAL, total_profit REAL,
+    timestamp TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_history_username_id ON history (username, Id);
+"""
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """database.py on a SQLite file, with a fresh pool, writer and cache; st messages recorded."""
+    path = str(tmp_path / "app.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.close()
+    monkeypatch.setenv("HISTORY_SPOOL_PATH", str(tmp_path / "spool.jsonl"))
+    monkeypatch.setenv("HISTORY_FLUSH_INTERVAL", "0.05")
+    monkeypatch.setattr(database, "_history_writer", None)
+    monkeypatch.setattr(database, "_history_cache", None)
+    messages = []
+    for kind in ("error", "warning", "success", "dataframe"):
+        monkeypatch.setattr(database.st, kind, lambda *args, kind=kind, **kwargs: messages.append(kind))
+    database.configure_pool(factory=lambda: SqliteConnection(path), size=2, checkout_timeout=0.1)
+    database.messages = messages
+    yield database
+    if database._history_writer is not None:
+        database._history_writer.close()
+    database.get_pool().close()
+
+
+def add_history(db, username, n):
+    for i in range(n):
+        db.insert_history(username, "Tata Consultancy", "TCS.NS", 1000 + i, 1100 + i, 100)
+    db.flush_history()
+
+
+def test_keyset_pages_walk_the_history_newest_first(db):
+    add_history(db, "alice", 60)
+    add_history(db, "bob", 5)
+    pages, cursor = [], None
+    while True:
+        rows, cursor = db.fetch_history_page("alice", before_id=cursor, page_size=25)
+        pages.append(rows)
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [25, 25, 10]
+    amounts = [row[3] for page in pages for row in page]
+    assert amounts == sorted(amounts, reverse=True) and len(set(amounts)) == 60
+    assert all(row[0] == "alice" for page in pages for row in page)
+
+
+def test_summary_is_aggregated_per_user_and_ticker(db):
+    add_history(db, "alice", 4)
+    db.insert_history("alice", "Infosys", "INFY.NS", 500, 450, -50)
+    db.flush_history()
+    summary = db.history_summary("alice")
+    assert summary["count"] == 5 and summary["total_invested"] == 1000 * 4 + 6 + 500
+    assert summary["total_profit"] == 350
+    assert summary["per_ticker"][0] == {"Company Ticker": "TCS.NS", "Transactions": 4, "Total Profit": 400}
+
+
+def test_written_rows_invalidate_the_cached_pages(db):
+    add_history(db, "alice", 2)
+    assert len(db.fetch_history_page("alice")[0]) == 2
+    add_history(db, "alice", 1)
+    assert len(db.fetch_history_page("alice")[0]) == 3
+    assert db.messages.count("success") == 3
+
+
+def test_pool_exhaustion_is_reported_not_raised(db):
+    held = [db.get_pool().checkout(), db.get_pool().checkout()]
+    assert db.seek_history("alice") is None
+    assert db.history_summary("alice") is None
+    assert db.authenticate_user("alice", "secret") is False
+    assert db.messages == ["error"] * 3
+    for conn in held:
+        db.get_pool().release(conn)
+
+
+def test_register_then_authenticate(db):
+    assert db.register_user(" Alice ", "secret") is True
+    assert db.register_user("alice", "other") is False
+    assert db.authenticate_user("ALICE", "secret") and not db.authenticate_user("alice", "wrong")
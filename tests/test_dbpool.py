@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dbpool import ConnectionPool, PoolTimeout, SqliteConnection
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "pool.db")
+    setup = sqlite3.connect(path)
+    setup.execute("CREATE TABLE t (name TEXT)")
+    setup.commit()
+    setup.close()
+    return path
+
+
+def test_pymysql_style_sql_runs_through_the_stand_in(path):
+    pool = ConnectionPool(lambda: SqliteConnection(path), size=3)
+    for i in range(5):
+        conn = pool.checkout()
+        conn.cursor().execute("INSERT INTO t (name) VALUES (%s)", (f"row{i}",))
+        pool.release(conn)
+    conn = pool.checkout()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM t WHERE name LIKE %s", ("row%",))
+    assert cursor.fetchone()[0] == 5
+    pool.release(conn)
+    # One connection, reused without being taken for stale
+    assert pool.metrics()["created"] == 1 and pool.metrics()["stale"] == 0
+
+
+def test_connections_without_ping_are_checked_with_select_1(path):
+    pool = ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False))
+    for _ in range(5):
+        pool.release(pool.checkout())
+    assert pool.metrics()["created"] == 1 and pool.metrics()["stale"] == 0
+
+
+def test_never_more_than_size_connections_checked_out(path):
+    pool = ConnectionPool(lambda: SqliteConnection(path), size=3)
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def session(_):
+        conn = pool.checkout()
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM t")
+            count = cursor.fetchone()[0]
+            time.sleep(0.02)
+            return count
+        finally:
+            with lock:
+                active[0] -= 1
+            pool.release(conn)
+
+    with ThreadPoolExecutor(12) as executor:
+        assert set(executor.map(session, range(48))) == {0}
+    metrics = pool.metrics()
+    assert peak[0] == 3 and metrics["created"] <= 3 and metrics["waits"] > 0
+    assert metrics["checkouts"] == 48
+
+
+def test_connection_that_died_while_idle_is_replaced(path):
+    pool = ConnectionPool(lambda: SqliteConnection(path), size=2)
+    conn = pool.checkout()
+    pool.release(conn)
+    conn.close()
+    pool.release(pool.checkout())
+    assert pool.metrics()["stale"] == 1 and pool.metrics()["created"] == 2
+
+
+def test_idle_connections_past_idle_timeout_are_closed(path):
+    pool = ConnectionPool(lambda: SqliteConnection(path), idle_timeout=0.05)
+    pool.release(pool.checkout())
+    time.sleep(0.1)
+    pool.release(pool.checkout())
+    assert pool.metrics()["expired"] == 1 and pool.metrics()["created"] == 2
+
+
+def test_checkout_gives_up_after_checkout_timeout(path):
+    pool = ConnectionPool(lambda: SqliteConnection(path), size=1, checkout_timeout=0.1)
+    held = pool.checkout()
+    started = time.perf_counter()
+    with pytest.raises(PoolTimeout):
+        pool.checkout()
+    assert 0.09 < time.perf_counter() - started < 1 and pool.metrics()["waits"] == 1
+    pool.release(held)
+    pool.release(pool.checkout())
+
+
+def test_broken_connections_are_rolled_back_or_discarded(path):
+    pool = ConnectionPool(lambda: SqliteConnection(path), size=1)
+    conn = pool.checkout()
+    pool.release(conn, broken=True)  # rollback works: kept
+    assert pool.metrics()["idle"] == 1
+    conn = pool.checkout()
+    conn.close()
+    pool.release(conn, broken=True)  # rollback fails: dropped, slot freed
+    assert pool.metrics()["discarded"] == 1 and pool.metrics()["idle"] == 0
+    pool.release(pool.checkout())
+
+
+def test_factory_errors_are_retried_then_raised():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        raise OSError("refused")
+
+    pool = ConnectionPool(factory, size=1, connect_retries=2)
+    with pytest.raises(OSError):
+        pool.checkout()
+    assert len(attempts) == 3
+    # The failed checkout gave its slot back
+    with pytest.raises(OSError):
+        pool.checkout()
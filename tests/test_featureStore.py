@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import synthetic_prices
+from featureStore import FEATURES, FeatureStore, close_features, feature_columns
+from priceStore import PriceStore
+from windowing import sliding_windows
+
+
+def frame(close):
+    index = pd.bdate_range("2010-01-01", periods=len(close), name="Date")
+    return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                         "Volume": 1e6}, index=index)
+
+
+def mapped(a):
+    while a is not None and not isinstance(a, np.memmap):
+        a = a.base
+    return a is not None
+
+
+@pytest.fixture
+def visible():
+    """What the fake source currently publishes: the first `n` bars, the last one revised."""
+    return {"bars": frame(synthetic_prices(1, 1500)["SYN000"]), "n": 1200, "partial": 1.02}
+
+
+@pytest.fixture
+def prices(tmp_path, visible):
+    def fetch(ticker, start=None, end=None):
+        part = visible["bars"].iloc[:visible["n"]].copy()
+        part.iloc[-1, part.columns.get_loc("Close")] *= visible["partial"]
+        return part if start is None else part[part.index >= pd.Timestamp(start)]
+
+    return PriceStore(str(tmp_path / "prices"), fetcher=fetch, currency_fetcher=lambda t: "INR", ttl=0)
+
+
+def test_directory_is_only_created_on_the_first_sync(tmp_path, prices):
+    features = FeatureStore(prices, str(tmp_path / "features"))
+    assert features.matrix("SYN000") is None and not os.path.exists(features.root)
+    prices.get("SYN000")
+    features.sync("SYN000")
+    assert os.path.isdir(features.root)
+
+
+def test_incremental_sync_matches_a_rebuild(tmp_path, prices, visible):
+    features = FeatureStore(prices, str(tmp_path / "features"))
+    prices.get("SYN000")
+    features.sync("SYN000")
+    before = np.array(features.matrix("SYN000"))
+    # Appended bars plus a revised trailing bar
+    visible.update(n=1500, partial=1.0)
+    prices.get("SYN000")
+    assert features.sync("SYN000") == 1500
+    rebuilt = FeatureStore(prices, str(tmp_path / "rebuilt"))
+    rebuilt.sync("SYN000")
+    assert np.array_equal(features.matrix("SYN000"), rebuilt.matrix("SYN000"), equal_nan=True)
+    assert np.array_equal(before[:1199], features.matrix("SYN000")[:1199], equal_nan=True)
+    assert not np.array_equal(before[1199], features.matrix("SYN000")[1199])
+    assert features.valid_from("SYN000") == 199  # sma_200 warm-up
+
+
+def test_windows_are_zero_copy_for_contiguous_columns(tmp_path, prices):
+    features = FeatureStore(prices, str(tmp_path / "features"))
+    prices.get("SYN000")
+    features.sync("SYN000")
+    rows = 1200 - 199 - 100
+    x, _ = features.windows("SYN000", features=["Close", "log_return", "rsi_14"])
+    assert x.shape == (rows, 100, 3) and not mapped(x)  # gathered columns
+    x, y = features.windows("SYN000", features=["Close", "Open", "High"])
+    assert x.shape == (rows, 100, 3) and mapped(x)
+    x_all, _ = features.windows("SYN000")
+    assert x_all.shape[-1] == len(FEATURES) and mapped(x_all)
+    assert np.allclose(y[:, 0], features.matrix("SYN000")[299:, 0])
+
+
+def test_windows_match_the_price_store_frames(tmp_path, prices):
+    features = FeatureStore(prices, str(tmp_path / "features"))
+    prices.get("SYN000")
+    features.sync("SYN000")
+    names = ["Close", "log_return", "rsi_14"]
+    table = pd.concat([prices.get("SYN000"), prices.indicators("SYN000")], axis=1)
+    table["log_return"] = np.log(table["Close"]).diff()
+    expected = sliding_windows(table[names].dropna().to_numpy(np.float32), 100)[0]
+    got = features.windows("SYN000", features=names)[0]
+    # The store starts after the longest warm-up of all features, not just these three
+    assert np.allclose(got, expected[-len(got):], rtol=1e-5)
+
+
+def test_end_drops_later_rows_and_scaler_skips_the_warm_up(tmp_path, prices, visible):
+    features = FeatureStore(prices, str(tmp_path / "features"))
+    prices.get("SYN000")
+    features.sync("SYN000")
+    end = visible["bars"].index[1000].date()
+    assert len(features.matrix("SYN000", end=end)) == 1000
+    scaler = features.scaler("SYN000", features=["Close", "rsi_14"], end=end)
+    defined = np.array(features.matrix("SYN000", ["Close", "rsi_14"])[199:1000])
+    assert np.allclose(scaler.lo, defined.min(axis=0)) and np.allclose(scaler.hi, defined.max(axis=0))
+
+
+def test_close_features_match_the_store_for_a_bare_close_series(tmp_path):
+    close = synthetic_prices(1, 400)["SYN000"]
+    bars = frame(close).assign(High=close, Low=close)
+    prices = PriceStore(str(tmp_path / "prices"), fetcher=lambda t, start=None, end=None: bars,
+                        currency_fetcher=lambda t: "INR", ttl=float("inf"))
+    features = FeatureStore(prices, str(tmp_path / "features"))
+    prices.update("SYN000")
+    features.sync("SYN000")
+    assert np.array_equal(close_features(close), features.matrix("SYN000"), equal_nan=True)
+    assert close_features(close, ["Close", "rsi_14"]).shape == (400, 2)
+
+
+def test_features_must_be_known_and_start_with_close():
+    assert feature_columns(["Close", "Open"]) == [0, 1]
+    with pytest.raises(ValueError, match="Unknown"):
+        feature_columns(["Close", "vwap"])
+    with pytest.raises(ValueError, match="first feature"):
+        feature_columns(["Open", "Close"])
@@ -0,0 +1,119 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fetcher import BulkFetcher, HttpCsvSource, TokenBucket, backoff_delays, serve_fake_prices
+from priceStore import PriceStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def bars(n=50):
+    close = 100 + np.arange(n, dtype=np.float64)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=1), periods=n)
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1e6},
+                        index=pd.DatetimeIndex(dates, name="Date"))
+
+
+class Source:
+    """Serves `bars()` for every ticker; `failures` maps ticker -> errors left to raise."""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.calls = []
+
+    def __call__(self, ticker, start, end):
+        self.calls.append(ticker)
+        if self.failures.get(ticker, 0):
+            self.failures[ticker] -= 1
+            raise ConnectionError("503")
+        return pd.DataFrame() if ticker == "EMPTY" else bars()
+
+
+def make(tmp_path, source, **options):
+    options.setdefault("retries", 2)
+    return BulkFetcher(PriceStore(str(tmp_path / "store")), source, rate=0, workers=4,
+                       progress_path=str(tmp_path / "progress.json"), sleep=lambda s: None, **options)
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5) and bucket.acquire() == pytest.approx(0.5)
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_backoff_grows_up_to_the_cap():
+    assert backoff_delays(6, base=0.5, cap=4.0, rng=lambda: 1.0) == [0.5, 1.0, 2.0, 4.0, 4.0, 4.0]
+    assert backoff_delays(3, base=0.5, rng=lambda: 0.0) == [0.25, 0.5, 1.0]
+
+
+def test_transient_errors_are_retried(tmp_path):
+    source = Source({"AAA": 2})
+    report = make(tmp_path, source).run(["AAA", "EMPTY"])
+    assert report["done"] == 1 and report["empty"] == 1 and report["failed"] == 0
+    assert report["requests"] == 4 and report["retries"] == 2 and source.calls.count("AAA") == 3
+
+
+def test_completed_run_deletes_its_progress_file(tmp_path):
+    make(tmp_path, Source()).run(["AAA", "BBB"])
+    assert not (tmp_path / "progress.json").exists()
+
+
+def test_interrupted_run_resumes_only_what_failed(tmp_path):
+    report = make(tmp_path, Source({"BAD": 10})).run(["AAA", "BAD"])
+    assert report["failed"] == 1 and "ConnectionError" in report["failures"]["BAD"]
+    progress = json.loads((tmp_path / "progress.json").read_text())
+    assert progress["AAA"]["status"] == "done" and progress["BAD"]["status"] == "failed"
+
+    source = Source()
+    report = make(tmp_path, source).run(["AAA", "BAD"])
+    assert report["resumed"] == 1 and report["done"] == 1 and source.calls == ["BAD"]
+    assert not (tmp_path / "progress.json").exists()
+
+
+def test_stale_progress_is_ignored(tmp_path):
+    old = {"AAA": {"status": "done", "bars": 50, "at": time.time() - 3600}}
+    (tmp_path / "progress.json").write_text(json.dumps(old))
+    source = Source({"BAD": 10})
+    report = make(tmp_path, source, progress_max_age=60).run(["AAA", "BAD"])
+    assert report["resumed"] == 0 and "AAA" in source.calls
+
+
+def test_fake_server_prices_are_stable_across_servers(tmp_path):
+    closes = []
+    for seed in (0, 1):
+        server, url = serve_fake_prices(n_days=100, failure_rate=0, latency=0, seed=seed)
+        try:
+            closes.append(HttpCsvSource(url)("FAKE0001", None, None)["Close"].to_numpy())
+            assert HttpCsvSource(url)("MISSING0", None, None).empty
+        finally:
+            server.shutdown()
+    assert len(closes[0]) == 100 and np.array_equal(closes[0], closes[1])
+
+
+def test_bulk_fetch_against_the_fake_server(tmp_path):
+    server, url = serve_fake_prices(n_days=100, failure_rate=0.2, latency=0, seed=0)
+    try:
+        store = PriceStore(str(tmp_path / "store"))
+        fetcher = BulkFetcher(store, HttpCsvSource(url), rate=0, workers=4, retries=8, backoff=0,
+                              sleep=lambda s: None)
+        report = fetcher.run([f"FAKE{i:04d}" for i in range(10)] + ["MISSING0"])
+    finally:
+        server.shutdown()
+    assert report["done"] == 10 and report["empty"] == 1 and report["failed"] == 0
+    assert report["bars"] == 1000 and report["request_errors"] == report["retries"]
+    assert len(store.get("FAKE0003")) == 100
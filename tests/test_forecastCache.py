@@ -0,0 +1,73 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from forecastCache import ForecastCache
+
+KEY = ("TCS.NS", "2025-01-02", "v1")
+
+
+def slow_forecast(calls, delay=0.2):
+    def compute():
+        calls.append(1)
+        time.sleep(delay)
+        return {"prices": np.zeros(30), "png": b"x" * 100_000}
+    return compute
+
+
+def test_concurrent_requests_share_one_computation():
+    cache, calls = ForecastCache(max_bytes=2**20), []
+    with ThreadPoolExecutor(32) as pool:
+        results = list(pool.map(lambda _: cache.get_or_compute(KEY, slow_forecast(calls)), range(32)))
+    assert len(calls) == 1 and all(r is results[0] for r in results)
+    metrics = cache.metrics()
+    assert metrics["misses"] == 1 and metrics["coalesced"] + metrics["hits"] == 31
+    assert metrics["hit_rate"] == 31 / 32
+
+
+def test_memory_cap_evicts_least_recently_used():
+    cache = ForecastCache(max_bytes=2**20)
+    cache.get_or_compute(KEY, slow_forecast([], delay=0))
+    for i in range(20):
+        cache.get_or_compute((f"T{i}", "2025-01-02", "v1"), lambda: {"png": b"x" * 100_000})
+    assert cache.metrics()["bytes"] <= cache.max_bytes and cache.metrics()["evictions"] > 0
+    assert cache.get(KEY) is None and cache.get(("T19", "2025-01-02", "v1")) is not None
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = ForecastCache()
+
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError("download failed")
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(cache.get_or_compute, ("BAD", 1, 1), failing) for _ in range(4)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result()
+    assert cache.get(("BAD", 1, 1)) is None
+
+
+def test_no_data_is_not_cached(tmp_path):
+    cache = ForecastCache(disk_dir=str(tmp_path))
+    assert cache.get_or_compute(("NEW", 1, 1), lambda: None) is None
+    assert cache.metrics()["entries"] == 0 and not os.listdir(tmp_path)
+    assert cache.get_or_compute(("NEW", 1, 1), lambda: {"p": 1}) == {"p": 1}
+
+
+def test_disk_tier_outlives_the_memory_cache(tmp_path):
+    calls = []
+    ForecastCache(disk_dir=str(tmp_path)).get_or_compute(KEY, slow_forecast(calls, delay=0))
+    warm = ForecastCache(disk_dir=str(tmp_path))
+    value = warm.get_or_compute(KEY, slow_forecast(calls, delay=0))
+    assert len(calls) == 1 and warm.metrics()["disk_hits"] == 1 and value["png"] == b"x" * 100_000
+
+
+def test_disk_tier_is_pruned(tmp_path):
+    cache = ForecastCache(disk_dir=str(tmp_path), max_disk_entries=3)
+    for i in range(6):
+        cache.get_or_compute(("T", i, "v1"), lambda: {"p": i})
+    assert len(os.listdir(tmp_path)) == 3
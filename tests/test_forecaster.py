@@ -0,0 +1,64 @@
+import numpy as np
+
+from forecaster import LOOKBACK, _loop_forecast, forecast, quantile_bands, sample_paths, smooth
+from predictor import EnsemblePredictor, Predictor
+
+
+def test_forecast_matches_the_per_day_predict_loop(model):
+    seed = np.random.default_rng(0).random(LOOKBACK).astype(np.float32)
+    looped = _loop_forecast(model, seed, horizon=10)
+    batched = forecast(model, seed[None], horizon=10)
+    assert batched.shape == (1, 10) and batched.dtype == np.float32
+    assert np.allclose(looped, batched[0], atol=1e-6)
+
+
+def test_batched_seeds_match_single_seed_forecasts(model):
+    seeds = np.random.default_rng(1).random((8, LOOKBACK)).astype(np.float32)
+    batched = forecast(model, seeds, horizon=5)
+    for seed, row in zip(seeds[:2], batched[:2]):
+        assert np.allclose(forecast(model, seed[None], horizon=5)[0], row, atol=1e-5)
+
+
+def test_extra_features_are_carried_forward():
+    # A single-feature model cannot take F > 1, so drive forecast() with a stand-in
+    class ClosePlusFeature(Predictor):
+        def predict(self, x, **kwargs):
+            return x[:, -1, :1] + x[:, -1, 1:2]
+
+    seeds = np.zeros((2, LOOKBACK, 3), dtype=np.float32)
+    seeds[:, -1, 1:] = [[5, 0], [7, 0]]
+    assert np.array_equal(forecast(ClosePlusFeature(), seeds, horizon=3), [[5, 10, 15], [7, 14, 21]])
+
+
+def test_smooth_keeps_the_length_and_the_first_values():
+    preds = np.arange(10.0)
+    smoothed = smooth(preds, window=3)
+    assert len(smoothed) == 10 and np.array_equal(smoothed[:2], preds[:2])
+    assert np.allclose(smoothed[2:], preds[1:-1])
+    assert np.array_equal(smooth(np.ones((4, 2))), np.ones((4, 2)))
+
+
+def test_mc_dropout_paths_spread_around_the_forecast(model):
+    seeds = np.random.default_rng(2).random((2, LOOKBACK)).astype(np.float32)
+    paths = sample_paths(model, seeds, samples=16, horizon=5)
+    assert paths.shape == (2, 16, 5) and paths.dtype == np.float32
+    assert paths.std(axis=1).min() > 0
+    bands = quantile_bands(paths)
+    assert bands[0.5].shape == (2, 5)
+    assert np.all(bands[0.1] <= bands[0.5]) and np.all(bands[0.5] <= bands[0.9])
+
+
+class Drift(Predictor):
+    def __init__(self, step):
+        self.step = step
+
+    def predict(self, x, **kwargs):
+        return x[:, -1, :1] + self.step
+
+
+def test_each_ensemble_member_forecasts_one_path():
+    seeds = np.zeros((3, LOOKBACK), dtype=np.float32)
+    paths = sample_paths(EnsemblePredictor([Drift(1), Drift(-1)]), seeds, samples=2, horizon=4)
+    assert paths.shape == (3, 2, 4)
+    assert np.array_equal(paths[:, 0], np.tile([1, 2, 3, 4], (3, 1)))
+    assert np.array_equal(paths[:, 1], -paths[:, 0])
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+
+import pytest
+
+from historyWriter import HistoryWriter
+
+ROW = ("user0", "TCS", "TCS.NS", 1000, 1100, 100)
+
+
+@pytest.fixture
+def writers():
+    created = []
+    yield created
+    for writer in created:
+        writer.close()
+
+
+def make(writers, write_batch, tmp_path, **options):
+    options.setdefault("flush_interval", 0.05)  # keeps close() quick
+    writer = HistoryWriter(write_batch, str(tmp_path / f"spool{len(writers)}.jsonl"), **options)
+    writers.append(writer)
+    return writer
+
+
+def test_flush_waits_for_rows_already_taken_by_the_writer_thread(writers, tmp_path):
+    written = []
+
+    def slow_write(rows):
+        time.sleep(0.05)
+        written.extend(rows)
+
+    writer = make(writers, slow_write, tmp_path, flush_interval=1.0)
+    writer.enqueue(ROW)
+    time.sleep(0.1)
+    started = time.perf_counter()
+    writer.flush()
+    assert written == [ROW] and time.perf_counter() - started < 0.5
+
+
+def test_rows_are_written_in_batches(writers, tmp_path):
+    batches = []
+    writer = make(writers, batches.append, tmp_path, batch_size=50)
+    for i in range(120):
+        writer.enqueue(("user0", "TCS", "TCS.NS", i, i, 0))
+    writer.flush()
+    assert sum(len(batch) for batch in batches) == 120 and max(len(batch) for batch in batches) <= 50
+    assert [row[3] for batch in batches for row in batch] == list(range(120))
+
+
+def test_failed_writes_are_spooled_then_replayed_first(writers, tmp_path):
+    written, failing = [], [True]
+
+    def flaky_write(rows):
+        if failing[0]:
+            raise OSError("database down")
+        written.extend(rows)
+
+    writer = make(writers, flaky_write, tmp_path, retry_interval=0.05)
+    writer.enqueue(("user1", "INFY", "INFY.NS", 1, 1, 0))
+    writer.flush()
+    metrics = writer.metrics()
+    assert metrics["spooled"] == 1 and metrics["spool_pending"] and metrics["last_error"] == "database down"
+    failing[0] = False
+    writer.enqueue(("user1", "INFY", "INFY.NS", 2, 2, 0))
+    writer.flush()
+    assert [row[3] for row in written] == [1, 2]
+    assert not writer.metrics()["spool_pending"] and not os.path.exists(writer.spool_path)
+
+
+def test_flush_after_close_drains_on_the_calling_thread(writers, tmp_path):
+    written = []
+    writer = make(writers, written.extend, tmp_path)
+    writer.close()
+    writer.enqueue(ROW)
+    writer.flush()
+    assert written == [ROW]
+
+
+def test_counters_stay_exact_with_concurrent_sessions(writers, tmp_path):
+    written = []
+    writer = make(writers, written.extend, tmp_path)
+    threads = [threading.Thread(target=lambda: [writer.enqueue(ROW) for _ in range(2000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.flush()
+    metrics = writer.metrics()
+    assert metrics["enqueued"] == metrics["written"] == len(written) == 16000
+    assert metrics["queue_depth"] == 0
+
+
+def test_spool_path_defaults_to_the_environment(writers, tmp_path, monkeypatch):
+    monkeypatch.setenv("HISTORY_SPOOL_PATH", str(tmp_path / "from-env.jsonl"))
+    writer = HistoryWriter(lambda rows: None)
+    writers.append(writer)
+    assert writer.spool_path == str(tmp_path / "from-env.jsonl")
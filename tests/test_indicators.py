@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import INDICATORS, IndicatorState, compute, compute_table
+
+
+@pytest.fixture(scope="module")
+def close():
+    return 100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, 1500)))
+
+
+def test_matches_the_pandas_definitions(close):
+    series = pd.Series(close)
+    values = compute(close)
+    for n in (20, 100, 200):
+        assert np.allclose(values[f"sma_{n}"], series.rolling(n).mean(), equal_nan=True)
+    ema_12 = series.ewm(span=12, adjust=False).mean()
+    ema_26 = series.ewm(span=26, adjust=False).mean()
+    assert np.allclose(values["ema_12"], ema_12) and np.allclose(values["ema_26"], ema_26)
+    assert np.allclose(values["macd_signal"], (ema_12 - ema_26).ewm(span=9, adjust=False).mean())
+    delta = series.diff().iloc[1:]
+    gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    loss = (-delta).clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    assert np.allclose(values["rsi_14"][1:], 100 - 100 / (1 + gain / loss)) and np.isnan(values["rsi_14"][0])
+    std = series.rolling(20).std(ddof=0)
+    assert np.allclose(values["bb_upper"], series.rolling(20).mean() + 2 * std, equal_nan=True)
+
+
+def test_a_matrix_of_tickers_matches_one_call_per_ticker(close):
+    prices = np.stack([close, close[::-1], close * 2])
+    values = compute(prices)
+    for row, series in enumerate(prices):
+        single = compute(series)
+        for name in INDICATORS:
+            assert np.allclose(values[name][row], single[name], equal_nan=True), name
+
+
+def test_incremental_updates_match_the_vectorized_table(close):
+    reference = compute_table(close)
+    state = IndicatorState()
+    rows = np.array([state.update(price) for price in close[:300]])
+    assert np.allclose(rows, reference[:300], rtol=1e-9, equal_nan=True)
+    # Resuming from the vectorized state, and from its serialized form
+    state = IndicatorState.from_dict(IndicatorState.from_history(close[:-1]).to_dict())
+    assert np.allclose(state.update(close[-1]), reference[-1], rtol=1e-9, equal_nan=True)
+
+
+def test_short_and_empty_series():
+    assert compute_table(np.array([])).shape == (0, len(INDICATORS))
+    table = compute_table(np.array([1.0, 2.0, 3.0]))
+    assert np.isnan(table[:, INDICATORS.index("sma_20")]).all()
+    assert table[2, INDICATORS.index("rsi_14")] == 100.0  # no losses yet
@@ -0,0 +1,128 @@
+import socket
+import threading
+import warnings
+
+import numpy as np
+import pytest
+
+from inferenceServer import (InferenceUnavailable, MicroBatcher, RemotePredictor, RemoteRegistry,
+                             SamplingUnavailable, make_server)
+from predictor import Predictor
+from scaler import MinMaxState
+
+
+class LastValue(Predictor):
+    """Predicts twice the last close of each window; cannot sample (like TFLite/ONNX)."""
+
+    backend = "tflite"
+
+    def predict(self, x, **kwargs):
+        return 2 * np.asarray(x, dtype=np.float32)[:, -1, :1]
+
+
+class Registry:
+    version, path, features, input_shape = "v1", "model.tflite", ["Close"], (None, 100, 1)
+
+    def get(self):
+        return LastValue()
+
+    def scaler_params(self):
+        return {"AAA": MinMaxState(1.0, 3.0, 10).to_dict()}
+
+    def metrics(self):
+        return {}
+
+
+def windows(n, lookback=100, start=0):
+    return np.arange(start, start + n * lookback, dtype=np.float32).reshape(n, lookback, 1)
+
+
+def test_concurrent_requests_share_a_batch():
+    entered, release, sizes = threading.Event(), threading.Event(), []
+
+    def predict(x):
+        sizes.append(len(x))
+        entered.set()
+        release.wait(5)
+        return LastValue().predict(x)
+
+    batcher = MicroBatcher(predict, max_batch=64, max_wait_ms=50)
+    first = batcher.submit(windows(1))
+    entered.wait(5)
+    # Queued while the first batch runs: merged into one call
+    futures = [batcher.submit(windows(1, start=100 * i)) for i in range(1, 8)]
+    release.set()
+    assert first.result().shape == (1, 1)
+    for i, future in enumerate(futures, 1):
+        assert future.result()[0, 0] == 2 * (100 * i + 99)
+    assert sizes == [1, 7] and batcher.metrics()["batches"] == 2
+    batcher.close()
+
+
+def test_batches_split_by_shape_and_limit():
+    sizes = []
+
+    def predict(x):
+        sizes.append(x.shape[:2])
+        return LastValue().predict(x)
+
+    batcher = MicroBatcher(predict, max_batch=4, max_wait_ms=20)
+    futures = [batcher.submit(windows(3)), batcher.submit(windows(1, lookback=50)),
+               batcher.submit(windows(6))]
+    assert [f.result().shape for f in futures] == [(3, 1), (1, 1), (6, 1)]
+    assert (3, 100) in sizes and (1, 50) in sizes and (6, 100) in sizes
+    batcher.close()
+
+
+def test_errors_reach_every_request_of_the_batch():
+    batcher = MicroBatcher(lambda x: 1 / 0, max_wait_ms=20)
+    futures = [batcher.submit(windows(1)) for _ in range(3)]
+    for future in futures:
+        with pytest.raises(ZeroDivisionError):
+            future.result()
+    assert batcher.metrics()["errors"] >= 1
+    batcher.close()
+
+
+@pytest.fixture
+def server():
+    server = make_server(Registry(), port=0, max_wait_ms=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.batcher.close()
+
+
+def test_remote_predict_round_trip(server):
+    client = RemotePredictor(server)
+    x = windows(5)
+    assert np.array_equal(client.predict(x), LastValue().predict(x)) and client.version == "v1"
+
+
+def test_backend_without_sampling_answers_501(server):
+    with pytest.raises(SamplingUnavailable, match="no stochastic forward pass"):
+        RemotePredictor(server).sample(windows(2))
+
+
+def test_remote_registry_reads_version_and_scalers(server):
+    registry = RemoteRegistry(server, fallback=False)
+    assert registry.get() is registry.predictor and registry.version == "v1"
+    assert registry.scaler("AAA").to_dict() == MinMaxState(1.0, 3.0, 10).to_dict()
+    assert registry.scaler("BBB") is None
+
+
+def unused_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def test_unreachable_server_falls_back_to_the_local_model():
+    client = RemotePredictor(unused_url(), fallback=LastValue, retry_seconds=60)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        out = client.predict(windows(2))
+    assert np.array_equal(out, LastValue().predict(windows(2))) and not client.available
+    assert any("predicting in process" in str(w.message) for w in caught)
+    with pytest.raises(InferenceUnavailable):
+        RemotePredictor(unused_url()).predict(windows(1))
@@ -0,0 +1,93 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import INDICATORS, compute_table
+from inferenceServer import SamplingUnavailable
+from pipeline import HORIZON, LOOKBACK, predict_ticker
+from predictor import EnsemblePredictor, Predictor
+from scaler import MinMaxState
+from strategy import plan_trades
+
+
+@pytest.fixture(scope="module")
+def bars():
+    close = 100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, 2500)))
+    index = pd.DatetimeIndex(pd.bdate_range("2015-01-01", periods=len(close)), name="Date")
+    data = pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close,
+                         "Volume": 1e6}, index=index)
+    indicators = pd.DataFrame(compute_table(close), columns=INDICATORS, index=index)
+    return data, indicators, MinMaxState().update(close)
+
+
+def test_result_has_the_forecast_and_its_plan(bars, model):
+    data, indicators, scaler = bars
+    result = predict_ticker("TEST", data, indicators, model, scaler, today=date(2024, 1, 5))
+    assert result["as_of"] == data.index[-1].date()
+    assert result["prices"].shape == (HORIZON,) and np.all(np.isfinite(result["prices"]))
+    assert np.allclose(result["pred_df"]["Predicted_Price"], result["prices"])
+    # Business days after `today`: Friday -> the following Monday
+    assert result["pred_df"]["Date"].iloc[0] == date(2024, 1, 8)
+    assert all(d.weekday() < 5 for d in result["pred_df"]["Date"])
+    buys, sells = plan_trades(result["prices"])
+    assert np.array_equal(result["buys"], buys) and np.array_equal(result["sells"], sells)
+    assert result["bands"] is None and result["samples"] == 0
+
+
+def test_test_set_predictions_cover_the_last_fifth(bars, model):
+    data, indicators, scaler = bars
+    result = predict_ticker("TEST", data, indicators, model, scaler)
+    test_days = len(data) - int(len(data) * 0.80)
+    assert len(result["y"]) == len(result["y_predict"]) == test_days
+    assert np.allclose(result["y"], data["Close"].to_numpy()[-test_days:])
+    assert len(result["sma_100"]) == len(data) and np.isnan(result["sma_100"][LOOKBACK - 2])
+
+
+def test_bands_come_from_the_sampled_paths(bars, model):
+    data, indicators, scaler = bars
+    result = predict_ticker("TEST", data, indicators, model, scaler, samples=16, cost=0.001)
+    bands = result["bands"]
+    assert result["samples"] == 16 and np.all(bands[0.1] <= bands[0.9])
+    # The median path is the forecast, and the plan only keeps trades of the median's plan
+    assert np.array_equal(result["prices"], bands[0.5])
+    planned = plan_trades(result["prices"], cost=0.001)
+    assert set(zip(result["buys"], result["sells"])) <= set(zip(*planned))
+    assert np.allclose(result["pred_df"]["Lower_Band"], bands[0.1])
+
+
+class NoSampling(Predictor):
+    """A model whose sample() fails, e.g. a server answering 501."""
+
+    def __init__(self, model, error):
+        self.model, self.error = model, error
+        self.input_shape = model.input_shape
+
+    def predict(self, x, **kwargs):
+        return self.model.predict(x)
+
+    def sample(self, x):
+        raise self.error
+
+
+def test_unsupported_sampling_falls_back_to_the_plain_forecast(bars, model):
+    data, indicators, scaler = bars
+    plain = predict_ticker("TEST", data, indicators, model, scaler)
+    with pytest.warns(UserWarning, match="No forecast bands"):
+        result = predict_ticker("TEST", data, indicators, NoSampling(model, SamplingUnavailable("501")),
+                                scaler, samples=16)
+    assert result["bands"] is None and result["samples"] == 0
+    assert "Lower_Band" not in result["pred_df"] and np.allclose(result["prices"], plain["prices"])
+
+
+def test_sampling_failures_are_not_silenced(bars, model):
+    data, indicators, scaler = bars
+    with pytest.raises(RuntimeError, match="OOM"):
+        predict_ticker("TEST", data, indicators, NoSampling(model, RuntimeError("OOM")), scaler, samples=16)
+
+
+def test_an_ensemble_samples_one_path_per_member(bars, model):
+    data, indicators, scaler = bars
+    ensemble = EnsemblePredictor([model, model])
+    assert predict_ticker("TEST", data, indicators, ensemble, scaler, samples=100)["samples"] == 2
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import compute_table
+from priceStore import PriceStore
+
+
+class FakeYahoo:
+    """yfinance-style frames of a fixed daily series; records every call."""
+
+    def __init__(self, days=400):
+        close = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, days))
+        index = pd.bdate_range("2020-01-01", periods=days, name="Date")
+        self.full = pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+                                  "Volume": 1e6}, index=index)
+        self.visible = days
+        self.calls = []
+        self.fail = False
+
+    def __call__(self, ticker, start=None, end=None):
+        self.calls.append(start)
+        if self.fail:
+            raise ConnectionError("Yahoo down")
+        frame = self.full.iloc[:self.visible]
+        return frame if start is None else frame[frame.index >= pd.Timestamp(start)]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def store(tmp_path):
+    fake, clock = FakeYahoo(), Clock()
+    fake.visible = 300
+    store = PriceStore(str(tmp_path), fetcher=fake, currency_fetcher=lambda t: "USD", ttl=60, clock=clock)
+    store.fake, store.clock_ = fake, clock
+    return store
+
+
+def test_repeat_lookups_within_ttl_are_served_from_disk(store):
+    first = store.get("TCS.NS")
+    second = store.get("TCS.NS")
+    assert len(first) == 300 and second.equals(first)
+    assert store.fake.calls == [None]
+
+
+def test_refresh_only_fetches_from_the_last_stored_bar(store):
+    store.get("TCS.NS")
+    # The trailing bar was partial: it is revised, and 20 new bars arrive
+    store.fake.full.iloc[299, store.fake.full.columns.get_loc("Close")] += 5
+    store.fake.visible = 320
+    store.clock_.now += 61
+    frame = store.get("TCS.NS")
+    assert store.fake.calls == [None, "2021-02-23"]
+    assert frame.index.is_unique and len(frame) == 320
+    assert np.allclose(frame["Close"], store.fake.full["Close"].iloc[:320])
+
+
+def test_end_trims_the_result_but_not_the_store(store):
+    january = store.get("TCS.NS", end="2020-02-01")
+    assert len(january) == 23 and january.index[-1] == pd.Timestamp("2020-01-31")
+    assert len(store.get("TCS.NS")) == 300
+
+
+def test_failed_refresh_serves_stored_bars_but_update_raises(store):
+    store.get("TCS.NS")
+    store.fake.fail = True
+    store.clock_.now += 61
+    assert len(store.get("TCS.NS")) == 300
+    with pytest.raises(ConnectionError):
+        store.update("TCS.NS")
+
+
+def test_incremental_indicators_and_scaler_match_a_full_pass(store):
+    store.get("TCS.NS")
+    store.indicators("TCS.NS")
+    store.scaler("TCS.NS")
+    store.fake.full.iloc[299, store.fake.full.columns.get_loc("Close")] -= 3
+    store.fake.visible = 400
+    store.clock_.now += 61
+    close = store.get("TCS.NS")["Close"].to_numpy()
+    assert np.allclose(store.indicators("TCS.NS").to_numpy(), compute_table(close), equal_nan=True)
+    scaler = store.scaler("TCS.NS")
+    assert scaler.lo == close.min() and scaler.hi == close.max() and scaler.count == 400
+
+
+def test_currency_is_fetched_once(store):
+    store.get("TCS.NS")
+    calls = []
+    store.currency_fetcher = lambda t: calls.append(t) or "INR"
+    assert store.currency("TCS.NS") == store.currency("TCS.NS") == "INR"
+    assert calls == ["TCS.NS"]
+
+
+def test_unknown_ticker_gives_an_empty_frame(tmp_path):
+    store = PriceStore(str(tmp_path), fetcher=lambda *a, **k: None)
+    assert store.get("NOPE").empty and store.scaler("NOPE") is None
@@ -0,0 +1,110 @@
+import random
+
+import pytest
+import requests
+
+import searchTicker
+from searchTicker import SymbolIndex, company_to_ticker_map, edit_distance, normalize
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SymbolIndex(company_to_ticker_map)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("TCS", "TCS.NS"), ("infosys ltd", "INFY.NS"), ("INFY", "INFY.NS"), ("HDFC", "HDFCBANK.NS"),
+    # Typos
+    ("INFOSIS", "INFY.NS"), ("NVIDA", "NVDA"), ("MICROSFT", "MSFT"), ("GOOGEL", "GOOG"),
+    # Different companies close to a known name, and ambiguous prefixes, go to the remote search
+    ("BANK OF INDIA", None), ("ADANI POWER", None), ("TATA", None), ("TATA POWER", None),
+    ("", None), ("   ", None),
+])
+def test_local_lookup(index, query, expected):
+    assert index.lookup(query) == expected
+
+
+def test_normalize_drops_punctuation_and_company_suffixes():
+    assert normalize("Infosys Ltd.") == "INFOSYS" and normalize("Apple, Inc") == "APPLE"
+    assert normalize("Limited") == "LIMITED"
+
+
+def test_edit_distance_counts_adjacent_swaps_once():
+    assert edit_distance("INFOSIS", "INFOSYS") == 1 and edit_distance("GOOGEL", "GOOGLE") == 1
+    assert edit_distance("", "ABC") == 3 and edit_distance("ABC", "ABC") == 0
+
+
+def test_limited_edit_distance_agrees_with_the_full_one():
+    rng = random.Random(0)
+    for _ in range(20000):
+        a = "".join(rng.choices("ABCD ", k=rng.randint(0, 9)))
+        b = "".join(rng.choices("ABCD ", k=rng.randint(0, 9)))
+        limit = rng.randint(0, 4)
+        full = edit_distance(a, b)
+        limited = edit_distance(a, b, limit)
+        # Exact within the limit; past it, only "more than limit" is promised
+        assert limited == full if full <= limit else limited > limit, (a, b, limit)
+
+
+def test_symbols_file_entries_are_merged(tmp_path):
+    path = tmp_path / "symbols.csv"
+    path.write_text("name,symbol\nAdani Power Ltd, ADANIPOWER.NS\n,SKIPPED\n")
+    index = SymbolIndex.from_csv(str(path), base=company_to_ticker_map)
+    assert index.lookup("ADANI POWER") == "ADANIPOWER.NS" and index.lookup("TCS") == "TCS.NS"
+
+
+class FakeSession:
+    def __init__(self, quotes=None, error=None):
+        self.quotes, self.error, self.calls = quotes, error, []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append(params["q"])
+        if self.error:
+            raise self.error
+        session = self
+
+        class Response:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return {"quotes": session.quotes}
+
+        return Response()
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    def install(session):
+        monkeypatch.setattr(searchTicker, "_session", session)
+        monkeypatch.setattr(searchTicker, "_index", SymbolIndex(company_to_ticker_map))
+        searchTicker._positive_cache.clear()
+        searchTicker._negative_cache.clear()
+        return session
+    yield install
+    searchTicker._positive_cache.clear()
+    searchTicker._negative_cache.clear()
+
+
+def test_local_hits_never_reach_the_remote_search(remote):
+    session = remote(FakeSession(quotes=[{"symbol": "WRONG"}]))
+    assert searchTicker.resolve_company_to_ticker("Infosys Limited") == "INFY.NS"
+    assert session.calls == []
+
+
+def test_remote_answers_and_misses_are_cached(remote):
+    session = remote(FakeSession(quotes=[{"symbol": "TATAPOWER.NS"}]))
+    assert searchTicker.resolve_company_to_ticker("Tata Power") == "TATAPOWER.NS"
+    assert searchTicker.resolve_company_to_ticker("tata power ltd") == "TATAPOWER.NS"
+    session.quotes = []
+    assert searchTicker.resolve_company_to_ticker("Unknown Co") is None
+    assert searchTicker.resolve_company_to_ticker("Unknown Co") is None
+    assert session.calls == ["TATA POWER", "UNKNOWN"]
+
+
+def test_transient_failures_are_not_cached(remote):
+    session = remote(FakeSession(error=requests.ConnectionError("offline")))
+    assert searchTicker.resolve_company_to_ticker("Tata Power") is None
+    session.error, session.quotes = None, [{"symbol": "TATAPOWER.NS"}]
+    assert searchTicker.resolve_company_to_ticker("Tata Power") == "TATAPOWER.NS"
+    assert session.calls == ["TATA POWER", "TATA POWER"]
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from strategy import _loop_plan, compound, confident_trades, growth_matrix, plan_trades, turning_points
+
+
+def random_paths(count=5000, seed=0, max_days=40):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        n = int(rng.integers(0, max_days))
+        # Rounded walks so flat steps and ties are common
+        yield np.round(100 + np.cumsum(rng.normal(0, 1, n)), int(rng.integers(0, 2)))
+
+
+def best_growth(path, max_trades, cost):
+    """Exhaustive search over every set of non-overlapping trades (small paths only)."""
+    fee = (1 - cost) ** 2
+
+    def search(start, trades_left):
+        best = 1.0
+        if trades_left == 0:
+            return best
+        for buy in range(start, len(path)):
+            for sell in range(buy + 1, len(path)):
+                best = max(best, path[sell] * fee / path[buy] * search(sell + 1, trades_left - 1))
+        return best
+
+    return search(0, max_trades)
+
+
+def test_turning_points_match_the_old_loop():
+    for path in random_paths():
+        buys, sells = turning_points(path)
+        assert list(zip(buys, sells)) == _loop_plan(path), path
+
+
+def test_growth_matrix_and_uncapped_dp_agree_with_compounding_the_turning_points():
+    for path in random_paths(2000, seed=1):
+        if len(path) < 2:
+            continue
+        expected = compound(path, *turning_points(path), 1.0)["final"]
+        assert np.isclose(growth_matrix(path[None])[0], expected)
+        assert np.isclose(compound(path, *plan_trades(path, max_trades=len(path)), 1.0)["final"], expected)
+
+
+@pytest.mark.parametrize("max_trades, cost", [(1, 0.0), (2, 0.001), (None, 0.01)])
+def test_capped_and_costed_plans_are_valid_and_match_growth_matrix(max_trades, cost):
+    for path in random_paths(1000, seed=2):
+        if len(path) < 2:
+            continue
+        buys, sells = plan_trades(path, max_trades=max_trades, cost=cost)
+        assert np.all(buys < sells) and np.all(sells[:-1] < buys[1:])
+        assert max_trades is None or len(buys) <= max_trades
+        assert np.isclose(compound(path, buys, sells, 1.0, cost)["final"],
+                          growth_matrix(path[None], max_trades, cost)[0])
+
+
+@pytest.mark.parametrize("max_trades, cost", [(1, 0.0), (2, 0.0), (2, 0.01), (3, 0.005)])
+def test_dp_is_optimal_on_small_paths(max_trades, cost):
+    for path in random_paths(300, seed=3, max_days=9):
+        if len(path) < 2:
+            continue
+        assert np.isclose(growth_matrix(path[None], max_trades, cost)[0], best_growth(path, max_trades, cost))
+
+
+def test_growth_matrix_rows_are_independent():
+    paths = 100 * np.exp(np.cumsum(np.random.default_rng(4).normal(0, 0.01, (50, 30)), axis=1))
+    for args in ((), (3, 0.001)):
+        matrix = growth_matrix(paths, *args)
+        assert np.allclose(matrix, [growth_matrix(row[None], *args)[0] for row in paths])
+
+
+def test_compound_reinvests_everything_net_of_fees():
+    prices = np.array([10.0, 20.0, 10.0, 15.0])
+    result = compound(prices, [0, 2], [1, 3], 1000, cost=0.01)
+    fee = 0.99 ** 2
+    assert np.allclose(result["capital"], [2000 * fee, 3000 * fee * fee])
+    assert np.isclose(result["shares"][0], 1000 * 0.99 / 10) and np.isclose(result["final"], 3000 * fee * fee)
+    assert compound(prices, [], [], 1000)["final"] == 1000.0
+
+
+def test_only_trades_that_clear_the_lower_band_are_kept():
+    # A sure rise survives the uncertainty gate; a coin flip of the same median does not
+    center = np.array([100.0, 99.0, 105.0, 104.0, 106.0])
+    noise = np.random.default_rng(0).normal(0, 1, (200, 1)) * np.array([0.0, 0.0, 0.2, 0.0, 8.0])
+    buys, sells, lower = confident_trades(center + noise, *plan_trades(center), cost=0.001)
+    assert list(zip(buys, sells)) == [(1, 2)] and lower[0] > 1
+    empty = np.empty(0, dtype=np.intp)
+    assert all(len(a) == 0 for a in confident_trades(center[None], empty, empty))
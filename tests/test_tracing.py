@@ -0,0 +1,58 @@
+import os
+import urllib.request
+from time import perf_counter
+
+from tracing import Histogram, Tracer
+
+
+def stage(n=20_000):
+    total = 0
+    for i in range(n):
+        total += i
+    return total
+
+
+def test_settings_are_read_when_the_tracer_is_made(monkeypatch):
+    # Set after import (e.g. from .env) and still applied
+    monkeypatch.setenv("TRACE_SLOW_MS", "250")
+    assert Tracer(profile=False).slow == 0.25
+
+
+def test_reservoir_quantiles():
+    histogram = Histogram(size=512)
+    for value in range(1, 10_001):
+        histogram.record(value / 1000)
+    stats = histogram.snapshot()
+    assert stats["count"] == 10_000 and stats["max"] == 10.0
+    assert 4.0 < stats["p50"] < 6.0 and stats["p99"] > 9.0
+
+
+def test_prometheus_text_over_http_and_to_a_file(tmp_path):
+    tracer = Tracer(profile=False)
+    for _ in range(3):
+        with tracer.span("stage"):
+            pass
+    server = tracer.serve_metrics(0, host="127.0.0.1")
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            text = response.read().decode()
+    finally:
+        server.shutdown()
+    assert 'stockapp_span_seconds_count{span="stage"} 3' in text
+    tracer.write_metrics(str(tmp_path / "metrics.prom"))
+    assert (tmp_path / "metrics.prom").read_text() == tracer.prometheus()
+
+
+def test_only_slow_requests_leave_folded_stacks(tmp_path):
+    profiled = Tracer(profile=True, profile_dir=str(tmp_path), interval_ms=1, slow_ms=50)
+    with profiled.span("request.fast", root=True):
+        stage(1000)
+    with profiled.span("request.slow", root=True):
+        deadline = perf_counter() + 0.2
+        while perf_counter() < deadline:
+            stage()
+    profiled.stop_profiler()
+    assert not os.path.exists(tmp_path / "request.fast.folded")
+    lines = (tmp_path / "request.slow.folded").read_text().splitlines()
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) > 20
+    assert any("stage (test_tracing.py" in line for line in lines), lines[:3]
@@ -0,0 +1,71 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import train
+from scaler import MinMaxState
+from windowing import sliding_windows, train_test_split
+
+
+def series(seed, bars=400, features=None):
+    close = 100 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.01, bars)))
+    if features is None:
+        return close
+    return np.column_stack([close] + [close * (k + 2) for k in range(features - 1)])
+
+
+def test_scalers_only_see_the_training_split():
+    closes = {"A": series(0), "B": series(1, features=3)}
+    scalers = train.fit_scalers(closes)
+    for ticker, values in closes.items():
+        fitted = MinMaxState.from_dict(scalers[ticker])
+        head = values[:int(len(values) * train.TRAIN_FRACTION)]
+        assert np.allclose(fitted.lo, head.min(axis=0)) and np.allclose(fitted.hi, head.max(axis=0))
+        assert fitted.count == len(head)
+
+
+@pytest.mark.parametrize("features", [None, 3])
+def test_dataset_yields_every_scaled_window(features):
+    pytest.importorskip("tensorflow")
+    closes = {"A": series(0, features=features), "B": series(1, features=features)}
+    scalers = train.fit_scalers(closes)
+    ds = train.make_dataset(closes, scalers, "val", lookback=20, batch_size=64)
+    got_x = np.concatenate([x.numpy() for x, _ in ds])
+    got_y = np.concatenate([y.numpy() for _, y in ds])
+    expected_x, expected_y = [], []
+    for ticker in ("A", "B"):
+        state = MinMaxState.from_dict(scalers[ticker])
+        _, test = train_test_split(closes[ticker], train.TRAIN_FRACTION, 20)
+        x, y = sliding_windows(state.transform(test), 20)
+        expected_x.append(x)
+        expected_y.append(y)
+    expected_x, expected_y = np.concatenate(expected_x), np.concatenate(expected_y)
+    assert got_x.shape == expected_x.shape and got_y.shape == expected_y.shape
+    # Interleaving changes the order across tickers, not the set of windows
+    order = lambda x: np.lexsort(x.reshape(len(x), -1).T)
+    assert np.allclose(got_x[order(got_x)], expected_x[order(expected_x)], atol=1e-5)
+    assert np.allclose(np.sort(got_y[:, 0]), np.sort(expected_y[:, 0]), atol=1e-5)
+
+
+def test_train_writes_an_artifact_the_registry_serves(tmp_path, monkeypatch):
+    pytest.importorskip("tensorflow")
+    closes = {"AAA": series(0, bars=200), "BBB": series(1, bars=200)}
+    monkeypatch.setattr(train, "load_series", lambda tickers, features, lookback: closes)
+    path = train.train(["AAA", "BBB"], epochs=1, lookback=20, model_dir=str(tmp_path), patience=1)
+
+    with open(tmp_path / "LATEST") as f:
+        assert os.path.join(str(tmp_path), f.read()) == path
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    assert manifest["tickers"] == ["AAA", "BBB"] and manifest["features"] == ["Close"]
+    assert manifest["lookback"] == 20 and manifest["epochs_run"] == 1
+    from modelRegistry import ModelRegistry, file_sha256
+
+    assert manifest["model_sha256"] == file_sha256(os.path.join(path, "model.keras"))
+    registry = ModelRegistry(path="missing.keras", model_dir=str(tmp_path))
+    model = registry.get()
+    assert registry.version == manifest["version"] and registry.path == os.path.join(path, "model.keras")
+    assert model.predict(np.zeros((2, 20, 1), dtype=np.float32)).shape == (2, 1)
+    assert registry.scaler("AAA").to_dict() == train.fit_scalers(closes)["AAA"]
@@ -0,0 +1,33 @@
+import numpy as np
+
+from windowing import _loop_windows, sliding_windows, train_test_split
+
+
+def test_windows_match_the_loop_on_train_and_test():
+    series = np.random.default_rng(0).random((6300, 1))
+    train, test = train_test_split(series)
+    for part in (train, test):
+        loop_x, loop_y = _loop_windows(part)
+        x, y = sliding_windows(part)
+        assert np.array_equal(loop_x, x) and np.array_equal(loop_y, y[:, 0])
+        assert np.shares_memory(x, part)
+
+
+def test_test_split_starts_with_the_last_training_lookback():
+    series = np.random.default_rng(1).random((6300, 1))
+    train, test = train_test_split(series)
+    assert np.array_equal(test[:100], train[-100:])
+    # One test window per bar after the training part
+    assert len(sliding_windows(test)[0]) == len(series) - len(train)
+
+
+def test_short_series_gives_no_windows():
+    x, y = sliding_windows(np.arange(50.0))
+    assert x.shape == (0, 100, 1) and y.shape == (0, 1)
+
+
+def test_horizon_stride_and_target():
+    values = np.arange(300.0).reshape(150, 2)
+    x, y = sliding_windows(values, lookback=10, horizon=3, stride=5, target=1)
+    assert x.shape == (28, 10, 2) and y.shape == (28, 3)
+    assert np.array_equal(x[2], values[10:20]) and np.array_equal(y[2], values[20:23, 1])
@@ -0,0 +1,234 @@
+"""Offline (re)training of the LSTM, producing a versioned model artifact.
+
+    python train.py TCS.NS INFY.NS AAPL --epochs 20 --threads 4
+    python train.py --known --init best_model.keras
+    python train.py --known --features Close,log_return,rsi_14,macd_hist
+
+Each run writes models/<version>/ with model.keras, scaler.json (per-ticker
+min/max of the training split) and manifest.json, then points models/LATEST at
+it so the app's model registry picks it up on the next request.
+
+--features trains on several columns of the feature store (featureStore.py);
+their windows are streamed from the memory-mapped feature files, and the
+manifest records the feature list so the app feeds the model the same columns.
+"""
+import argparse
+import json
+import os
+import platform
+from datetime import datetime, timezone
+
+import numpy as np
+
+from modelRegistry import LOOKBACK, MODEL_DIR, file_sha256
+from priceStore import get_price_store
+from scaler import MinMaxState
+from searchTicker import company_to_ticker_map
+from windowing import sliding_windows, train_test_split
+
+TRAIN_FRACTION = 0.8
+CHUNK = 512
+
+
+def configure_threads(threads):
+    import tensorflow as tf
+
+    if threads:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(max(1, threads // 2))
+
+
+def build_model(lookback=LOOKBACK, features=1):
+    # Same architecture as the notebook that produced best_model.keras
+    from tensorflow.keras.layers import LSTM, Bidirectional, Dense, Dropout, Input
+    from tensorflow.keras.models import Sequential
+
+    model = Sequential([
+        Input(shape=(lookback, features)),
+        Bidirectional(LSTM(units=128, activation='tanh', recurrent_activation='sigmoid', return_sequences=True)),
+        Dropout(0.2),
+        Bidirectional(LSTM(units=64, activation='tanh', recurrent_activation='sigmoid')),
+        Dropout(0.2),
+        Dense(units=32, activation='relu'),
+        Dense(units=1),
+    ])
+    return model
+
+
+def fit_scalers(closes, train_fraction=TRAIN_FRACTION):
+    """Per-ticker (min, max) of the training part of each series (per feature if 2-D)."""
+    scalers = {}
+    for ticker, close in closes.items():
+        train, _ = train_test_split(close, train_fraction)
+        scalers[ticker] = MinMaxState().update(train).to_dict()
+    return scalers
+
+
+def make_dataset(closes, scalers, part, lookback=LOOKBACK, batch_size=32,
+                 train_fraction=TRAIN_FRACTION, shuffle_buffer=10_000, seed=0):
+    """Streaming tf.data pipeline of (window, next close) pairs across all tickers.
+
+    Series are (bars,) closes or (bars, F) feature matrices with Close first.
+    Windows are generated per ticker as strided views over the (memory-mapped)
+    series, interleaved across tickers, scaled in a parallel map and prefetched,
+    so only a few chunks of windows are materialised at any time.
+    """
+    import tensorflow as tf
+
+    tickers = [t for t in closes if len(closes[t]) > lookback * 2]
+    features = np.shape(closes[tickers[0]])[1] if tickers and np.ndim(closes[tickers[0]]) == 2 else 1
+
+    def windows(ticker):
+        ticker = ticker.decode()
+        train, test = train_test_split(closes[ticker], train_fraction, lookback)
+        x, y = sliding_windows(train if part == "train" else test, lookback)
+        state = MinMaxState.from_dict(scalers[ticker])
+        lo = np.atleast_1d(state.lo).astype(np.float32)
+        span = np.atleast_1d(state.span).astype(np.float32)
+        for i in range(0, len(x), CHUNK):
+            yield (np.asarray(x[i:i + CHUNK], dtype=np.float32),
+                   np.asarray(y[i:i + CHUNK], dtype=np.float32),
+                   lo, span)
+
+    signature = (tf.TensorSpec((None, lookback, features), tf.float32),
+                 tf.TensorSpec((None, 1), tf.float32),
+                 tf.TensorSpec((features,), tf.float32),
+                 tf.TensorSpec((features,), tf.float32))
+    ds = tf.data.Dataset.from_tensor_slices(tickers).interleave(
+        lambda t: tf.data.Dataset.from_generator(windows, args=(t,), output_signature=signature),
+        cycle_length=min(len(tickers), 8) or 1,
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=part != "train",
+    )
+    ds = ds.map(lambda x, y, lo, span: ((x - lo) / span, (y - lo[0]) / span[0]),
+                num_parallel_calls=tf.data.AUTOTUNE).unbatch()
+    if part == "train":
+        ds = ds.shuffle(shuffle_buffer, seed=seed)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def save_artifact(model, scalers, manifest, model_dir=MODEL_DIR):
+    version = manifest["version"]
+    path = os.path.join(model_dir, version)
+    os.makedirs(path, exist_ok=True)
+    model.save(os.path.join(path, "model.keras"))
+    manifest["model_sha256"] = file_sha256(os.path.join(path, "model.keras"))
+    with open(os.path.join(path, "scaler.json"), "w") as f:
+        json.dump(scalers, f, indent=2)
+    with open(os.path.join(path, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    latest = os.path.join(model_dir, "LATEST")
+    with open(latest + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(latest + ".tmp", latest)
+    return path
+
+
+def load_series(tickers, features=None, lookback=LOOKBACK):
+    """{ticker: closes} or, with several `features`, {ticker: (bars, F) feature memmap}."""
+    store = get_price_store()
+    end = datetime.today().strftime('%Y-%m-%d')
+    feature_store = None
+    if features and len(features) > 1:
+        from featureStore import FeatureStore
+
+        feature_store = FeatureStore(store)
+    series = {}
+    for ticker in tickers:
+        frame = store.get(ticker, end=end)
+        if feature_store is not None and not frame.empty:
+            feature_store.sync(ticker)
+            matrix, start = feature_store.matrix(ticker, features, end=end), feature_store.valid_from(ticker)
+            values = matrix[start:] if matrix is not None and start is not None else ()
+        else:
+            values = frame["Close"].to_numpy()
+        if len(values) > lookback * 2:
+            series[ticker] = values
+        else:
+            print(f"Skipping {ticker}: not enough history")
+    return series
+
+
+def train(tickers, epochs=20, batch_size=32, lookback=LOOKBACK, threads=None, init=None,
+          model_dir=MODEL_DIR, seed=0, patience=5, features=None):
+    configure_threads(threads)
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+    from tensorflow.keras.models import load_model
+
+    tf.keras.utils.set_random_seed(seed)
+    features = list(features or ["Close"])
+    if len(features) > 1:
+        from featureStore import feature_columns
+
+        feature_columns(features)  # validates the names before any download
+    closes = load_series(tickers, features, lookback)
+    if not closes:
+        raise SystemExit("No ticker has enough history to train on.")
+
+    scalers = fit_scalers(closes)
+    train_ds = make_dataset(closes, scalers, "train", lookback, batch_size, seed=seed)
+    val_ds = make_dataset(closes, scalers, "val", lookback, batch_size)
+
+    model = load_model(init, compile=False) if init else build_model(lookback, len(features))
+    if model.input_shape[-1] != len(features):
+        raise SystemExit(f"{init} takes {model.input_shape[-1]} feature(s), not {len(features)}")
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    history = model.fit(train_ds, validation_data=val_ds, epochs=epochs, verbose=2,
+                        callbacks=[EarlyStopping(monitor='val_loss', patience=patience,
+                                                 restore_best_weights=True)])
+
+    manifest = {
+        "version": datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S"),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "tickers": sorted(closes),
+        "features": features,
+        "lookback": lookback,
+        "train_fraction": TRAIN_FRACTION,
+        "epochs_run": len(history.history["loss"]),
+        "batch_size": batch_size,
+        "threads": threads,
+        "seed": seed,
+        "init": init,
+        "loss": float(history.history["loss"][-1]),
+        "val_loss": float(min(history.history["val_loss"])),
+        "tensorflow": tf.__version__,
+        "python": platform.python_version(),
+    }
+    return save_artifact(model, scalers, manifest, model_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the LSTM and save a versioned artifact.")
+    parser.add_argument('tickers', nargs='*')
+    parser.add_argument('--known', action='store_true',
+                        help="train on every ticker in company_to_ticker_map")
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--threads', type=int, help="CPU threads for TensorFlow ops")
+    parser.add_argument('--init', help="start from an existing .keras model, e.g. best_model.keras")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--features', default="Close",
+                        help="comma-separated feature-store columns starting with Close, or 'all'")
+    args = parser.parse_args(argv)
+
+    tickers = [company_to_ticker_map.get(t.upper(), t.upper()) for t in args.tickers]
+    if args.known:
+        tickers += list(company_to_ticker_map.values())
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        parser.error("no tickers given (pass tickers or --known)")
+    if args.features == "all":
+        from featureStore import FEATURES
+
+        features = FEATURES
+    else:
+        features = [name.strip() for name in args.features.split(",") if name.strip()]
+    path = train(tickers, epochs=args.epochs, batch_size=args.batch_size, threads=args.threads,
+                 init=args.init, model_dir=args.model_dir, seed=args.seed, features=features)
+    print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+LOOKBACK = 100
+
+
+def sliding_windows(values, lookback=LOOKBACK, horizon=1, stride=1, target=0):
+    """Build LSTM input windows and targets as zero-copy views of `values`.
+
+    `values` is (n,) or (n, features). Returns x of shape (m, lookback, features)
+    and y of shape (m, horizon), where window k covers rows
+    [k*stride, k*stride + lookback) and its targets are the following `horizon`
+    rows of column `target`. With the defaults this matches the old
+    `for i in range(100, n): x.append(arr[i-100:i]); y.append(arr[i, 0])` loop.
+    """
+    arr = np.asarray(values)
+    if arr.ndim == 1:
+        arr = arr[:, None]
+    span = lookback + horizon
+    if arr.shape[0] < span:
+        return (np.empty((0, lookback, arr.shape[1]), dtype=arr.dtype),
+                np.empty((0, horizon), dtype=arr.dtype))
+    # (m, features, span) -> (m, span, features); both are views.
+    windows = sliding_window_view(arr, span, axis=0).transpose(0, 2, 1)[::stride]
+    return windows[:, :lookback, :], windows[:, lookback:, target]
+
+
+def train_test_split(values, train_fraction=0.8, lookback=LOOKBACK):
+    """Split a series the way the app does: the test part is prefixed with the last
+    `lookback` training rows so its first window is complete."""
+    arr = np.asarray(values)
+    cut = int(len(arr) * train_fraction)
+    return arr[:cut], arr[max(cut - lookback, 0):]
+
+
+def _loop_windows(arr, lookback=LOOKBACK):
+    x, y = [], []
+    for i in range(lookback, arr.shape[0]):
+        x.append(arr[i - lookback:i])
+        y.append(arr[i, 0])
+    return np.array(x), np.array(y)
+
+
+if __name__ == "__main__":
+    from timeit import timeit
+
+    # ~25 years of daily closes (correctness: tests/test_windowing.py)
+    series = np.random.default_rng(0).random((6300, 1))
+
+    runs = 20
+    loop_ms = timeit(lambda: _loop_windows(series), number=runs) / runs * 1e3
+    view_ms = timeit(lambda: sliding_windows(series), number=runs) / runs * 1e3
+    print(f"{len(series)} rows, lookback {LOOKBACK}")
+    print(f"python loop     : {loop_ms:8.3f} ms")
+    print(f"strided windows : {view_ms:8.3f} ms")